@@ -16,6 +16,8 @@ from .kerberos import kinit
 from .requests import (
     get,
     request,
+    AuthConfig,
+    HTTPKerberosAuth,
     HTTPSciTokenAuth,
     Session,
     SessionAuthMixin,
@@ -0,0 +1,201 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Internal caching utilities for IGWN Auth Utils.
+
+All caches created with `TTLCache` are registered so that they can be
+cleared in one go with `clear_caches`.
+
+Objects that hold locks or connections that must not be shared with
+a forked child process can be registered with `register_after_fork`,
+so that they are reinitialised in the child, see `after_fork`.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+_MISSING = object()
+
+#: registry of all caches created by this module
+_CACHES: weakref.WeakSet = weakref.WeakSet()
+
+#: registry of objects to reinitialise after a fork, keyed by `id`
+#: (so that unhashable objects can be registered)
+_AFTER_FORK: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+
+# -- fork handling --------------------
+
+def register_after_fork(obj):
+    """Register ``obj`` to be reinitialised in a child process after a fork.
+
+    ``obj`` must provide an ``_after_fork()`` method, which is called
+    (with no arguments) in the child process, see `after_fork`.
+    Only a weak reference to ``obj`` is kept.
+
+    Returns
+    -------
+    obj
+        The object that was registered.
+    """
+    _AFTER_FORK[id(obj)] = obj
+    return obj
+
+
+def after_fork():
+    """Reinitialise all objects registered with `register_after_fork`.
+
+    This is called automatically in the child process after
+    `os.fork` (on platforms that support it), so that the child doesn't
+    inherit locks that were held by other threads in the parent, or
+    connections that are still in use by the parent.
+    Cached values (e.g. discovered credentials) are retained.
+    """
+    for obj in list(_AFTER_FORK.values()):
+        obj._after_fork()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows
+    os.register_at_fork(after_in_child=after_fork)
+
+
+def file_fingerprint(path):
+    """Return a `tuple` identifying the current state of the file at ``path``.
+
+    The fingerprint includes the inode, size, and modification and
+    status-change times, so any rewrite, replacement, or change of
+    permissions of the file results in a new fingerprint.
+
+    Returns `None` if the file cannot be `stat`-ed for any reason.
+    """
+    try:
+        stat = Path(path).stat()
+    except (OSError, TypeError, ValueError):
+        return None
+    return (
+        stat.st_ino,
+        stat.st_size,
+        stat.st_mtime_ns,
+        stat.st_ctime_ns,
+    )
+
+
+def freeze(value):
+    """Return a hashable version of ``value``.
+
+    `list`, `set`, and `dict` are converted (recursively) into `tuple`,
+    all other types are returned as they are.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(map(freeze, value))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(map(freeze, value), key=repr))
+    if isinstance(value, dict):
+        return tuple(sorted(
+            ((key, freeze(val)) for key, val in value.items()),
+            key=repr,
+        ))
+    return value
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries can expire.
+
+    Each entry can be stored with its own expiry time and with a
+    'fingerprint'; a lookup that provides a different fingerprint to
+    the one stored is treated as a miss, and the stale entry is dropped.
+
+    Parameters
+    ----------
+    ttl : `float`, optional
+        Default lifetime (seconds) of each entry, `None` means entries
+        don't expire unless given an explicit ``ttl`` in `set`.
+
+    maxsize : `int`, optional
+        Maximum number of entries to store, with the least-recently
+        used entries discarded first; `None` means unbounded.
+    """
+
+    def __init__(self, ttl=None, maxsize=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _CACHES.add(self)
+        register_after_fork(self)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _after_fork(self):
+        """Replace the lock, which may have been held at the time of a fork."""
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, fingerprint=None):
+        """Return the value for ``key``, or ``default`` if not valid."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expiry, fprint, value = entry
+            if (
+                (expiry is not None and time.monotonic() >= expiry)
+                or fprint != fingerprint
+            ):
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING, fingerprint=None):
+        """Store ``value`` for ``key``.
+
+        ``ttl`` overrides the default lifetime for this entry.
+        """
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expiry = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (expiry, fingerprint, value)
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+    def items(self):
+        """Return a `list` of ``(key, value)`` for all unexpired entries.
+
+        Entry fingerprints are not checked.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (expiry, _, value) in self._data.items()
+                if expiry is None or now < expiry
+            ]
+
+    def pop(self, key, default=None):
+        """Remove ``key`` from the cache and return its value."""
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[2]
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._data.clear()
+
+
+def clear_caches():
+    """Clear all caches created by this module."""
+    for cache in list(_CACHES):
+        cache.clear()
@@ -0,0 +1,578 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Local credential agent serving SciTokens and X.509 credentials.
+
+The agent is an optional long-lived process that performs SciToken and
+X.509 credential discovery on behalf of all processes owned by the same
+user on a host, keeping the results in memory and refreshing them in
+the background.
+Lookups are answered over a per-user Unix domain socket.
+
+Using the agent is opt-in: when enabled, either by passing ``agent=True``
+or by setting the ``IGWN_AUTH_UTILS_AGENT`` environment variable to
+``1``, `igwn_auth_utils.find_scitoken` and
+`igwn_auth_utils.find_x509_credentials` ask the agent first, and fall
+back to local discovery if it can't answer.
+Anything the agent returns is validated locally before it is used.
+When no agent is running, the only overhead is a single `os.stat` call.
+
+To run an agent:
+
+.. code-block:: bash
+
+    python -m igwn_auth_utils.agent
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from ._cache import (
+    TTLCache,
+    freeze,
+)
+
+__all__ = [
+    "CredentialAgent",
+    "enabled",
+    "socket_path",
+]
+
+log = logging.getLogger(__name__)
+
+#: Lookup operations supported by the agent
+OPERATIONS = (
+    "find_credentials",
+    "find_token",
+)
+
+#: Default interval (seconds) between background refreshes
+DEFAULT_REFRESH = 300
+
+#: Default timeout (seconds) for a client to wait for an agent response
+DEFAULT_TIMEOUT = 1.
+
+#: Name of the environment variable that configures the agent socket path
+SOCKET_ENV = "IGWN_AUTH_UTILS_AGENT_SOCK"
+
+#: Name of the environment variable that enables use of the agent
+ENABLE_ENV = "IGWN_AUTH_UTILS_AGENT"
+
+
+# -- client -----------------
+
+def enabled(agent=None):
+    """Return whether credential lookups should ask the agent.
+
+    Parameters
+    ----------
+    agent : `bool`, optional
+        Whether to use the agent; if `None` (default) this is taken from
+        the ``IGWN_AUTH_UTILS_AGENT`` environment variable, and the agent
+        is not used if that is not set.
+
+    Returns
+    -------
+    enabled : `bool`
+        `True` if the agent should be asked, otherwise `False`.
+    """
+    if agent is None:
+        return os.getenv(ENABLE_ENV, "").lower() in {"1", "y", "yes", "true"}
+    return bool(agent)
+
+
+def socket_path():
+    """Return the path of the agent socket for the current user.
+
+    This is taken from the ``IGWN_AUTH_UTILS_AGENT_SOCK`` environment
+    variable, falling back to a file in ``XDG_RUNTIME_DIR``, or in a
+    per-user directory in the system temporary directory.
+
+    Returns
+    -------
+    path : `pathlib.Path`, `None`
+        The socket path, or `None` if Unix domain sockets aren't
+        supported on this platform.
+    """
+    if not hasattr(socket, "AF_UNIX"):  # pragma: no cover
+        return None
+    if os.getenv(SOCKET_ENV):
+        return Path(os.environ[SOCKET_ENV])
+    rundir = os.getenv("XDG_RUNTIME_DIR")
+    if rundir:
+        return Path(rundir) / f"igwn-auth-utils-agent-{os.getuid()}.sock"
+    # don't use the shared temporary directory itself
+    return (
+        Path(tempfile.gettempdir())
+        / f"igwn-auth-utils-{os.getuid()}"
+        / "agent.sock"
+    )
+
+
+def _is_agent_socket(path):
+    """Return `True` if ``path`` is a socket owned by the current user."""
+    try:
+        stat_ = path.stat()
+    except (AttributeError, OSError):
+        return False
+    return stat.S_ISSOCK(stat_.st_mode) and stat_.st_uid == os.getuid()
+
+
+def query(request, path=None, timeout=DEFAULT_TIMEOUT):
+    """Send a request to the agent and return its response.
+
+    Parameters
+    ----------
+    request : `dict`
+        The (JSON-serialisable) request to send.
+
+    path : `str`, `pathlib.Path`, optional
+        The path of the agent socket, defaults to `socket_path()`.
+
+    timeout : `float`, optional
+        The time (seconds) to wait for a response.
+
+    Returns
+    -------
+    response : `dict`, `None`
+        The response from the agent, or `None` if no agent is available.
+    """
+    path = socket_path() if path is None else Path(path)
+    if not _is_agent_socket(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as file:
+                return json.loads(file.readline())
+    except (OSError, ValueError) as exc:
+        log.debug("Failed to query credential agent: %s", exc)
+        return None
+
+
+def _environment(names):
+    """Return the values of the environment variables ``names``."""
+    return {name: os.environ.get(name) for name in names}
+
+
+def find_token(audience, scope, issuer=None, timeleft=60, env=()):
+    """Ask the agent for a serialised SciToken.
+
+    Returns `None` if no agent is available, or it couldn't find a token.
+    """
+    response = query({
+        "op": "find_token",
+        "audience": audience,
+        "scope": scope,
+        "issuer": issuer,
+        "timeleft": timeleft,
+        "env": _environment(env),
+    })
+    return (response or {}).get("token")
+
+
+def find_credentials(timeleft=600, env=()):
+    """Ask the agent for the X.509 credential paths.
+
+    Returns `None` if no agent is available, or it couldn't find a
+    credential.
+    """
+    response = query({
+        "op": "find_credentials",
+        "timeleft": timeleft,
+        "env": _environment(env),
+    })
+    cred = (response or {}).get("credentials")
+    if isinstance(cred, list):
+        return tuple(cred)
+    return cred
+
+
+# -- server -----------------
+
+def _private_directory(path):
+    """Create ``path`` (if needed) as a directory only the current user can use.
+
+    Raises
+    ------
+    OSError
+        If ``path`` isn't a directory owned by the current user, or
+        can be accessed by other users.
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    stat_ = path.lstat()
+    if (
+        not stat.S_ISDIR(stat_.st_mode)
+        or stat_.st_uid != os.getuid()
+        or stat_.st_mode & 0o077
+    ):
+        msg = (
+            f"cannot serve credential agent in '{path}', it must be a "
+            "directory owned by the current user, with no access for "
+            "other users"
+        )
+        raise OSError(msg)
+
+
+@contextlib.contextmanager
+def _umask(mask):
+    """Context manager to temporarily set the process umask."""
+    old = os.umask(mask)
+    try:
+        yield
+    finally:
+        os.umask(old)
+
+
+def _peer_uid(sock):
+    """Return the UID of the process at the other end of ``sock``.
+
+    Returns `None` if this isn't supported on this platform, or the
+    peer credentials can't be determined.
+    """
+    try:
+        creds = sock.getsockopt(
+            socket.SOL_SOCKET,
+            socket.SO_PEERCRED,
+            struct.calcsize("3i"),
+        )
+    except (AttributeError, OSError):  # pragma: no cover
+        return None
+    return struct.unpack("3i", creds)[1]
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+    """Answer newline-delimited JSON requests for an agent."""
+
+    server: "_AgentServer"
+
+    def handle(self):
+        uid = _peer_uid(self.connection)
+        if uid != os.getuid():  # including unknown peers
+            log.warning("Rejected connection from UID %s", uid)
+            return
+        for line in self.rfile:
+            try:
+                response = self.server.agent.lookup(json.loads(line))
+            except Exception as exc:  # noqa: BLE001
+                response = {"error": f"{type(exc).__name__}: {exc}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class _AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, agent):
+        self.agent = agent
+        super().__init__(str(path), _AgentRequestHandler)
+
+
+class CredentialAgent:
+    """Agent that serves credential lookups over a Unix domain socket.
+
+    Each lookup is answered from memory if possible, otherwise
+    local discovery is performed (using
+    `igwn_auth_utils.find_scitoken` or
+    `igwn_auth_utils.find_x509_credentials`) and the result is kept until
+    the credential is no longer valid, or any of the discovery locations
+    change.
+    All lookups are repeated in the background every ``refresh`` seconds,
+    so that clients always get a fresh answer quickly.
+
+    Lookups are only answered for clients whose discovery environment
+    variables (e.g. ``SCITOKEN_FILE``) match those of the agent, all other
+    clients fall back to their own local discovery.
+
+    Connections are only accepted from processes owned by the same user,
+    which requires ``SO_PEERCRED`` support (e.g. Linux), the agent
+    refuses to start on other platforms.
+
+    Parameters
+    ----------
+    path : `str`, `pathlib.Path`, optional
+        The path of the socket to serve, defaults to `socket_path()`.
+
+    refresh : `float`, optional
+        Interval (seconds) between background refreshes.
+
+    Examples
+    --------
+    >>> with CredentialAgent():
+    ...     run_many_jobs()
+    """
+
+    #: Maximum number of lookups to remember
+    CACHE_SIZE = 256
+
+    def __init__(self, path=None, refresh=DEFAULT_REFRESH):
+        """Create a new agent, see `start` to start serving."""
+        self.path = socket_path() if path is None else Path(path)
+        self.refresh = refresh
+        self._cache = TTLCache(maxsize=self.CACHE_SIZE)
+        self._requests = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def __enter__(self):
+        """Start the agent."""
+        return self.start()
+
+    def __exit__(self, *exc):
+        """Stop the agent."""
+        self.stop()
+
+    # -- lookups
+
+    @staticmethod
+    def _fingerprint(op):
+        """Return the discovery fingerprint for lookups of type ``op``."""
+        if op == "find_token":
+            from .scitokens import _discovery_fingerprint
+        else:
+            from .x509 import _discovery_fingerprint
+        return _discovery_fingerprint()
+
+    def _resolve(self, request):
+        """Perform local discovery for ``request``.
+
+        Returns
+        -------
+        response : `dict`
+            The response to send to the client.
+
+        ttl : `float`
+            The time (seconds) for which ``response`` is valid.
+        """
+        from .error import IgwnAuthError
+        from .requests import _token_ttl
+        from .scitokens import find_token
+        from .x509 import (
+            _cert_file_expiry,
+            _seconds_until,
+            find_credentials,
+        )
+
+        timeleft = request.get("timeleft", 0)
+        try:
+            if request["op"] == "find_token":
+                token = find_token(
+                    request["audience"],
+                    request["scope"],
+                    issuer=request.get("issuer"),
+                    timeleft=timeleft,
+                    agent=False,
+                )
+                return {"token": (
+                    token._serialized_token
+                    or token.serialize().decode("utf-8")
+                )}, _token_ttl(token, timeleft=timeleft)
+            cred = find_credentials(
+                timeleft=timeleft,
+                on_error="ignore",
+                agent=False,
+            )
+        except IgwnAuthError as exc:
+            return {"error": str(exc)}, self.refresh
+        cert = cred if isinstance(cred, str) else cred[0]
+        expiry = _seconds_until(_cert_file_expiry(cert))
+        return {"credentials": cred}, expiry - timeleft
+
+    def lookup(self, request):
+        """Answer a lookup ``request``.
+
+        Parameters
+        ----------
+        request : `dict`
+            The request, including the name of the operation (``"op"``)
+            and its arguments.
+
+        Returns
+        -------
+        response : `dict`
+            The response, including either the credential or an
+            ``"error"`` message.
+        """
+        op = request.get("op")
+        if op == "ping":
+            return {"pong": True}
+        if op not in OPERATIONS:
+            return {"error": f"unknown operation '{op}'"}
+
+        env = request.pop("env", {})
+        if any(os.environ.get(key) != value for key, value in env.items()):
+            return {"error": "client environment doesn't match agent"}
+
+        key = freeze(request)
+        fingerprint = self._fingerprint(op)
+        with self._lock:
+            self._requests[key] = (request, time.monotonic())
+        response = self._cache.get(key, fingerprint=fingerprint)
+        if response is None:
+            response = self._store(key, request, fingerprint)
+        return response
+
+    def _store(self, key, request, fingerprint):
+        """Resolve ``request`` and store the response."""
+        response, ttl = self._resolve(request)
+        if ttl > 0:
+            self._cache.set(
+                key,
+                response,
+                ttl=min(ttl, self.refresh),
+                fingerprint=fingerprint,
+            )
+        return response
+
+    def refresh_all(self):
+        """Repeat all recent lookups now.
+
+        Lookups that haven't been requested by any client within
+        ten refresh intervals are forgotten.
+        """
+        cutoff = time.monotonic() - 10 * self.refresh
+        with self._lock:
+            for key, (_, used) in list(self._requests.items()):
+                if used < cutoff:
+                    del self._requests[key]
+                    self._cache.pop(key)
+            requests = list(self._requests.items())
+        for key, (request, _) in requests:
+            self._refresh(key, request)
+
+    def _refresh(self, key, request):
+        """Repeat a single lookup, logging (rather than raising) errors."""
+        try:
+            self._store(key, request, self._fingerprint(request["op"]))
+        except Exception as exc:  # noqa: BLE001
+            log.warning(
+                "Failed to refresh %s: %s: %s",
+                request["op"],
+                type(exc).__name__,
+                exc,
+            )
+
+    # -- server
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh):
+            self.refresh_all()
+
+    def _bind(self):
+        """Create the server socket, replacing any stale socket file.
+
+        The socket is created in a private directory (see
+        `_private_directory`), and is only accessible by the current
+        user from the moment it is created.
+
+        Raises
+        ------
+        OSError
+            If the socket can't be served securely, including on platforms
+            where the identity of clients can't be checked.
+        """
+        if not hasattr(socket, "SO_PEERCRED"):
+            msg = (
+                "cannot check the identity of credential agent clients "
+                "on this platform (no SO_PEERCRED)"
+            )
+            raise OSError(msg)
+        _private_directory(self.path.parent)
+        if self.path.exists():
+            if query({"op": "ping"}, path=self.path) is not None:
+                msg = f"credential agent already running at {self.path}"
+                raise OSError(msg)
+            self.path.unlink()
+        with _umask(0o177):
+            return _AgentServer(self.path, self)
+
+    def start(self):
+        """Start serving lookups in background threads."""
+        if self._server is None:
+            self._stop.clear()
+            self._server = self._bind()
+            self._threads = [
+                threading.Thread(target=target, name=name, daemon=True)
+                for target, name in (
+                    (self._server.serve_forever, "igwn_auth_utils.agent"),
+                    (self._refresh_loop, "igwn_auth_utils.agent.refresh"),
+                )
+            ]
+            for thread in self._threads:
+                thread.start()
+            log.info("Credential agent listening on %s", self.path)
+        return self
+
+    def stop(self):
+        """Stop serving lookups and remove the socket."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def serve_forever(self):
+        """Serve lookups until interrupted."""
+        self.start()
+        try:
+            self._stop.wait()
+        finally:
+            self.stop()
+
+
+# -- command-line -----------
+
+def main(args=None):
+    """Run a credential agent until interrupted."""
+    parser = argparse.ArgumentParser(
+        prog="python -m igwn_auth_utils.agent",
+        description=__doc__.split("\n", 1)[0],
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        help="path of socket to serve, default: %(default)s",
+        default=socket_path(),
+    )
+    parser.add_argument(
+        "-r",
+        "--refresh",
+        type=float,
+        default=DEFAULT_REFRESH,
+        help="interval (seconds) between refreshes, default: %(default)s",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="print verbose logging",
+    )
+    opts = parser.parse_args(args=args)
+    logging.basicConfig(level=logging.DEBUG if opts.verbose else logging.INFO)
+    with contextlib.suppress(KeyboardInterrupt):
+        CredentialAgent(opts.socket, refresh=opts.refresh).serve_forever()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -9,16 +9,37 @@ command-line tool using the python-gssapi library.
 See the documentation of the `kinit` function for example usage.
 """
 
+from __future__ import annotations
+
 __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 
+import contextlib
 import logging
 import os
+import random
 import stat
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from unittest import mock
+from typing import NamedTuple
+
+from ._cache import (
+    TTLCache,
+    file_fingerprint,
+)
 
 __all__ = [
+    "CredentialCache",
+    "KerberosRenewer",
+    "KerberosTicket",
+    "KeytabEntry",
+    "ensure_kinit",
     "kinit",
+    "kinit_many",
+    "read_ccache",
+    "read_keytab",
 ]
 
 log = logging.getLogger(__name__)
@@ -26,6 +47,45 @@ log = logging.getLogger(__name__)
 # Invalid Kerberos keytab permissions: anything giving group or other access is bad
 BAD_KEYTAB_PERMISSIONS = stat.S_IRWXG | stat.S_IRWXO
 
+#: Default number of threads to use in `kinit_many`
+PARALLEL_MAX_WORKERS = 4
+
+
+def _ccache_path(ccache=None):
+    """Return the file path of a Kerberos credentials cache.
+
+    If ``ccache`` isn't given, the ``KRB5CCNAME`` environment variable
+    is used.
+
+    Returns
+    -------
+    path : `pathlib.Path`, `None`
+        The path of the ccache file, or `None` if the ccache is not
+        a ``FILE:`` type cache (e.g. ``KEYRING:`` or ``KCM:``), or if
+        no ccache is configured, in which case the library default
+        (``default_ccache_name`` in ``krb5.conf``) applies.
+    """
+    if ccache is None:
+        ccache = os.getenv("KRB5CCNAME")
+    if not ccache:
+        return None
+    ccache = str(ccache)
+    if ccache.startswith("FILE:"):
+        ccache = ccache[5:]
+    elif ":" in ccache.split(os.sep, 1)[0]:  # some other TYPE:
+        return None
+    return Path(ccache)
+
+
+def _default_ccache_path():
+    """Return the MIT Kerberos default ccache path ``/tmp/krb5cc_<uid>``.
+
+    Returns `None` on Windows.
+    """
+    if os.name == "nt":  # pragma: no cover
+        return None
+    return Path("/tmp") / f"krb5cc_{os.getuid()}"  # noqa: S108
+
 
 def _check_keytab(keytab):
     """Check the Kerberos keytab.
@@ -48,17 +108,448 @@ def _check_keytab(keytab):
         raise OSError(msg)
 
 
+# -- binary formats ------------
+
+class _BinaryReader:
+    """Sequential reader for the binary Kerberos file formats."""
+
+    def __init__(self, data, order=">", pos=0):
+        self.data = data
+        self.order = order
+        self.pos = pos
+
+    @property
+    def remaining(self):
+        """The number of bytes left to read."""
+        return len(self.data) - self.pos
+
+    def unpack(self, fmt):
+        """Read values according to the `struct` format ``fmt``."""
+        fmt = self.order + fmt
+        values = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return values
+
+    def counted(self, fmt):
+        """Read a block of bytes prefixed by its length (as ``fmt``)."""
+        (length,) = self.unpack(fmt)
+        if length > self.remaining:
+            msg = "counted data overruns buffer"
+            raise struct.error(msg)
+        value = self.data[self.pos:self.pos + length]
+        self.pos += length
+        return value
+
+
+def _format_principal(components, realm):
+    """Format a principal name as ``name@REALM``."""
+    return f"{'/'.join(components)}@{realm}"
+
+
+# -- keytabs -------------------
+
+#: cache of parsed keytab files, keyed on path, invalidated when the
+#: file changes
+_KEYTAB_CACHE = TTLCache(maxsize=16)
+
+#: the first byte of all keytab files
+KEYTAB_MAGIC = 0x05
+
+#: supported keytab format versions
+KEYTAB_VERSIONS = (0x01, 0x02)
+
+
+class KeytabEntry(NamedTuple):
+    """A single key entry in a Kerberos keytab file."""
+
+    #: The principal name, in the form ``name@REALM``.
+    principal: str
+
+    #: The key version number.
+    kvno: int
+
+    #: The encryption type number of the key, see RFC 3961.
+    enctype: int
+
+    #: The time (Unix epoch) at which the key was written to the keytab.
+    timestamp: int
+
+
+def _parse_keytab_entry(data, version):
+    """Parse a single (non-hole) entry from a keytab file.
+
+    See ``keytab.txt`` in the MIT Kerberos source for details of
+    the format.
+    """
+    # version 1 uses native byte order, version 2 is big-endian
+    reader = _BinaryReader(data, order="=" if version == 1 else ">")
+
+    (ncomp,) = reader.unpack("H")
+    if version == 1:  # count includes the realm
+        ncomp -= 1
+    realm = reader.counted("H").decode("utf-8")
+    components = [reader.counted("H").decode("utf-8") for _ in range(ncomp)]
+    if version != 1:
+        reader.unpack("I")  # name type
+    timestamp, kvno = reader.unpack("IB")
+    (enctype,) = reader.unpack("H")
+    reader.counted("H")  # key contents
+    # newer keytabs include a 32-bit kvno after the key, which
+    # supersedes the 8-bit kvno if non-zero
+    if reader.remaining >= struct.calcsize(">I"):
+        (kvno32,) = reader.unpack("I")
+        kvno = kvno32 or kvno
+
+    return KeytabEntry(
+        principal=_format_principal(components, realm),
+        kvno=kvno,
+        enctype=enctype,
+        timestamp=timestamp,
+    )
+
+
+def _parse_keytab(data):
+    """Parse the contents of an MIT Kerberos keytab file.
+
+    Returns
+    -------
+    entries : `tuple` of `KeytabEntry`
+
+    Raises
+    ------
+    ValueError
+        If ``data`` isn't a valid keytab.
+    """
+    try:
+        magic, version = struct.unpack_from("BB", data)
+    except struct.error:
+        magic = version = None
+    if magic != KEYTAB_MAGIC or version not in KEYTAB_VERSIONS:
+        msg = "unrecognised keytab format"
+        raise ValueError(msg)
+    order = "=" if version == 1 else ">"
+
+    entries = []
+    pos = 2
+    while pos + 4 <= len(data):
+        (size,) = struct.unpack_from(f"{order}i", data, pos)
+        pos += 4
+        if size == 0:  # end of keytab
+            break
+        if size < 0:  # a hole left by a deleted entry
+            pos -= size
+            continue
+        entry = data[pos:pos + size]
+        pos += size
+        if len(entry) < size:
+            msg = "truncated keytab entry"
+            raise ValueError(msg)
+        try:
+            entries.append(_parse_keytab_entry(entry, version))
+        except (struct.error, UnicodeDecodeError) as exc:
+            msg = f"failed to parse keytab entry: {exc}"
+            raise ValueError(msg) from exc
+    return tuple(entries)
+
+
+def read_keytab(keytab):
+    """Read the list of keys in a Kerberos keytab file.
+
+    This function parses the MIT Kerberos keytab format directly, and
+    doesn't require a working Kerberos installation.
+    The result is cached, and only re-read if the file changes.
+
+    Parameters
+    ----------
+    keytab : `str`, `pathlib.Path`
+        Path to keytab file.
+
+    Returns
+    -------
+    entries : `tuple` of `KeytabEntry`
+        The entries in the keytab, in the order they appear in the file.
+
+    Raises
+    ------
+    ValueError
+        If the file isn't a valid keytab.
+
+    Examples
+    --------
+    >>> for entry in read_keytab("robot.keytab"):
+    ...     print(entry.principal, entry.kvno, entry.enctype)
+    robot/host.example.com@EXAMPLE.COM 3 18
+    robot/host.example.com@EXAMPLE.COM 3 17
+    """
+    path = os.fspath(keytab)
+    fingerprint = file_fingerprint(path)
+    entries = _KEYTAB_CACHE.get(path, fingerprint=fingerprint)
+    if entries is None:
+        entries = _parse_keytab(Path(path).read_bytes())
+        _KEYTAB_CACHE.set(path, entries, fingerprint=fingerprint)
+    return entries
+
+
 def _keytab_principal(
     keytab,
 ):
-    """Return the principal assocated with a Kerberos keytab file."""
+    """Return the principal assocated with a Kerberos keytab file.
+
+    The keytab is parsed directly with `read_keytab` if possible, falling
+    back to asking the Kerberos library via `gssapi`, which also reports
+    any errors reading the keytab.
+    """
+    try:
+        entries = read_keytab(keytab)
+    except (OSError, ValueError) as exc:
+        log.debug("Failed to parse keytab '%s': %s", keytab, exc)
+    else:
+        if entries:
+            return entries[0].principal
+
     import gssapi
-    with mock.patch.dict("os.environ", {"KRB5_KTNAME": str(keytab)}):
-        return gssapi.Credentials(usage="accept").name
+    return gssapi.Credentials(
+        store={"keytab": str(keytab)},
+        usage="accept",
+    ).name
+
+
+# -- credential caches ---------
+
+#: cache of parsed credential cache files, keyed on path, invalidated
+#: when the file changes
+_CCACHE_CACHE = TTLCache(maxsize=16)
+
+#: supported credential cache format versions
+CCACHE_VERSIONS = (0x0501, 0x0502, 0x0503, 0x0504)
+
+#: realm used for configuration entries stored in a credential cache
+_CCACHE_CONF_REALM = "X-CACHECONF:"
+
+
+class KerberosTicket(NamedTuple):
+    """A single ticket stored in a Kerberos credential cache."""
+
+    #: The client principal name, in the form ``name@REALM``.
+    client: str
+
+    #: The service principal name, in the form ``name@REALM``.
+    server: str
+
+    #: The time (Unix epoch) at which the ticket was issued.
+    authtime: int
+
+    #: The time (Unix epoch) at which the ticket becomes valid.
+    starttime: int
+
+    #: The time (Unix epoch) at which the ticket expires.
+    endtime: int
+
+    #: The time (Unix epoch) until which the ticket can be renewed.
+    renew_till: int
+
+
+class CredentialCache(NamedTuple):
+    """The contents of a Kerberos credential cache."""
+
+    #: The default principal of the cache, in the form ``name@REALM``.
+    principal: str
+
+    #: The tickets stored in the cache.
+    tickets: tuple
+
+    def timeleft(self, server=None):
+        """Return the time (seconds) remaining on a ticket in this cache.
+
+        Parameters
+        ----------
+        server : `str`, optional
+            The service principal of the ticket to inspect, defaults to
+            the ticket-granting ticket for the default principal.
+
+        Returns
+        -------
+        timeleft : `float`
+            The number of seconds until the ticket expires, or ``0``
+            if no matching ticket is found, or it has already expired.
+        """
+        if server is None:
+            realm = self.principal.rsplit("@", 1)[-1]
+            server = f"krbtgt/{realm}@{realm}"
+        endtimes = [
+            ticket.endtime for ticket in self.tickets
+            if ticket.server == server and ticket.client == self.principal
+        ]
+        if not endtimes:
+            return 0
+        return max(max(endtimes) - time.time(), 0)
+
+
+def _read_ccache_principal(reader, version):
+    """Read a principal name from a credential cache."""
+    if version != 1:
+        reader.unpack("I")  # name type
+    (ncomp,) = reader.unpack("I")
+    if version == 1:  # count includes the realm
+        ncomp -= 1
+    realm = reader.counted("I").decode("utf-8")
+    components = [reader.counted("I").decode("utf-8") for _ in range(ncomp)]
+    return _format_principal(components, realm)
+
+
+def _parse_ccache(data):
+    """Parse the contents of an MIT Kerberos FILE credential cache.
+
+    See ``ccache_file_format`` in the MIT Kerberos documentation for
+    details of the format.
+
+    Returns
+    -------
+    ccache : `CredentialCache`
+
+    Raises
+    ------
+    ValueError
+        If ``data`` isn't a valid credential cache.
+    """
+    try:
+        (version,) = struct.unpack_from(">H", data)
+    except struct.error:
+        version = None
+    if version not in CCACHE_VERSIONS:
+        msg = "unrecognised credential cache format"
+        raise ValueError(msg)
+    version &= 0xff
+    # versions 1 and 2 use native byte order, 3 and 4 are big-endian
+    reader = _BinaryReader(data, order="=" if version < 3 else ">", pos=2)  # noqa: PLR2004
+
+    try:
+        if version == 4:  # noqa: PLR2004
+            reader.counted("H")  # header tags
+        principal = _read_ccache_principal(reader, version)
+        tickets = []
+        while reader.remaining:
+            client = _read_ccache_principal(reader, version)
+            server = _read_ccache_principal(reader, version)
+            reader.unpack("HH" if version == 3 else "H")  # noqa: PLR2004
+            reader.counted("I")  # session key
+            authtime, starttime, endtime, renew_till = reader.unpack("4I")
+            reader.unpack("BI")  # is_skey, ticket flags
+            for _ in range(2):  # addresses and authdata
+                (count,) = reader.unpack("I")
+                for _ in range(count):
+                    reader.unpack("H")
+                    reader.counted("I")
+            reader.counted("I")  # ticket
+            reader.counted("I")  # second ticket
+            if server.endswith(f"@{_CCACHE_CONF_REALM}"):
+                continue
+            tickets.append(KerberosTicket(
+                client=client,
+                server=server,
+                authtime=authtime,
+                starttime=starttime or authtime,
+                endtime=endtime,
+                renew_till=renew_till,
+            ))
+    except (struct.error, UnicodeDecodeError) as exc:
+        msg = f"failed to parse credential cache: {exc}"
+        raise ValueError(msg) from exc
+
+    return CredentialCache(principal=principal, tickets=tuple(tickets))
+
+
+def read_ccache(ccache=None):
+    """Read the principal and tickets from a Kerberos credential cache.
+
+    This function parses the MIT Kerberos ``FILE:`` credential cache
+    format directly, and doesn't require a working Kerberos installation,
+    or contact with a KDC.
+    The result is cached, and only re-read if the file changes.
+
+    Parameters
+    ----------
+    ccache : `str`, `pathlib.Path`, optional
+        Path to Kerberos credentials cache, with or without the ``FILE:``
+        prefix. Default taken from the ``KRB5CCNAME`` environment variable,
+        or the MIT Kerberos default ``/tmp/krb5cc_<uid>``.
+
+    Returns
+    -------
+    ccache : `CredentialCache`
+        The default principal and the tickets in the cache.
+
+    Raises
+    ------
+    ValueError
+        If the ccache isn't a ``FILE:`` type cache, or the file isn't a
+        valid credential cache.
+
+    OSError
+        If the file cannot be read (e.g. it doesn't exist).
+
+    Examples
+    --------
+    >>> ccache = read_ccache()
+    >>> print(ccache.principal, ccache.timeleft())
+    albert.einstein@LIGO.ORG 35982.6
+
+    See Also
+    --------
+    ensure_kinit
+        For a function that reuses an existing credential with enough time
+        remaining, or acquires a new one.
+    """
+    path = _ccache_path(ccache)
+    if path is None and ccache is None and not os.getenv("KRB5CCNAME"):
+        # assume the MIT Kerberos default FILE: cache
+        path = _default_ccache_path()
+    if path is None:
+        msg = f"cannot read '{ccache}', only FILE: credential caches are supported"
+        raise ValueError(msg)
+    fingerprint = file_fingerprint(path)
+    parsed = _CCACHE_CACHE.get(path, fingerprint=fingerprint)
+    if parsed is None:
+        parsed = _parse_ccache(path.read_bytes())
+        _CCACHE_CACHE.set(path, parsed, fingerprint=fingerprint)
+    return parsed
+
+
+#: cache of canonicalised principal names, invalidated when the
+#: Kerberos configuration changes
+_PRINCIPAL_CACHE = TTLCache(maxsize=64)
+
+
+def _krb5_config_fingerprint():
+    """Return a fingerprint of the Kerberos configuration files.
+
+    The files are taken from the ``KRB5_CONFIG`` environment variable
+    (a colon-separated list), falling back to ``/etc/krb5.conf``.
+    """
+    config = os.getenv("KRB5_CONFIG", "/etc/krb5.conf")
+    return config, tuple(
+        file_fingerprint(path)
+        for path in config.split(os.pathsep) if path
+    )
 
 
 def _canonical_principal(principal):
-    """Canonicalise the principal name."""
+    """Canonicalise the principal name.
+
+    The result is cached until the Kerberos configuration (which
+    provides the default realm) changes.
+    """
+    key = str(principal)
+    fingerprint = _krb5_config_fingerprint()
+    canonical = _PRINCIPAL_CACHE.get(key, fingerprint=fingerprint)
+    if canonical is None:
+        canonical = _canonicalize(principal)
+        _PRINCIPAL_CACHE.set(key, canonical, fingerprint=fingerprint)
+    return canonical
+
+
+def _canonicalize(principal):
+    """Canonicalise the principal name using `gssapi`."""
     import gssapi
 
     principal = gssapi.Name(
@@ -132,6 +623,12 @@ def kinit(
     the ``principal`` can be specified without that component:
 
     >>> kinit("albert.einstein")
+
+    See Also
+    --------
+    ensure_kinit
+        For a version of this function that reuses an existing
+        credential if it has enough time remaining.
     """
     # import gssapi here so that the top-level module doesn't force users to
     # have a fully-configured MIT Kerberos stack that they might not use.
@@ -157,12 +654,388 @@ def kinit(
     if ccache:
         store["ccache"] = str(ccache)
         log.debug("Using ccache = '%s'", ccache)
-    with mock.patch.dict("os.environ", {"KRB5_KTNAME": keytab}):
+    # NOTE: the keytab is selected only via the credential store, the
+    #       process environment is not modified, so that this function
+    #       can be called concurrently from multiple threads
+    creds = gssapi.Credentials(
+        name=name,
+        store=store,
+        usage="initiate",
+    )
+    creds.inquire()
+    log.debug("Credential acquired, timeleft: %d", creds.lifetime)
+    return creds
+
+
+def _existing_credential(principal, ccache=None):
+    """Return the existing credential for ``principal`` and its lifetime.
+
+    Returns ``(None, 0)`` if no valid credential is found in the ccache.
+    """
+    import gssapi
+
+    name = gssapi.Name(
+       base=principal,
+       name_type=gssapi.NameType.kerberos_principal,
+    )
+    store = {"ccache": str(ccache)} if ccache else None
+    try:
         creds = gssapi.Credentials(
             name=name,
             store=store,
             usage="initiate",
         )
-    creds.inquire()
-    log.debug("Credential acquired, timeleft: %d", creds.lifetime)
-    return creds
+    except gssapi.exceptions.GSSError as exc:
+        log.debug("No valid Kerberos credential found: %s", exc)
+        return None, 0
+    return creds, creds.lifetime or 0
+
+
+def ensure_kinit(
+    principal=None,
+    keytab=None,
+    ccache=None,
+    min_lifetime=3600,
+):
+    """Initialise a Kerberos TGT only if a valid one doesn't already exist.
+
+    The ``ccache`` is inspected for an existing credential for the
+    ``principal``; if that has at least ``min_lifetime`` seconds remaining
+    it is reused, otherwise a new credential is acquired with `kinit`.
+
+    Parameters
+    ----------
+    principal : `str`, optional
+        Principal name for Kerberos credential, see `kinit`.
+
+    keytab : `str`, optional
+        Path to keytab file, see `kinit`.
+
+    ccache : `str`, optional
+        Path to Kerberos credentials cache.
+
+    min_lifetime : `float`, optional
+        The minimum remaining lifetime (seconds) required to reuse
+        an existing credential.
+
+    Returns
+    -------
+    creds : `gssapi.Credentials`
+        The (new or existing) credential.
+
+    new : `bool`
+        `True` if a new credential was acquired, or `False` if the
+        existing credential was reused.
+
+    Examples
+    --------
+    >>> creds, new = ensure_kinit("albert.einstein", min_lifetime=600)
+    """
+    principal, keytab = _parse_options(principal, keytab)
+
+    creds, lifetime = _existing_credential(principal, ccache=ccache)
+    if creds is not None and lifetime >= min_lifetime:
+        log.debug(
+            "Reusing existing Kerberos credential for %s, timeleft: %d",
+            principal,
+            lifetime,
+        )
+        return creds, False
+
+    return kinit(principal=principal, keytab=keytab, ccache=ccache), True
+
+
+def _kinit_atomic(principal=None, keytab=None, ccache=None):
+    """Initialise a Kerberos TGT and atomically replace the ccache.
+
+    The new credential is acquired into a temporary ccache file that is
+    then moved into place, so that concurrent readers of the ccache never
+    see a missing or partially-written cache.
+
+    If the ccache is not a ``FILE:`` type cache, this just calls `kinit`.
+
+    Returns
+    -------
+    creds : `gssapi.Credentials`
+        The new credential, read from the target ccache.
+    """
+    path = _ccache_path(ccache)
+    if path is None:
+        return kinit(principal=principal, keytab=keytab, ccache=ccache)
+
+    import gssapi
+
+    tmp = path.with_name(
+        f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp",
+    )
+    try:
+        creds = kinit(principal=principal, keytab=keytab, ccache=f"FILE:{tmp}")
+        tmp.replace(path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            tmp.unlink()
+        raise
+    log.debug("Kerberos credential cache updated: %s", path)
+    # the new credential refers to the temporary ccache, which no longer
+    # exists, so read it back from the target ccache
+    return gssapi.Credentials(
+        name=creds.name,
+        store={"ccache": f"FILE:{path}"},
+        usage="initiate",
+    )
+
+
+class KinitResult(NamedTuple):
+    """The outcome of a single credential acquisition in `kinit_many`."""
+
+    #: The principal that was requested.
+    principal: str
+
+    #: The keytab that was used (if any).
+    keytab: str | None
+
+    #: The credentials cache that was written (if given).
+    ccache: str | None
+
+    #: The new credential, or `None` if acquisition failed.
+    creds: object
+
+    #: The exception raised when acquiring the credential, if any.
+    error: Exception | None
+
+
+def _kinit_kwargs(spec):
+    """Convert a `kinit_many` spec into keyword arguments for `kinit`."""
+    keys = ("principal", "keytab", "ccache")
+    if isinstance(spec, dict):
+        spec = dict(spec)
+    else:
+        spec = dict(zip(keys, spec))
+    kwargs = {key: spec.pop(key, None) for key in keys}
+    if spec:
+        msg = f"invalid kinit_many spec keys: {', '.join(map(repr, spec))}"
+        raise TypeError(msg)
+    return kwargs
+
+
+def kinit_many(specs, max_workers=None):
+    """Initialise Kerberos TGTs for many principals concurrently.
+
+    Each credential is acquired with `kinit` in a thread pool, and
+    written to a temporary ccache that then atomically replaces the
+    target ccache.
+    A failure for one principal doesn't affect the others.
+
+    Parameters
+    ----------
+    specs : `list`
+        A list of ``(principal, keytab, ccache)`` tuples, or `dict` with
+        any of those keys, each of which is passed to `kinit`.
+
+    max_workers : `int`, optional
+        The maximum number of credentials to acquire at the same time,
+        default: `PARALLEL_MAX_WORKERS`.
+
+    Returns
+    -------
+    results : `list` of `KinitResult`
+        The result of each acquisition, in the same order as ``specs``.
+
+    Examples
+    --------
+    >>> results = kinit_many([
+    ...     ("robot1/host.example.com", "robot1.keytab", "/tmp/robot1.cc"),
+    ...     ("robot2/host.example.com", "robot2.keytab", "/tmp/robot2.cc"),
+    ... ])
+    >>> for result in results:
+    ...     if result.error:
+    ...         print(f"{result.principal}: {result.error}")
+    """
+    def _kinit(spec):
+        try:
+            creds = _kinit_atomic(**spec)
+        except Exception as exc:  # noqa: BLE001
+            log.warning(
+                "Failed to acquire Kerberos credential for %s: %s: %s",
+                spec["principal"],
+                type(exc).__name__,
+                exc,
+            )
+            return KinitResult(error=exc, creds=None, **spec)
+        return KinitResult(creds=creds, error=None, **spec)
+
+    specs = list(map(_kinit_kwargs, specs))
+    if not specs:
+        return []
+
+    if max_workers is None:
+        max_workers = PARALLEL_MAX_WORKERS
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(specs)),
+        thread_name_prefix="igwn_auth_utils.kinit",
+    ) as pool:
+        return list(pool.map(_kinit, specs))
+
+
+class KerberosRenewer:
+    """Keep a Kerberos credential valid using a background thread.
+
+    The renewer acquires a new credential from the keytab (using `kinit`)
+    when started, and then again each time the current credential has
+    ``renew_before`` seconds remaining, or half of its lifetime remaining
+    for credentials that are shorter-lived than ``2 * renew_before``.
+    New credentials are written to a temporary ccache that then atomically
+    replaces the target ccache.
+
+    Renewal failures are retried with exponential backoff, starting at
+    ``retry_min`` seconds and capped at ``retry_max`` seconds.
+    All delays are randomised by ``jitter`` (a fraction) so that multiple
+    services don't all contact the KDC at the same time.
+
+    Parameters
+    ----------
+    principal : `str`, optional
+        Principal name for Kerberos credential, see `kinit`.
+
+    keytab : `str`, optional
+        Path to keytab file, see `kinit`.
+
+    ccache : `str`, optional
+        Path to Kerberos credentials cache.
+
+    renew_before : `float`, optional
+        Time (seconds) before expiry at which to renew the credential.
+
+    jitter : `float`, optional
+        Fractional randomisation to apply to all delays.
+
+    retry_min : `float`, optional
+        Minimum delay (seconds) before retrying a failed renewal.
+
+    retry_max : `float`, optional
+        Maximum delay (seconds) before retrying a failed renewal.
+
+    Examples
+    --------
+    >>> with KerberosRenewer("robot/host.example.com", keytab="robot.keytab"):
+    ...     run_service()
+    """
+
+    def __init__(
+        self,
+        principal=None,
+        keytab=None,
+        ccache=None,
+        *,
+        renew_before=3600,
+        jitter=0.1,
+        retry_min=10,
+        retry_max=600,
+    ):
+        """Create a new renewer, see `start` to start renewing."""
+        self.principal = principal
+        self.keytab = keytab
+        self.ccache = ccache
+        self.renew_before = renew_before
+        self.jitter = jitter
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        #: The lifetime (seconds) of the credential at the last renewal
+        self.lifetime = None
+        #: The exception raised by the last renewal attempt, if any
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        """Start renewing the credential."""
+        return self.start()
+
+    def __exit__(self, *exc):
+        """Stop renewing the credential."""
+        self.stop()
+
+    @property
+    def running(self):
+        """`True` if the renewal thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def renew(self):
+        """Acquire a new credential now.
+
+        Returns
+        -------
+        creds : `gssapi.Credentials`
+            The new credential.
+        """
+        creds = _kinit_atomic(
+            principal=self.principal,
+            keytab=self.keytab,
+            ccache=self.ccache,
+        )
+        self.lifetime = creds.lifetime
+        return creds
+
+    def _jittered(self, delay):
+        """Randomise ``delay`` by up to ``jitter``."""
+        return delay * (1 + self.jitter * random.uniform(-1, 1))  # noqa: S311
+
+    def _next_delay(self, failures=0):
+        """Return the delay (seconds) until the next renewal attempt."""
+        if failures:
+            return self._jittered(min(
+                self.retry_max,
+                self.retry_min * 2 ** (failures - 1),
+            ))
+        lifetime = self.lifetime or 0
+        # don't renew short-lived credentials immediately
+        renew_before = min(self.renew_before, lifetime / 2)
+        return self._jittered(max(
+            lifetime - renew_before,
+            self.retry_min,
+        ))
+
+    def _run(self):
+        failures = 0
+        delay = 0
+        while not self._stop.wait(delay):
+            try:
+                self.renew()
+            except Exception as exc:  # noqa: BLE001
+                self.error = exc
+                failures += 1
+                log.warning(
+                    "Failed to renew Kerberos credential: %s: %s",
+                    type(exc).__name__,
+                    exc,
+                )
+            else:
+                self.error = None
+                failures = 0
+                log.debug(
+                    "Kerberos credential renewed, timeleft: %d",
+                    self.lifetime,
+                )
+            delay = self._next_delay(failures)
+
+    def start(self):
+        """Start the renewal thread.
+
+        The first renewal is attempted immediately.
+        """
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"{type(self).__name__}-{self.principal}",
+                daemon=True,
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the renewal thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
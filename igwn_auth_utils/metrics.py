@@ -0,0 +1,318 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Metrics for credential discovery, caches, and sessions.
+
+`igwn_auth_utils` records counters for events such as token cache hits
+and misses, credential discovery attempts, token deserialisation
+failures, token acquisitions, Kerberos (HTTP Negotiate) retries, and
+(if enabled, see `igwn_auth_utils.requests.X509HTTPAdapter`) connection
+reuse, in a thread-safe `MetricsRegistry`.
+
+The counters can be formatted in the Prometheus text exposition format,
+e.g. to serve from a metrics endpoint of a running service:
+
+>>> from igwn_auth_utils import metrics
+>>> print(metrics.prometheus_text())
+# HELP igwn_auth_utils_token_cache_total Token cache lookups by ...
+# TYPE igwn_auth_utils_token_cache_total counter
+igwn_auth_utils_token_cache_total{result="hit"} 12
+igwn_auth_utils_token_cache_total{result="miss"} 1
+...
+
+or exported via OpenTelemetry, see `register_opentelemetry`.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import threading
+from functools import wraps
+
+from ._cache import register_after_fork
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "MetricsRegistry",
+    "counted",
+    "counter",
+    "prometheus_text",
+    "register_opentelemetry",
+]
+
+#: Default prefix for metric names
+DEFAULT_PREFIX = "igwn_auth_utils"
+
+
+def _escape_label_value(value):
+    """Escape a label value for the Prometheus text format."""
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace("\n", r"\n")
+        .replace('"', r"\"")
+    )
+
+
+class Counter:
+    """A thread-safe, monotonically-increasing counter.
+
+    Parameters
+    ----------
+    name : `str`
+        The name of this counter.
+
+    documentation : `str`
+        A description of what this counter counts.
+
+    labelnames : `tuple` of `str`, optional
+        The names of the labels that distinguish values of this counter.
+    """
+
+    def __init__(self, name, documentation, labelnames=()):
+        """Create a new counter with no recorded values."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        register_after_fork(self)
+
+    def __repr__(self):
+        """Return a representation of this counter."""
+        return f"<Counter({self.name!r})>"
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            msg = (
+                f"{self.name} requires labels {self.labelnames}, "
+                f"got {tuple(labels)}"
+            )
+            raise ValueError(msg)
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        """Increment this counter.
+
+        Parameters
+        ----------
+        amount : `int`, `float`, optional
+            The (non-negative) amount by which to increment.
+
+        labels
+            The value of each label in `labelnames`.
+        """
+        if amount < 0:
+            msg = "counters can only be incremented"
+            raise ValueError(msg)
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value of this counter for ``labels``."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        """Return a `list` of ``(labels, value)`` pairs.
+
+        ``labels`` is a `dict` of label values.
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in values]
+
+    def reset(self):
+        """Reset all values of this counter to zero."""
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """A collection of `Counter` metrics.
+
+    Parameters
+    ----------
+    prefix : `str`, optional
+        The prefix to add to the name of each metric when exporting.
+    """
+
+    def __init__(self, prefix=DEFAULT_PREFIX):
+        """Create a new, empty registry."""
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+        register_after_fork(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        """Iterate over a snapshot of the registered counters."""
+        with self._lock:
+            return iter(list(self._metrics.values()))
+
+    def counter(self, name, documentation, labelnames=()):
+        """Return the `Counter` called ``name``, creating it if needed.
+
+        Raises
+        ------
+        ValueError
+            If a `Counter` called ``name`` exists with different
+            ``labelnames``.
+        """
+        with self._lock:
+            try:
+                metric = self._metrics[name]
+            except KeyError:
+                metric = self._metrics[name] = Counter(
+                    name,
+                    documentation,
+                    labelnames=labelnames,
+                )
+        if metric.labelnames != tuple(labelnames):
+            msg = (
+                f"counter {name} already registered with labels "
+                f"{metric.labelnames}"
+            )
+            raise ValueError(msg)
+        return metric
+
+    def full_name(self, metric):
+        """Return the full (prefixed) name of ``metric``."""
+        if self.prefix:
+            return f"{self.prefix}_{metric.name}"
+        return metric.name
+
+    def reset(self):
+        """Reset all metrics in this registry to zero."""
+        for metric in self:
+            metric.reset()
+
+    def prometheus_text(self):
+        """Format all metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        text : `str`
+            The formatted metrics.
+        """
+        lines: list[str] = []
+        for metric in self:
+            name = self.full_name(metric)
+            lines.extend((
+                f"# HELP {name} {metric.documentation}",
+                f"# TYPE {name} counter",
+            ))
+            for labels, value in metric.samples():
+                labelstr = ",".join(
+                    f'{key}="{_escape_label_value(val)}"'
+                    for key, val in labels.items()
+                )
+                if labelstr:
+                    labelstr = f"{{{labelstr}}}"
+                lines.append(f"{name}{labelstr} {value}")
+        return "\n".join(lines) + "\n"
+
+
+#: The registry used for all metrics recorded by `igwn_auth_utils`
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()):
+    """Return a `Counter` from the default `REGISTRY`.
+
+    See `MetricsRegistry.counter` for details.
+    """
+    return REGISTRY.counter(name, documentation, labelnames=labelnames)
+
+
+def counted(metric, **labels):
+    """Decorate a function to count calls by outcome.
+
+    Each call increments ``metric`` with the given ``labels``, and
+    ``result="success"`` if the function returns, or
+    ``result="failure"`` if it raises an exception.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                out = func(*args, **kwargs)
+            except Exception:
+                metric.inc(result="failure", **labels)
+                raise
+            metric.inc(result="success", **labels)
+            return out
+        return wrapper
+    return decorator
+
+
+def prometheus_text(registry=REGISTRY):
+    """Format metrics in the Prometheus text exposition format.
+
+    Parameters
+    ----------
+    registry : `MetricsRegistry`, optional
+        The registry to format, defaults to `REGISTRY`.
+
+    Returns
+    -------
+    text : `str`
+        The formatted metrics.
+    """
+    return registry.prometheus_text()
+
+
+def register_opentelemetry(meter=None, registry=REGISTRY):
+    """Export metrics via OpenTelemetry.
+
+    An observable counter is created for each metric in the
+    ``registry`` (at the time of calling), whose values are read
+    whenever the OpenTelemetry SDK collects metrics.
+
+    This requires the ``opentelemetry-api`` package.
+
+    Parameters
+    ----------
+    meter : `opentelemetry.metrics.Meter`, optional
+        The meter to create instruments with, defaults to the
+        ``igwn_auth_utils`` meter from the global meter provider.
+
+    registry : `MetricsRegistry`, optional
+        The registry to export, defaults to `REGISTRY`.
+
+    Returns
+    -------
+    instruments : `list`
+        The OpenTelemetry instruments created.
+    """
+    from opentelemetry.metrics import (
+        Observation,
+        get_meter,
+    )
+
+    if meter is None:
+        meter = get_meter(DEFAULT_PREFIX)
+
+    def _callback(metric):
+        def callback(options):  # noqa: ARG001
+            return [
+                Observation(value, attributes=labels)
+                for labels, value in metric.samples()
+            ]
+        return callback
+
+    return [
+        meter.create_observable_counter(
+            registry.full_name(metric),
+            callbacks=[_callback(metric)],
+            description=metric.documentation,
+        )
+        for metric in registry
+    ]
@@ -10,28 +10,279 @@ This is heavily inspired by Leo Singer's excellent
 __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 __credits__ = "Leo Singer <leo.singer@ligo.org>"
 
+import base64
+import hashlib
+import logging
 import os
+import ssl
 import sys
-from functools import wraps
+import threading
+import time
+import weakref
+from functools import (
+    partial,
+    wraps,
+)
+from pathlib import Path
 from textwrap import indent
-from unittest import mock
+from typing import Any
+from urllib.parse import urlparse
 
 import requests
+from jwt import (
+    PyJWTError,
+    decode as decode_jwt,
+)
+from requests.adapters import HTTPAdapter
 from requests.auth import AuthBase as _AuthBase
 from requests import utils as requests_utils
+from requests.cookies import extract_cookies_to_jar
+from urllib3.connection import (
+    HTTPConnection,
+    HTTPSConnection,
+)
+from urllib3.connectionpool import (
+    HTTPConnectionPool,
+    HTTPSConnectionPool,
+)
+from urllib3.util.ssl_ import create_urllib3_context
 
 from scitokens import SciToken
 
+from ._cache import (
+    TTLCache,
+    file_fingerprint,
+    freeze,
+    register_after_fork,
+)
 from .error import IgwnAuthError
+from .metrics import counter
 from .scitokens import (
+    _discovery_fingerprint as _scitoken_fingerprint,
     find_token as find_scitoken,
     target_audience as scitoken_audience,
     token_authorization_header as scitoken_authorization_header,
 )
+from .timing import (
+    timed,
+    timer,
+)
 from .x509 import (
+    _credential_pem as _x509_pem,
+    _discovery_fingerprint as _x509_fingerprint,
+    _is_in_memory_credential as _is_in_memory_x509,
+    _load_cert_chain as _load_x509_cert_chain,
     find_credentials as find_x509_credentials,
 )
 
+log = logging.getLogger(__name__)
+
+#: Default lifetime (seconds) of a cached failure to discover a credential
+NEGATIVE_CACHE_TTL = 30
+
+#: cache of failed credential discovery attempts
+_NEGATIVE_CACHE = TTLCache(maxsize=256)
+
+#: cache of SSL contexts with client X.509 credentials loaded
+_SSL_CONTEXT_CACHE = TTLCache(maxsize=32)
+
+#: maximum number of per-request `HTTPSciTokenAuth` handlers kept by
+#: each `Session`
+TOKEN_AUTH_CACHE_SIZE = 32
+
+#: all SSL contexts created by `_client_ssl_context`
+_CLIENT_SSL_CONTEXTS: weakref.WeakSet = weakref.WeakSet()
+
+#: count of lookups in `HTTPSciTokenAuth` token caches
+_TOKEN_CACHE = counter(
+    "token_cache_total",
+    "Token cache lookups by HTTPSciTokenAuth, by result.",
+    ("result",),
+)
+
+#: count of requests retried with Kerberos (Negotiate) auth
+_NEGOTIATE_RETRIES = counter(
+    "negotiate_retries_total",
+    "Requests retried with HTTP Negotiate auth after a 401 response.",
+)
+
+#: count of connections used by `X509HTTPAdapter`
+_CONNECTIONS = counter(
+    "connections_total",
+    "Connections used by X509HTTPAdapter, new or reused from a pool.",
+    ("result",),
+)
+
+#: count of responses received by `Session`
+_RESPONSES = counter(
+    "session_responses_total",
+    "Responses received by Session, by status code.",
+    ("code",),
+)
+
+
+# -- Auth configuration ---------------
+
+def _normalise_cert(cert):
+    """Return a hashable form of the ``cert`` option.
+
+    Paths are converted to `str`, and a `list` to a `tuple`; all other
+    inputs (including in-memory credentials) are returned as they are.
+    """
+    if isinstance(cert, os.PathLike):
+        return os.fspath(cert)
+    if isinstance(cert, list) or (
+        isinstance(cert, tuple)
+        and any(isinstance(item, os.PathLike) for item in cert)
+    ):
+        return tuple(
+            os.fspath(item) if isinstance(item, os.PathLike) else item
+            for item in cert
+        )
+    return cert
+
+
+class AuthConfig:
+    """Immutable set of options for configuring authorisation.
+
+    An `AuthConfig` is hashable, so can be used as a key for caches of
+    sessions, tokens, or prepared auth.
+
+    Parameters
+    ----------
+    token : `scitokens.SciToken`, `str`, `bytes`, `bool`, optional
+        Bearer token input, serialised tokens given as `bytes` are
+        decoded to `str`.
+
+    token_audience : `str`, `list` of `str`, optional
+        The audience(s) to use when discovering tokens,
+        a `list` is stored as a `tuple`.
+
+    token_scope : `str`, `list` of `str`, optional
+        The scope(s) to use when discovering tokens,
+        a `list` is stored as a `tuple`.
+
+    token_issuer : `str`, `list` of `str`, optional
+        The issuer(s) to use when discovering tokens,
+        a `list` is stored as a `tuple`.
+
+    cert : `str`, `tuple`, `bytes`, `bool`, optional
+        X.509 credential input, paths are stored as `str`.
+
+    kerberos : `bool`, optional
+        Whether to use Kerberos (HTTP Negotiate) authentication.
+
+    force_noauth : `bool`, optional
+        Disable the use of any authorisation credentials.
+
+    fail_if_noauth : `bool`, optional
+        Raise an error if no authorisation credentials are found.
+
+    See `Session` for more details of each option.
+
+    Raises
+    ------
+    ValueError
+        If both ``force_noauth`` and ``fail_if_noauth`` are `True`.
+    """
+
+    #: names of the options stored by this class, in order
+    FIELDS = (
+        "token",
+        "token_audience",
+        "token_scope",
+        "token_issuer",
+        "cert",
+        "kerberos",
+        "force_noauth",
+        "fail_if_noauth",
+    )
+
+    __slots__ = (*FIELDS, "_hash", "_key")
+
+    # declare the slots, which are set in __init__ via object.__setattr__
+    token: Any
+    token_audience: Any
+    token_scope: Any
+    token_issuer: Any
+    cert: Any
+    kerberos: Any
+    force_noauth: bool
+    fail_if_noauth: bool
+    _hash: int
+    _key: tuple
+
+    def __init__(
+        self,
+        *,
+        token=None,
+        token_audience=None,
+        token_scope=None,
+        token_issuer=None,
+        cert=None,
+        kerberos=None,
+        force_noauth=False,
+        fail_if_noauth=False,
+    ):
+        """Create a new configuration, see the class docs for parameters."""
+        if force_noauth and fail_if_noauth:
+            msg = "cannot select both force_noauth and fail_if_noauth"
+            raise ValueError(msg)
+        if isinstance(token, bytes):
+            token = token.decode("utf-8")
+        key = (
+            token,
+            freeze(token_audience),
+            freeze(token_scope),
+            freeze(token_issuer),
+            _normalise_cert(cert),
+            kerberos,
+            bool(force_noauth),
+            bool(fail_if_noauth),
+        )
+        for name, value in zip(self.FIELDS, key):
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_key", key)
+        object.__setattr__(self, "_hash", hash(key))
+
+    def __setattr__(self, name, value):
+        """Refuse to set attributes, `AuthConfig` is immutable."""
+        msg = f"{type(self).__name__} is immutable"
+        raise AttributeError(msg)
+
+    def __delattr__(self, name):
+        """Refuse to delete attributes, `AuthConfig` is immutable."""
+        msg = f"{type(self).__name__} is immutable"
+        raise AttributeError(msg)
+
+    def __hash__(self):
+        """Return the (precomputed) hash of this configuration."""
+        return self._hash
+
+    def __eq__(self, other):
+        """Return `True` if ``other`` is an identical configuration."""
+        if not isinstance(other, AuthConfig):
+            return NotImplemented
+        return self._hash == other._hash and self._key == other._key
+
+    def __reduce__(self):
+        """Pickle this configuration via its (keyword) arguments."""
+        return partial(type(self), **dict(zip(self.FIELDS, self._key))), ()
+
+    def __repr__(self):
+        """Return a representation of this configuration.
+
+        The content of the token (if given) is not included.
+        """
+        token = self.token
+        if token is not None and not isinstance(token, bool):
+            token = f"<{type(token).__name__}>"
+        values = (token, *self._key[1:])
+        return "{}({})".format(
+            type(self).__name__,
+            ", ".join(f"{k}={v!r}" for k, v in zip(self.FIELDS, values)),
+        )
+
 
 # -- Auth utilities -------------------
 
@@ -44,31 +295,163 @@ def _bool_env(varname, default=None):
     return value.lower() in {"1", "y", "yes", "true"}
 
 
-def _find_cred(func, *args, error=True, **kwargs):
+def _negative_cache_ttl():
+    """Return the lifetime (seconds) of a cached credential discovery failure.
+
+    This is taken from the ``IGWN_AUTH_UTILS_NEGATIVE_CACHE_TTL``
+    environment variable, if set, otherwise `NEGATIVE_CACHE_TTL`.
+    """
+    try:
+        return float(os.environ["IGWN_AUTH_UTILS_NEGATIVE_CACHE_TTL"])
+    except (KeyError, ValueError):
+        return NEGATIVE_CACHE_TTL
+
+
+def _find_cred(func, *args, error=True, watch=None, **kwargs):
     """Find a credential and maybe ignore an `~igwn_auth_utils.IgwnAuthError`.
 
     This is an internal utility for the `SessionAuthMixin._init_auth`
     method which shouldn't necessary fail if it doesn't
     find a credential of any one type, but should just move on to the
     next option.
+
+    If ``error=False`` and ``watch`` is given, a failure to find a
+    credential is cached (for `_negative_cache_ttl` seconds) so that
+    repeated calls with the same arguments don't repeat the search.
+    ``watch`` should be a function that returns a fingerprint of the
+    locations that are searched; the cached failure is discarded as soon
+    as the fingerprint changes.
     """
+    ttl = 0 if error or watch is None else _negative_cache_ttl()
+    if ttl > 0:
+        key = (func, freeze(args), freeze(kwargs))
+        fingerprint = watch()
+        if _NEGATIVE_CACHE.get(key, fingerprint=fingerprint):
+            return None
     try:
         return func(*args, **kwargs)
     except IgwnAuthError:
         if error:
             raise
+        if ttl > 0:
+            _NEGATIVE_CACHE.set(key, value=True, ttl=ttl, fingerprint=fingerprint)
         return
 
 
-@wraps(requests_utils.get_netrc_auth)
+def _netrc_path():
+    """Return the path of the netrc file to use, or `None`.
+
+    This is the ``NETRC`` environment variable, if set, otherwise
+    the first of ``~/.netrc`` and ``~/_netrc`` that exists.
+    """
+    try:
+        locations = [os.environ["NETRC"]]
+    except KeyError:
+        locations = [f"~/{name}" for name in requests_utils.NETRC_FILES]
+    for loc in locations:
+        path = Path(loc).expanduser()
+        if path.exists():
+            return str(path)
+    return None
+
+
+@timed("get_netrc_auth")
 def get_netrc_auth(url, raise_errors=False):
+    """Return the ``(login, password)`` for ``url`` from a netrc file.
+
+    This is equivalent to `requests.utils.get_netrc_auth`, but parses
+    the netrc file with `safe_netrc`, which rejects files that may be
+    read by other users.
+
+    Parameters
+    ----------
+    url : `str`
+        The URL for which to find credentials.
+
+    raise_errors : `bool`, optional
+        If `True`, raise exceptions when reading or parsing the netrc
+        file, otherwise ignore them (default).
+
+    Returns
+    -------
+    auth : `tuple`, `None`
+        The ``(login, password)`` pair, or `None` if no netrc file
+        was found, or the file has no entry for the host of ``url``.
+
+    Raises
+    ------
+    safe_netrc.NetrcParseError
+        If ``raise_errors=True`` and the netrc file can't be parsed,
+        or its permissions are too permissive.
+
+    OSError
+        If ``raise_errors=True`` and the netrc file can't be read.
+    """
     import safe_netrc
-    with mock.patch.dict(sys.modules, {"netrc": safe_netrc}):
-        return requests_utils.get_netrc_auth(url, raise_errors=raise_errors)
+
+    path = _netrc_path()
+    if path is None:
+        return None
+
+    if isinstance(url, bytes):
+        url = url.decode("utf-8")
+    host = urlparse(url).hostname if url else None
+
+    # NOTE: safe_netrc is used directly, rather than by patching it in
+    #       as the 'netrc' module for requests.utils.get_netrc_auth,
+    #       so that this function can be called concurrently from
+    #       multiple threads
+    try:
+        authenticators = safe_netrc.netrc(path).authenticators(host or "")
+    except (safe_netrc.NetrcParseError, OSError):
+        if raise_errors:
+            raise
+        return None
+    if authenticators and any(authenticators):
+        login, account, password = authenticators
+        return (login or account or "", password or "")
+    return None
+
+
+def _token_identity(token):
+    """Return a hashable identity for ``token``.
+
+    This is the claims of the token, including the token ID (``jti``),
+    so that handlers with the same token (deserialised or not) compare
+    equal, without having to sign the token.
+    Serialised tokens that can't be decoded, and other inputs, are
+    returned as they are.
+    """
+    if isinstance(token, (str, bytes)):
+        try:
+            claims = decode_jwt(token, options={"verify_signature": False})
+        except PyJWTError:  # not a JWT, use the string
+            return token.decode("utf-8") if isinstance(token, bytes) else token
+    elif isinstance(token, SciToken):
+        claims = dict(token.claims())
+    else:
+        return token
+    return freeze(claims)
 
 
 class HTTPSciTokenAuth(_AuthBase):
-    """Auth handler for SciTokens."""
+    """Auth handler for SciTokens.
+
+    When no ``token`` is given, tokens discovered for each request are
+    cached (per audience) until shortly before they expire, so that
+    repeated requests to the same host don't repeat the discovery.
+
+    Handlers are hashable, two handlers are equal if they provide the
+    same auth.
+    The ``token``, ``audience``, ``scope``, and ``issuer`` of a handler
+    can't be changed once it has been hashed.
+    """
+
+    #: Maximum number of discovered tokens to cache
+    TOKEN_CACHE_SIZE = 32
+
+    #: Minimum lifetime (seconds) remaining for a discovered token to be used
+    TOKEN_TIMELEFT = 60
 
     def __init__(
         self,
@@ -77,23 +460,147 @@ class HTTPSciTokenAuth(_AuthBase):
         scope=None,
         issuer=None,
     ):
-        self.token = token
-        self.audience = audience
-        self.scope = scope
-        self.issuer = issuer
+        self._token = token
+        self._audience = audience
+        self._scope = scope
+        self._issuer = issuer
+        self._hashed = False
+        self._update_key()
+        self._token_cache = TTLCache(maxsize=self.TOKEN_CACHE_SIZE)
+        self._discovery_locks = {}
+        self._discovery_locks_lock = threading.Lock()
+        register_after_fork(self)
+
+    def _update_key(self):
+        """Recompute the key used to compare and hash this handler."""
+        self._key = (
+            _token_identity(self._token),
+            freeze(self._audience),
+            freeze(self._scope),
+            freeze(self._issuer),
+        )
+        self._hash = hash(self._key)
+
+    def _set_option(self, name, value):
+        """Set an option that is part of the key of this handler."""
+        if self._hashed:
+            msg = (
+                f"can't set '{name}' of a {type(self).__name__} "
+                "that has been hashed"
+            )
+            raise AttributeError(msg)
+        setattr(self, f"_{name}", value)
+        self._update_key()
+
+    @property
+    def token(self):
+        """The token to use, or `None` or `True` to discover one."""
+        return self._token
+
+    @token.setter
+    def token(self, token):
+        self._set_option("token", token)
+
+    @property
+    def audience(self):
+        """The audience to use when discovering a token."""
+        return self._audience
+
+    @audience.setter
+    def audience(self, audience):
+        self._set_option("audience", audience)
+
+    @property
+    def scope(self):
+        """The scope to use when discovering a token."""
+        return self._scope
+
+    @scope.setter
+    def scope(self, scope):
+        self._set_option("scope", scope)
+
+    @property
+    def issuer(self):
+        """The issuer to use when discovering a token."""
+        return self._issuer
+
+    @issuer.setter
+    def issuer(self, issuer):
+        self._set_option("issuer", issuer)
+
+    def _after_fork(self):
+        self._discovery_locks = {}
+        self._discovery_locks_lock = threading.Lock()
+
+    def _discovery_lock(self, key):
+        """Return the lock that serialises token discovery for ``key``."""
+        with self._discovery_locks_lock:
+            return self._discovery_locks.setdefault(key, threading.Lock())
+
+    def __getstate__(self):
+        """Return the state of this handler for pickling.
+
+        The state includes the serialised token (if given), and all
+        discovered tokens that are still cached, so that the handler
+        can be restored (e.g. in a worker process) without repeating
+        token discovery or verification.
+        The key of the handler is also stored, so that the restored
+        handler compares equal to this one, even if serialising the
+        token assigned it a new ``jti``.
+        """
+        token = self.token
+        claims = None
+        if isinstance(token, SciToken):
+            token, claims = _dump_token(token)
+        return {
+            "key": self._key,
+            "token": token,
+            "claims": claims,
+            "audience": self.audience,
+            "scope": self.scope,
+            "issuer": self.issuer,
+            "cached": [
+                (key, _dump_token(cached[0]))
+                for key, cached in self._token_cache.items()
+            ],
+        }
+
+    def __setstate__(self, state):
+        """Restore the state of this handler, see `__getstate__`."""
+        token = state["token"]
+        if state["claims"] is not None:
+            token = _load_token(token, state["claims"])
+        type(self).__init__(
+            self,
+            token=token,
+            audience=state["audience"],
+            scope=state["scope"],
+            issuer=state["issuer"],
+        )
+        self._key = state["key"]
+        self._hash = hash(self._key)
+        fingerprint = _scitoken_fingerprint()
+        for key, dumped in state["cached"]:
+            cached = _load_token(*dumped)
+            ttl = _token_ttl(cached, timeleft=self.TOKEN_TIMELEFT)
+            if ttl > 0:
+                self._token_cache.set(
+                    key,
+                    (cached, self._auth_header_str(cached)),
+                    ttl=ttl,
+                    fingerprint=fingerprint,
+                )
 
     def __eq__(self, other):
         """Return `True` if this object provides the same auth as ``other``."""
-        return all([
-            self.token == getattr(other, "token", None),
-            self.audience == getattr(other, "audience", None),
-            self.scope == getattr(other, "scope", None),
-            self.issuer == getattr(other, "issuer", None),
-        ])
+        if not isinstance(other, HTTPSciTokenAuth):
+            return NotImplemented
+        return self._hash == other._hash and self._key == other._key
 
-    def __ne__(self, other):
-        """Return `True` if this object and ``other`` provide the same auth."""
-        return not self == other
+    def __hash__(self):
+        """Return the hash of this handler, after which it can't be changed."""
+        self._hashed = True
+        return self._hash
 
     @staticmethod
     def _auth_header_str(token):
@@ -108,6 +615,12 @@ class HTTPSciTokenAuth(_AuthBase):
             return f"Bearer {token}"
         return scitoken_authorization_header(token)
 
+    def _url_audience(self, url=None):
+        """Return the audience to use when discovering a token for ``url``."""
+        if self.audience is None and url is not None:
+            return scitoken_audience(url, include_any=False)
+        return self.audience
+
     def find_token(
         self,
         url=None,
@@ -123,53 +636,391 @@ class HTTPSciTokenAuth(_AuthBase):
         error : `bool`
             If `True`, `raise` exceptions, otherwise return `None`.
         """
-        audience = self.audience
-        if audience is None and url is not None:
-            audience = scitoken_audience(url, include_any=False)
         return _find_cred(
             find_scitoken,
-            audience,
+            self._url_audience(url),
             self.scope,
             issuer=self.issuer,
             error=error,
+            watch=_scitoken_fingerprint,
         )
 
+    def _find_token_header(self, url=None, *, error=True):
+        """Find a bearer token and format an Authorization header for it.
+
+        Discovered tokens are cached until `TOKEN_TIMELEFT` seconds
+        before they expire, or until any of the locations searched
+        for tokens change.
+        Only one thread at a time searches for a token for each
+        audience, so that concurrent requests that miss the cache don't
+        all repeat the same discovery.
+
+        Returns
+        -------
+        header : `str`, `None`
+            The header content, or `None` if ``error=False`` and no token
+            was found.
+        """
+        key = (freeze(self._url_audience(url)), *self._key[2:])
+        fingerprint = _scitoken_fingerprint()
+        cached = self._token_cache.get(key, fingerprint=fingerprint)
+        if cached is not None:
+            _TOKEN_CACHE.inc(result="hit")
+            return cached[1]
+
+        with self._discovery_lock(key):
+            # another thread may have found a token while we waited
+            cached = self._token_cache.get(key, fingerprint=fingerprint)
+            if cached is not None:
+                _TOKEN_CACHE.inc(result="hit")
+                return cached[1]
+            _TOKEN_CACHE.inc(result="miss")
+
+            token = self.find_token(url=url, error=error)
+            if not token:
+                return None
+            header = self._auth_header_str(token)
+            ttl = _token_ttl(token, timeleft=self.TOKEN_TIMELEFT)
+            if ttl > 0:
+                self._token_cache.set(
+                    key,
+                    (token, header),
+                    ttl=ttl,
+                    fingerprint=fingerprint,
+                )
+            return header
+
     def __call__(self, r):
         """Augment the `Request` ``r`` with an ``Authorization`` header."""
         token = self.token
         if token in (None, True):
-            token = self.find_token(
+            header = self._find_token_header(
                 url=getattr(r, "url", None),  # allow r as Session
                 error=bool(token),
             )
+        elif token:
+            header = self._auth_header_str(token)
+        else:
+            header = None
 
         # if we ended up with a header, store it in the request.
-        if token:
-            r.headers["Authorization"] = self._auth_header_str(token)
+        if header:
+            r.headers["Authorization"] = header
 
         return r
 
 
+def _dump_token(token):
+    """Return the serialisation and claims of a `~scitokens.SciToken`.
+
+    See `_load_token` for the reverse.
+    """
+    serialized = (
+        token._serialized_token
+        or token.serialize().decode("utf-8")
+    )
+    return serialized, dict(token.claims())
+
+
+def _load_token(serialized, claims):
+    """Restore a `~scitokens.SciToken` dumped by `_dump_token`.
+
+    The claims are trusted as they are, the token signature is not
+    verified again.
+    """
+    token = SciToken()
+    token._verified_claims = claims
+    token._serialized_token = serialized
+    return token
+
+
+def _token_ttl(token, timeleft=0):
+    """Return the time (seconds) until ``token`` has ``timeleft`` remaining.
+
+    Returns ``0`` if the expiry time of the token cannot be determined.
+    """
+    try:
+        exp = float(token.get("exp"))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+    return exp - time.time() - timeleft
+
+
+class HTTPKerberosAuth(_AuthBase):
+    """Auth handler for Kerberos (SPNEGO/HTTP Negotiate).
+
+    A Kerberos credential must already exist in the credentials cache,
+    see :func:`igwn_auth_utils.kinit`.
+
+    By default, a ``Negotiate`` token is sent with the first request to
+    each host, to avoid the ``401 Unauthorized`` round trip.
+    If a server responds to a negotiated request with a session cookie,
+    later requests to that host that carry cookies (i.e. in a `Session`)
+    don't renegotiate; if the cookie is rejected, the request is
+    retried with a new ``Negotiate`` token.
+
+    A new security context is created for each negotiated request, so
+    a handler can be shared between threads.
+    The service name for each host is cached by the handler, while the
+    service tickets themselves are cached in the credentials cache by
+    the Kerberos library, so only the first request to each host needs
+    to contact the KDC.
+
+    Parameters
+    ----------
+    service : `str`, optional
+        The service type of the target principal.
+
+    principal : `str`, optional
+        The client principal to use, defaults to the default principal
+        of the credentials cache.
+
+    preemptive : `bool`, optional
+        If `True` (default), send a ``Negotiate`` token with the first
+        request to each host, otherwise wait for the server to ask for
+        one.
+    """
+
+    #: Maximum number of hosts for which to cache service names and
+    #: session state
+    CONTEXT_CACHE_SIZE = 32
+
+    def __init__(
+        self,
+        service="HTTP",
+        principal=None,
+        *,
+        preemptive=True,
+    ):
+        """Create a new handler, see the class docs for parameters."""
+        self.service = service
+        self.principal = principal
+        self.preemptive = preemptive
+        self._names = TTLCache(maxsize=self.CONTEXT_CACHE_SIZE)
+        self._established = TTLCache(maxsize=self.CONTEXT_CACHE_SIZE)
+
+    def __getstate__(self):
+        """Return the state of this handler for pickling.
+
+        Service names and session state can't be transferred between
+        processes, so only the configuration is included.
+        """
+        return {
+            "service": self.service,
+            "principal": self.principal,
+            "preemptive": self.preemptive,
+        }
+
+    def __setstate__(self, state):
+        """Restore the state of this handler, see `__getstate__`."""
+        type(self).__init__(self, **state)
+
+    @property
+    def _key(self):
+        """The options that identify the auth provided by this handler."""
+        return (self.service, self.principal, self.preemptive)
+
+    def __eq__(self, other):
+        """Return `True` if this object provides the same auth as ``other``."""
+        if not isinstance(other, HTTPKerberosAuth):
+            return NotImplemented
+        return self._key == other._key
+
+    def __hash__(self):
+        """Return the hash of the options of this handler."""
+        return hash(self._key)
+
+    def _credentials(self):
+        """Return the client credentials to use, `None` for the default."""
+        if self.principal is None:
+            return None
+        import gssapi
+        return gssapi.Credentials(
+            name=gssapi.Name(
+                self.principal,
+                name_type=gssapi.NameType.kerberos_principal,
+            ),
+            usage="initiate",
+        )
+
+    def _service_name(self, host):
+        """Return the (cached) `gssapi.Name` of the service on ``host``."""
+        name = self._names.get(host)
+        if name is None:
+            import gssapi
+            name = gssapi.Name(
+                f"{self.service}@{host}",
+                name_type=gssapi.NameType.hostbased_service,
+            )
+            self._names.set(host, name)
+        return name
+
+    def _negotiate(self, host):
+        """Create a new security context for ``host`` and format a header.
+
+        Returns
+        -------
+        context : `gssapi.SecurityContext`, `None`
+            The new security context.
+
+        header : `str`, `None`
+            The ``Authorization`` header content.
+
+        Both are `None` if a security context could not be created,
+        e.g. if there is no Kerberos credential, or no service principal
+        for ``host``.
+        """
+        import gssapi
+        try:
+            context = gssapi.SecurityContext(
+                name=self._service_name(host),
+                creds=self._credentials(),
+                usage="initiate",
+            )
+            token = context.step()
+        except gssapi.exceptions.GSSError as exc:
+            log.debug("Failed to create security context for %s: %s", host, exc)
+            return None, None
+        return context, f"Negotiate {base64.b64encode(token).decode('ascii')}"
+
+    @staticmethod
+    def _server_token(response):
+        """Return the ``Negotiate`` token sent by the server, if any."""
+        for challenge in response.headers.get("WWW-Authenticate", "").split(","):
+            scheme, _, token = challenge.strip().partition(" ")
+            if scheme.lower() == "negotiate":
+                return base64.b64decode(token) if token else None
+        return None
+
+    @staticmethod
+    def _negotiated(request):
+        """Return `True` if ``request`` carries a ``Negotiate`` token."""
+        return request.headers.get("Authorization", "").startswith("Negotiate ")
+
+    def _complete(self, context, host, response):
+        """Record the outcome of a negotiated request to ``host``.
+
+        ``context`` is the security context that was used to negotiate
+        the request.
+        """
+        token = self._server_token(response)
+        if context is not None and token and not context.complete:
+            # mutual authentication
+            import gssapi
+            try:
+                context.step(token)
+            except gssapi.exceptions.GSSError as exc:
+                log.debug("Failed to complete security context: %s", exc)
+        if response.cookies:
+            self._established.set(host, value=True)
+
+    def _handle_response(self, context, response, **kwargs):
+        """Retry a request that was rejected with a ``Negotiate`` challenge.
+
+        ``context`` is the security context that was used to negotiate
+        the original request, if any.
+        """
+        request = response.request
+        host = urlparse(request.url).hostname
+        if (
+            response.status_code == requests.codes.unauthorized
+            and "negotiate" in response.headers.get(
+                "WWW-Authenticate",
+                "",
+            ).lower()
+            and not self._negotiated(request)
+        ):
+            self._established.pop(host)
+            context, header = self._negotiate(host)
+            if header is None:  # can't negotiate, return the challenge
+                return response
+            _NEGOTIATE_RETRIES.inc()
+            # consume the content so the connection can be reused
+            response.content  # noqa: B018
+            response.close()
+            prep = request.copy()
+            extract_cookies_to_jar(prep._cookies, request, response.raw)
+            prep.prepare_cookies(prep._cookies)
+            prep.headers["Authorization"] = header
+            new = response.connection.send(prep, **kwargs)
+            new.history.append(response)
+            new.request = prep
+            response = new
+
+        if self._negotiated(response.request) and response.ok:
+            self._complete(context, host, response)
+        return response
+
+    def __call__(self, r):
+        """Augment the `Request` ``r`` with a ``Negotiate`` header."""
+        host = urlparse(r.url).hostname
+        context = None
+        if self._established.get(host) and "Cookie" in r.headers:
+            # rely on the session cookie
+            pass
+        elif self.preemptive:
+            context, header = self._negotiate(host)
+            if header is not None:
+                r.headers["Authorization"] = header
+        # bind the security context to this request only
+        r.register_hook("response", partial(self._handle_response, context))
+        return r
+
+
+@timed("prepare_auth")
 def _prepare_auth(
     url=None,
     auth=None,
-    cert=None,
-    token=None,
-    token_audience=None,
-    token_scope=None,
-    token_issuer=None,
-    force_noauth=False,
-    fail_if_noauth=False,
+    config=None,
     session=None,
+    **kwargs,
 ):
-    """Prepare authorisation for a session or request."""
+    """Prepare authorisation for a session or request.
+
+    The options are given as an `AuthConfig`, or as keyword arguments
+    from which to create one.
+
+    Token auth handlers created for requests in a ``session`` are
+    cached by the session, keyed by their (merged) options, so that
+    repeated requests with the same options reuse the handler and its
+    discovered tokens.
+    """
+    if config is None:
+        config = AuthConfig(**kwargs)
+    token = config.token
+    token_audience = config.token_audience
+    token_scope = config.token_scope
+    token_issuer = config.token_issuer
+    cert = config.cert
+    kerberos = config.kerberos
+    fail_if_noauth = config.fail_if_noauth
+
     # merge settings from the session
     if session:
         if cert is None:
             cert = session.cert
+        if (
+            isinstance(session.auth, HTTPKerberosAuth)
+            and kerberos is not False
+            and auth is None
+        ):
+            # reuse the session handler (and its security contexts)
+            auth = session.auth
+            if token is None:
+                token = False
         if token is None and session.auth is None:
             token = False
         if isinstance(session.auth, HTTPSciTokenAuth):
+            if (
+                auth is None
+                and not kerberos
+                and token is None
+                and token_audience is None
+                and token_scope is None
+                and token_issuer is None
+            ):
+                # reuse the session handler (and its token cache)
+                auth = session.auth
             if token is None:
                 token = session.auth.token
             if token_audience is None:
@@ -180,11 +1031,7 @@ def _prepare_auth(
                 token_issuer = session.auth.issuer
 
     # handle options
-    if force_noauth and fail_if_noauth:
-        raise ValueError(
-            "cannot select both force_noauth and fail_if_noauth",
-        )
-    if force_noauth:
+    if config.force_noauth:
         return None, False
 
     # parse environment settings
@@ -195,24 +1042,46 @@ def _prepare_auth(
 
     # cert auth (always attach if we can)
     if cert in (None, True):  # not disabled and not given explicitly
-        cert = _find_cred(find_x509_credentials, error=cert is True)
+        cert = _find_cred(
+            find_x509_credentials,
+            error=cert is True,
+            watch=_x509_fingerprint,
+        )
 
     # use existing auth object
     if auth is not None:
         pass
 
+    # -- kerberos (HTTP Negotiate)
+
+    elif kerberos:
+        auth = HTTPKerberosAuth()
+
     # -- bearer token (scitoken)
 
     elif token is not False:
         # get the default audience from the URL
         if token_audience is None and url is not None:
             token_audience = scitoken_audience(url, include_any=False)
-        auth = HTTPSciTokenAuth(
-            token=token,
-            audience=token_audience,
-            scope=token_scope,
-            issuer=token_issuer,
-        )
+        # reuse the session's handler for the same options
+        cache = getattr(session, "_token_auth_cache", None)
+        if cache is not None:
+            key = AuthConfig(
+                token=token,
+                token_audience=token_audience,
+                token_scope=token_scope,
+                token_issuer=token_issuer,
+            )
+            auth = cache.get(key)
+        if auth is None:
+            auth = HTTPSciTokenAuth(
+                token=token,
+                audience=token_audience,
+                scope=token_scope,
+                issuer=token_issuer,
+            )
+            if cache is not None:
+                cache.set(key, auth)
 
     # -- basic auth (netrc)
 
@@ -252,6 +1121,223 @@ def _prepare_auth(
     return auth, cert
 
 
+# -- Transport adapters ---------------
+
+def _client_ssl_context(cert, *, verify=True):
+    """Return an `ssl.SSLContext` with the X.509 ``cert`` loaded.
+
+    The context also has the CA bundle (as given by ``verify``)
+    loaded, and is cached so that it can be shared by all connections
+    that use the same credential.
+    The cached context is discarded if any of the files change.
+
+    Parameters
+    ----------
+    cert : `str`, `tuple`, `bytes`
+        The path of the combined certificate and key file, a
+        ``(cert, key)`` `tuple` of paths, or an in-memory credential
+        given as PEM-format `bytes`, or a ``(cert, key)`` `tuple` of
+        PEM-format `bytes` or `cryptography` objects.
+
+    verify : `bool`, `str`, optional
+        Whether to verify the server's TLS certificate, or the
+        path to a CA bundle (file or directory) to use.
+
+    Returns
+    -------
+    context : `ssl.SSLContext`
+        The configured context.
+    """
+    if verify is True:
+        verify = requests_utils.DEFAULT_CA_BUNDLE_PATH
+    if _is_in_memory_x509(cert):
+        # key on the content (the cache must not hold a reference)
+        paths = (verify,)
+        key = (hashlib.sha256(_x509_pem(cert)).hexdigest(), verify)
+    else:
+        if isinstance(cert, (str, os.PathLike)):
+            cert = (cert, None)
+        paths = key = (*cert, verify)
+    fingerprint = tuple(
+        file_fingerprint(path) if path else None
+        for path in paths
+    )
+
+    context = _SSL_CONTEXT_CACHE.get(key, fingerprint=fingerprint)
+    if context is not None:
+        return context
+
+    context = create_urllib3_context(
+        cert_reqs=ssl.CERT_REQUIRED if verify else ssl.CERT_NONE,
+    )
+    if verify and Path(verify).is_dir():
+        context.load_verify_locations(capath=verify)
+    elif verify:
+        context.load_verify_locations(cafile=verify)
+    _load_x509_cert_chain(context, cert)
+
+    _CLIENT_SSL_CONTEXTS.add(context)
+    _SSL_CONTEXT_CACHE.set(key, context, fingerprint=fingerprint)
+    return context
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    """HTTP connection that counts new and reused connections.
+
+    The first request sent over a connection is counted as ``new``,
+    and each later request (before the connection is closed) is
+    counted as ``reused``.
+    """
+
+    #: number of requests sent since the connection was (re)opened
+    _nrequests = 0
+
+    def request(self, *args, **kwargs):
+        """Send a request, counting whether the connection is reused."""
+        _CONNECTIONS.inc(result="reused" if self._nrequests else "new")
+        self._nrequests += 1
+        return super().request(*args, **kwargs)
+
+    def close(self):
+        """Close the connection, so that the next request is ``new``."""
+        self._nrequests = 0
+        return super().close()
+
+
+class _CountingHTTPSConnection(_CountingHTTPConnection, HTTPSConnection):
+    """HTTPS connection that counts new and reused connections."""
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+#: connection pool classes used by `X509HTTPAdapter` to count connections
+_COUNTING_POOL_CLASSES = {
+    "http": _CountingHTTPConnectionPool,
+    "https": _CountingHTTPSConnectionPool,
+}
+
+
+class X509HTTPAdapter(HTTPAdapter):
+    """HTTP adapter that loads X.509 client credentials only once.
+
+    By default, `urllib3` loads the client certificate, key, and CA bundle
+    from disk into a new `ssl.SSLContext` for every new connection.
+    This adapter instead uses a single context for each credential,
+    shared by all connections (and all adapters) that use it, which is
+    rebuilt only when the credential files change.
+
+    This adapter also supports in-memory X.509 credentials, given as
+    PEM-format `bytes` or `cryptography` objects, which are loaded
+    directly into the context.
+
+    Requests that don't use an X.509 credential are handled as normal.
+
+    In a child process created with `os.fork`, the connection pools
+    inherited from the parent are discarded, so that the child opens
+    its own connections.
+
+    Parameters
+    ----------
+    count_connections : `bool`, optional
+        If `True`, count new and reused connections in the
+        ``connections_total`` metric, see :mod:`igwn_auth_utils.metrics`;
+        this uses custom `urllib3` connection classes, so is disabled by
+        default, unless the ``IGWN_AUTH_UTILS_CONNECTION_METRICS``
+        environment variable is set.
+
+    args, kwargs
+        All other arguments are passed to
+        `requests.adapters.HTTPAdapter`.
+    """
+
+    __attrs__ = [*HTTPAdapter.__attrs__, "count_connections"]  # noqa: RUF012
+
+    def __init__(self, *args, count_connections=None, **kwargs):
+        """Create a new adapter, see the class docs for parameters."""
+        if count_connections is None:
+            count_connections = _bool_env(
+                "IGWN_AUTH_UTILS_CONNECTION_METRICS",
+                default=False,
+            )
+        # set before the parent calls init_poolmanager
+        self.count_connections = count_connections
+        super().__init__(*args, **kwargs)
+        register_after_fork(self)
+
+    def __setstate__(self, state):
+        """Restore the state of this adapter after unpickling."""
+        super().__setstate__(state)
+        register_after_fork(self)
+
+    def _after_fork(self):
+        """Discard all connection pools inherited from the parent process.
+
+        The connections are still in use by the parent, so a child that
+        uses them would corrupt the streams of both processes.
+        """
+        self.proxy_manager = {}
+        self.init_poolmanager(
+            self._pool_connections,
+            self._pool_maxsize,
+            block=self._pool_block,
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Initialise the pool manager, optionally counting connection reuse.
+
+        See `requests.adapters.HTTPAdapter.init_poolmanager` for details.
+        """
+        super().init_poolmanager(*args, **kwargs)
+        if self.count_connections:
+            self.poolmanager.pool_classes_by_scheme = _COUNTING_POOL_CLASSES
+
+    def build_connection_pool_key_attributes(
+        self,
+        request,
+        verify,
+        cert=None,
+    ):
+        """Build the pool key attributes for a request.
+
+        See `requests.adapters.HTTPAdapter.build_connection_pool_key_attributes`
+        for details.
+        """
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request,
+            verify,
+            cert=cert,
+        )
+        if cert and host_params["scheme"] == "https":
+            for key in ("cert_file", "key_file", "ca_certs", "ca_cert_dir"):
+                pool_kwargs.pop(key, None)
+            pool_kwargs["ssl_context"] = _client_ssl_context(cert, verify=verify)
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        """Configure certificate verification for a connection pool.
+
+        See `requests.adapters.HTTPAdapter.cert_verify` for details.
+        """
+        context = getattr(conn, "conn_kw", {}).get("ssl_context")
+        if cert and context in _CLIENT_SSL_CONTEXTS:
+            # the credential and CA bundle are already loaded in the
+            # context, so don't let urllib3 reload them for each connection
+            super().cert_verify(conn, url, verify, None)
+            conn.ca_certs = conn.ca_cert_dir = None
+            return
+        if _is_in_memory_x509(cert):
+            # in-memory credentials can't be used outside of a context
+            # (i.e. for plain HTTP), so just ignore them
+            cert = None
+        super().cert_verify(conn, url, verify, cert)
+
+
 # -- Session handling -----------------
 
 _auth_session_parameters = """
@@ -293,6 +1379,8 @@ Steps 2 and 3 are all tried independently, with all valid credentials
 (one per type) configured for the session.
 Only when SciTokens are disabled (``token=False``), will step 4 will be
 tried to configure basic username/password auth.
+If ``kerberos=True`` is given, Kerberos (HTTP Negotiate) auth is
+configured via :class:`HTTPKerberosAuth` in place of steps 2 and 4.
 It is up to the request receiver to handle the multiple credential
 types and prioritise between them.
 
@@ -325,11 +1413,14 @@ token_issuer : `str`
     :func:`igwn_auth_utils.find_scitoken` when discovering
     available tokens.
 
-cert : `str`, `tuple`, `bool`, optional
+cert : `str`, `tuple`, `bytes`, `bool`, optional
     X.509 credential input, one of
 
     - path to a PEM-format certificate file,
-    - a ``(cert, key)`` `tuple`,
+    - a ``(cert, key)`` `tuple` of paths,
+    - PEM-format certificate and key content (`bytes`),
+    - a ``(cert, key)`` `tuple` of in-memory PEM-format `bytes` or
+      `cryptography` certificate and private key objects,
     - `False`: disable using X.509 completely
     - `True`: discover a valid cert via
       :func:`igwn_auth_utils.find_x509_credentials` and
@@ -337,6 +1428,11 @@ cert : `str`, `tuple`, `bool`, optional
     - `None`: try and discover a valid cert, but
       try something else if that fails
 
+kerberos : `bool`, optional
+    If `True`, use Kerberos (HTTP Negotiate) authentication via
+    :class:`HTTPKerberosAuth`; this requires an existing Kerberos
+    credential, see :func:`igwn_auth_utils.kinit`.
+
 auth :  `tuple`, `object`, optional
     ``(username, password)`` `tuple` or other authentication/authorization
     object to attach to a `~requests.Request`.
@@ -384,6 +1480,11 @@ if sys.version_info < (3, 13, 0):
     _auth_session_parameters = indent(_auth_session_parameters, "    ").strip()
 
 
+def _hook_count_response(response, *args, **kwargs):  # noqa: ARG001
+    """Response hook to count responses by status code."""
+    _RESPONSES.inc(code=response.status_code)
+
+
 def _hook_raise_for_status(response, *args, **kwargs):
     """Response hook to raise exception for any HTTP error (status >= 400).
 
@@ -419,6 +1520,10 @@ class SessionAuthMixin:
     {parameters}
     """
 
+    # provided by requests.Session
+    hooks: dict
+    mount: Any
+
     def __init__(
         self,
         token=None,
@@ -430,31 +1535,58 @@ class SessionAuthMixin:
         url=None,
         force_noauth=False,
         fail_if_noauth=False,
+        *,
+        kerberos=False,
         **kwargs,
     ):
         # initialise session
         super().__init__(**kwargs)
 
+        # token auth handlers for individual requests, see _prepare_auth
+        self._token_auth_cache = TTLCache(maxsize=TOKEN_AUTH_CACHE_SIZE)
+
+        # count responses (before any are rejected by raise_for_status)
+        self.hooks["response"].insert(0, _hook_count_response)
+
+        # use an adapter that loads X.509 credentials only once
+        adapter = X509HTTPAdapter()
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
         # initialise auth handler and cert
         self._init_auth(
             url=url,
             auth=auth,
-            cert=cert,
-            token=token,
-            token_audience=token_audience,
-            token_scope=token_scope,
-            token_issuer=token_issuer,
-            force_noauth=force_noauth,
-            fail_if_noauth=fail_if_noauth,
+            config=AuthConfig(
+                token=token,
+                token_audience=token_audience,
+                token_scope=token_scope,
+                token_issuer=token_issuer,
+                cert=cert,
+                kerberos=kerberos,
+                force_noauth=force_noauth,
+                fail_if_noauth=fail_if_noauth,
+            ),
         )
 
-    def _init_auth(self, url=None, token=None, **kwargs):
-        """Initialise the auth handler for this `Session`."""
+    def _init_auth(self, url=None, auth=None, config=None, **kwargs):
+        """Initialise the auth handler for this `Session`.
+
+        The options are given as an `AuthConfig`, or as keyword arguments
+        from which to create one.
+        """
+        if config is None:
+            config = AuthConfig(**kwargs)
+
         # find creds if we can
-        self.auth, self.cert = _prepare_auth(url=url, token=token, **kwargs)
+        self.auth, self.cert = _prepare_auth(
+            url=url,
+            auth=auth,
+            config=config,
+        )
 
         # if we were given a token, use it now
-        if isinstance(token, (SciToken, str, bytes)):
+        if isinstance(config.token, (SciToken, str)):
             self.auth(self)
 
     @property
@@ -509,9 +1641,48 @@ class Session(
     ...     sess.get("https://science.example.com/api/important/data")
     """
 
-    __attrs__ = requests.Session.__attrs__ = [
-        "token",
-    ]
+    #: Whether to allow pickling a `Session` with an in-memory X.509
+    #: credential, which stores the private key unencrypted in the pickle
+    pickle_x509_keys = False
+
+    def __getstate__(self):
+        """Return the state of this `Session` for pickling.
+
+        The state is that of `requests.Session`, i.e. the headers,
+        cookies, auth handler, hooks, TLS settings, and the config of
+        each adapter.
+        The auth handler includes the token and any cached discovered
+        tokens, so that the session can be restored (e.g. in a worker
+        process) without repeating credential discovery.
+
+        A `Session` with an in-memory X.509 credential can only be
+        pickled if `pickle_x509_keys` is set to `True`, in which case
+        the credential is stored as PEM-format `bytes`, including the
+        unencrypted private key.
+
+        Raises
+        ------
+        TypeError
+            If this `Session` has an in-memory X.509 credential, and
+            `pickle_x509_keys` is not `True`.
+        """
+        state = super().__getstate__()
+        if _is_in_memory_x509(state["cert"]):
+            if not self.pickle_x509_keys:
+                msg = (
+                    f"cannot pickle '{type(self).__name__}' with an "
+                    "in-memory X.509 credential, set "
+                    "pickle_x509_keys=True to store the unencrypted "
+                    "private key in the pickle"
+                )
+                raise TypeError(msg)
+            state["cert"] = _x509_pem(state["cert"])
+        return state
+
+    def __setstate__(self, state):
+        """Restore the state of this `Session` after unpickling."""
+        super().__setstate__(state)
+        self._token_auth_cache = TTLCache(maxsize=TOKEN_AUTH_CACHE_SIZE)
 
     @wraps(requests.Session.request)
     def request(
@@ -525,6 +1696,7 @@ class Session(
         token_issuer=None,
         cert=None,
         auth=None,
+        kerberos=None,
         force_noauth=False,
         fail_if_noauth=False,
         **kwargs,
@@ -533,25 +1705,29 @@ class Session(
         auth, cert = _prepare_auth(
             url=url,
             auth=auth,
-            cert=cert,
-            token=token,
-            token_audience=token_audience,
-            token_scope=token_scope,
-            token_issuer=token_issuer,
-            force_noauth=force_noauth,
-            fail_if_noauth=fail_if_noauth,
+            config=AuthConfig(
+                token=token,
+                token_audience=token_audience,
+                token_scope=token_scope,
+                token_issuer=token_issuer,
+                cert=cert,
+                kerberos=kerberos,
+                force_noauth=force_noauth,
+                fail_if_noauth=fail_if_noauth,
+            ),
             session=self,
         )
 
         # continue with request
-        return super().request(
-            method,
-            url,
-            *args,
-            auth=auth,
-            cert=cert,
-            **kwargs,
-        )
+        with timer("request", method=method, url=url):
+            return super().request(
+                method,
+                url,
+                *args,
+                auth=auth,
+                cert=cert,
+                **kwargs,
+            )
 
 
 # update the docstrings to include the same parameter info
@@ -596,16 +1772,9 @@ def request(method, url, *args, session=None, **kwargs):
 
     # give the Session constructor everything for auth as well
     session_kw = {
-        k: kwargs[k] for k in (
-            "auth",
-            "cert",
-            "fail_if_noauth",
-            "force_noauth",
-            "token",
-            "token_audience",
-            "token_issuer",
-            "token_scope",
-        ) if k in kwargs
+        key: kwargs[key]
+        for key in ("auth", *AuthConfig.FIELDS)
+        if key in kwargs
     }
 
     # new session
@@ -663,3 +1832,92 @@ head = _request_wrapper_factory("head")
 patch = _request_wrapper_factory("patch")
 post = _request_wrapper_factory("post")
 put = _request_wrapper_factory("put")
+
+
+# -- multiprocessing workers ----------
+
+#: holds the `Session` created by `init_worker` in this process
+_WORKER: dict[str, Session] = {}
+
+
+def init_worker(url=None, **kwargs):
+    """Create a `Session` for the tasks run by a worker process.
+
+    This function is designed to be used as the ``initializer`` of a
+    `concurrent.futures.ProcessPoolExecutor` or `multiprocessing.Pool`,
+    so that credentials are discovered once per worker process, rather
+    than once per task.
+    The token for ``url`` is discovered, and the X.509 credential
+    (if any) is loaded, immediately, so that the first task doesn't
+    pay that cost either.
+
+    Tasks should then use `worker_session` to send requests.
+
+    Parameters
+    ----------
+    url : `str`, optional
+        The URL of the service that tasks will send requests to,
+        used to discover a token with the right audience.
+
+    kwargs
+        All other keyword arguments are passed to `Session`.
+
+    Returns
+    -------
+    session : `Session`
+        The new session.
+
+    Examples
+    --------
+    >>> from concurrent.futures import ProcessPoolExecutor
+    >>> from igwn_auth_utils.requests import init_worker, worker_session
+    >>> def task(path):
+    ...     return worker_session().get(
+    ...         f"https://science.example.com/api/{path}",
+    ...     ).json()
+    >>> with ProcessPoolExecutor(
+    ...     initializer=init_worker,
+    ...     initargs=("https://science.example.com",),
+    ... ) as pool:
+    ...     results = list(pool.map(task, paths))
+    """
+    session = Session(url=url, **kwargs)
+
+    # prime the token cache
+    auth = session.auth
+    if isinstance(auth, HTTPSciTokenAuth) and auth.token in (None, True):
+        auth._find_token_header(url=url, error=bool(auth.token))
+
+    # prime the SSL context cache, using the same CA bundle as requests will
+    if session.cert:
+        verify = session.verify
+        if url is not None:
+            verify = session.merge_environment_settings(
+                url,
+                {},
+                None,
+                verify,
+                None,
+            )["verify"]
+        _client_ssl_context(session.cert, verify=verify)
+
+    previous = _WORKER.pop("session", None)
+    if previous is not None:
+        previous.close()
+    _WORKER["session"] = session
+    return session
+
+
+def worker_session():
+    """Return the `Session` created by `init_worker` in this process.
+
+    Raises
+    ------
+    RuntimeError
+        If `init_worker` hasn't been called in this process.
+    """
+    try:
+        return _WORKER["session"]
+    except KeyError:
+        msg = "no worker session, call init_worker() first"
+        raise RuntimeError(msg) from None
@@ -9,7 +9,10 @@ import contextlib
 import logging
 import os
 import sys
+import threading
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -24,7 +27,20 @@ from scitokens import (
 from scitokens.utils.errors import SciTokensException
 from scitokens.scitokens import InvalidAuthorizationResource
 
+from ._cache import (
+    file_fingerprint,
+    register_after_fork,
+)
 from .error import IgwnAuthError
+from .metrics import (
+    counted,
+    counter,
+)
+from .timing import (
+    CandidateTrace,
+    timed,
+    timer,
+)
 
 try:
     from shlex import join as shlex_join
@@ -45,14 +61,50 @@ TOKEN_ERROR = (
 
 WINDOWS = os.name == "nt"
 
+#: Default number of threads to use in `find_token(parallel=True)`
+PARALLEL_MAX_WORKERS = 4
+
+#: count of discovery attempts
+_DISCOVERY = counter(
+    "discovery_total",
+    "Credential discovery attempts, by credential type and result.",
+    ("credential", "result"),
+)
+
+#: count of failures to deserialise a token
+_DESERIALIZE_ERRORS = counter(
+    "token_deserialize_errors_total",
+    "Discovered tokens that could not be deserialised.",
+)
+
+#: count of tokens acquired using `get_scitoken`
+_ACQUISITIONS = counter(
+    "get_scitoken_total",
+    "Token acquisitions using htgettoken, by result.",
+    ("result",),
+)
+
+#: Environment variables that affect token discovery
+_DISCOVERY_ENV = (
+    "SCITOKEN",
+    "SCITOKEN_FILE",
+    "_CONDOR_CREDS",
+    "BEARER_TOKEN",
+    "BEARER_TOKEN_FILE",
+    "XDG_RUNTIME_DIR",
+)
+
 
 # -- utilities --------------
 
 class Enforcer(_Enforcer):
     """Custom `scitokens.Enforcer for IGWN Auth Utils`."""
 
-    def __init__(self, *args, timeleft=0, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, issuer, audience=None, timeleft=0, **kwargs):
+        """Create a new enforcer, see `scitokens.Enforcer`."""
+        if isinstance(audience, tuple):  # scitokens only handles lists
+            audience = list(audience)
+        super().__init__(issuer, audience=audience, **kwargs)
         self._timeleft = timeleft
         self.add_validator("exp", self._validate_timeleft)
 
@@ -113,6 +165,31 @@ def is_valid_token(
         except (InvalidTokenError, SciTokensException):
             return False
 
+    msg = _token_failure(
+        token,
+        audience,
+        scope,
+        issuer=issuer,
+        timeleft=timeleft,
+    )
+    if msg is None:
+        return True
+    if warn:
+        warnings.warn(msg, stacklevel=2)
+    return False
+
+
+def _token_failure(token, audience, scope, issuer=None, timeleft=60):
+    """Return the reason that ``token`` is not valid.
+
+    See `is_valid_token` for details of the arguments.
+
+    Returns
+    -------
+    reason : `str`, `None`
+        The reason that the token failed validation, or `None` if
+        the token is valid.
+    """
     # allow not specifying a required issuer
     if issuer is None:  # borrow the issuer from the token itself
         issuer = token["iss"]
@@ -149,11 +226,9 @@ def is_valid_token(
         else:
             msg = enforcer.last_failure
         if not res:
-            if warn:
-                warnings.warn(msg)
-            return False
+            return msg or f"token not valid for scope '{scp}'"
 
-    return True
+    return None
 
 
 def target_audience(url, include_any=True):
@@ -299,6 +374,8 @@ def load_token_file(path, **kwargs):
 
 # -- discovery --------------
 
+@timed("find_token")
+@counted(_DISCOVERY, credential="scitoken")
 def find_token(
     audience,
     scope,
@@ -306,6 +383,9 @@ def find_token(
     timeleft=60,
     skip_errors=True,
     warn=False,
+    *,
+    parallel=False,
+    agent=None,
     **kwargs,
 ):
     """Find and load a `SciToken` for the given ``audience`` and ``scope``.
@@ -335,6 +415,20 @@ def find_token(
         emit a warning when a token fails to deserialize, or fails
         validation.
 
+    parallel : `bool`, `int`, optional
+        if `True`, or an `int` number of worker threads, load and validate
+        all discovered tokens concurrently, rather than one at a time;
+        this may be faster when multiple tokens are found and
+        deserialisation is slow (e.g. fetching signing keys from the
+        token issuer). The token returned is the same in both modes.
+
+    agent : `bool`, optional
+        if `True`, first ask the local credential agent (if running)
+        for a token, see :mod:`igwn_auth_utils.agent`; the default
+        (`None`) uses the agent only if the ``IGWN_AUTH_UTILS_AGENT``
+        environment variable is set. The agent is only used when no
+        ``kwargs`` are given.
+
     kwargs
         all keyword arguments are passed on to
         :meth:`scitokens.SciToken.deserialize`
@@ -353,12 +447,33 @@ def find_token(
     --------
     scitokens.SciToken.deserialize
         for details of the deserialisation, and any valid keyword arguments
+    explain_token
+        for details of how each candidate token was considered
     """
+    # ask the agent
+    if not kwargs and _agent_enabled(agent):
+        token = _find_token_from_agent(audience, scope, issuer, timeleft)
+        if token is not None:
+            return token
+
     # preserve error from parsing tokens
     error = None
 
     # iterate over all of the tokens we can find for this audience
-    for token in _find_tokens(audience=audience, **kwargs):
+    if parallel:
+        candidates = _find_valid_tokens_parallel(
+            audience,
+            scope,
+            issuer=issuer,
+            timeleft=timeleft,
+            max_workers=None if parallel is True else int(parallel),
+            **kwargs,
+        )
+    else:
+        candidates = (
+            (token, None) for token in _find_tokens(audience=audience, **kwargs)
+        )
+    for token, checked in candidates:
         # parsing a token yielded an exception, handle it here:
         if isinstance(token, Exception):
             error = error or token  # record (first) error for later
@@ -368,15 +483,21 @@ def find_token(
                 continue  # move on
             raise IgwnAuthError(str(error)) from error  # stop here and raise
 
+        # validate the token (if not already done), tokens that were
+        # validated in parallel are re-tested if invalid to emit a warning
+        valid = checked
+        if valid is None or (warn and not valid):
+            valid = is_valid_token(
+                token,
+                audience,
+                scope,
+                issuer=issuer,
+                timeleft=timeleft,
+                warn=warn,
+            )
+
         # if this token is valid, stop here and return it
-        if is_valid_token(
-            token,
-            audience,
-            scope,
-            issuer=issuer,
-            timeleft=timeleft,
-            warn=warn,
-        ):
+        if valid:
             return token
 
     # if we didn't find any valid tokens:
@@ -387,47 +508,304 @@ def find_token(
     ) from error
 
 
-def _find_tokens(**deserialize_kwargs):
-    """Yield all tokens that we can find.
+def explain_token(
+    audience,
+    scope,
+    issuer=None,
+    timeleft=60,
+    agent=None,
+    **kwargs,
+):
+    """Explain how `find_token` would find a token.
 
-    This function will `yield` exceptions that are raised when
-    attempting to parse a token that was actually found, so that
-    they can be handled by the caller.
+    Every candidate token that `find_token` would consider is loaded
+    and validated, in order of precedence, with the outcome recorded.
+    Unlike `find_token`, this doesn't stop at the first valid token,
+    so can be used to identify slow or useless candidates.
+
+    Parameters
+    ----------
+    audience, scope, issuer, timeleft, agent, kwargs
+        See `find_token`.
+
+    Returns
+    -------
+    trace : `list` of `~igwn_auth_utils.timing.CandidateTrace`
+        The outcome of considering each candidate, in order;
+        the first valid candidate is the token that `find_token`
+        would return.
+
+    Examples
+    --------
+    >>> for cand in explain_token("https://example.com", "read:/"):
+    ...     print(cand.source, cand.path, cand.valid, cand.reason)
+    SCITOKEN_FILE /tmp/mytoken False token not valid for scope 'read:/'
+    _CONDOR_CREDS /creds/igwn.use True None
     """
-    def _token_or_exception(func, *args, **kwargs):
-        try:
-            return func(*args, **kwargs)
-        except TOKEN_ERROR as exc:
-            return exc
+    trace = []
+
+    # ask the agent
+    if not kwargs and _agent_enabled(agent):
+        start = time.perf_counter()
+        token = _find_token_from_agent(audience, scope, issuer, timeleft)
+        if token is not None:
+            trace.append(CandidateTrace(
+                "agent",
+                None,
+                time.perf_counter() - start,
+                valid=True,
+                reason=None,
+            ))
+
+    for source, loader, arg in _token_loaders():
+        start = time.perf_counter()
+        token = _load_token(
+            loader,
+            arg,
+            source=source,
+            audience=audience,
+            **kwargs,
+        )
+        if token is None:  # nothing found
+            continue
+        if isinstance(token, Exception):
+            reason = f"{type(token).__name__}: {token}"
+        else:
+            reason = _token_failure(
+                token,
+                audience,
+                scope,
+                issuer=issuer,
+                timeleft=timeleft,
+            )
+        trace.append(CandidateTrace(
+            source,
+            _candidate_path(loader, arg),
+            time.perf_counter() - start,
+            reason is None,
+            reason,
+        ))
+    return trace
+
+
+def _agent_enabled(agent):
+    """Return whether to ask the local credential agent for a token."""
+    # import here to allow running the agent via `python -m`
+    from . import agent as _agent
 
+    return _agent.enabled(agent)
+
+
+def _find_token_from_agent(audience, scope, issuer, timeleft):
+    """Ask the local credential agent for a valid token.
+
+    Returns `None` if no agent is running, or it didn't provide a
+    valid token.
+    """
+    # import here to allow running the agent via `python -m`
+    from . import agent as _agent
+
+    raw = _agent.find_token(
+        audience,
+        scope,
+        issuer=issuer,
+        timeleft=timeleft,
+        env=_DISCOVERY_ENV,
+    )
+    if raw is None:
+        return None
+    try:
+        token = deserialize_token(raw, audience=audience)
+    except TOKEN_ERROR as exc:
+        log.debug("Failed to deserialise token from agent: %s", exc)
+        return None
+    if is_valid_token(token, audience, scope, issuer=issuer, timeleft=timeleft):
+        return token
+    return None
+
+
+def _token_loaders():
+    """Yield ``(source, loader, arg)`` to load all tokens that we can find.
+
+    These are yielded in order of precedence, ``source`` is a short
+    description of where the token comes from, and ``loader`` should be
+    called via `_load_token`.
+    """
     # read token directly from 'SCITOKEN{_FILE}' variable
     for envvar, loader in (
         ('SCITOKEN', deserialize_token),
         ('SCITOKEN_FILE', load_token_file),
     ):
         if envvar in os.environ:
-            yield _token_or_exception(
-                loader,
-                os.environ[envvar],
-                **deserialize_kwargs,
-            )
+            yield envvar, loader, os.environ[envvar]
 
     # try and find a token from HTCondor
     for tokenfile in _find_condor_creds_token_paths():
-        yield _token_or_exception(
-            load_token_file,
-            tokenfile,
-            **deserialize_kwargs,
-        )
+        yield "_CONDOR_CREDS", load_token_file, tokenfile
+
+    # use the WLCG Bearer Token Discovery protocol
+    yield "discover", _discover_token, None
+
+
+def _discover_token(_, **kwargs):
+    """Discover a token using `scitokens.SciToken.discover`.
 
+    Returns `None` if no token is found.
+    """
     try:
-        yield _token_or_exception(SciToken.discover, **deserialize_kwargs)
+        return SciToken.discover(**kwargs)
     except OSError:  # no token
-        pass  # try something else
+        return None
     except AttributeError as exc:
         # windows doesn't have geteuid, that's ok, otherwise panic
         if not WINDOWS or "geteuid" not in str(exc):
             raise
+        return None
+
+
+def _candidate_path(loader, arg):
+    """Return the path of a token candidate, or `None`."""
+    if loader is load_token_file:  # only report file paths, not tokens
+        return str(arg)
+    return None
+
+
+def _load_token(loader, arg, source=None, **deserialize_kwargs):
+    """Load a token using ``loader``, returning any errors in parsing it."""
+    with timer(
+        "token_candidate",
+        source=source,
+        path=_candidate_path(loader, arg),
+    ):
+        try:
+            return loader(arg, **deserialize_kwargs)
+        except TOKEN_ERROR as exc:
+            _DESERIALIZE_ERRORS.inc()
+            return exc
+
+
+def _find_tokens(**deserialize_kwargs):
+    """Yield all tokens that we can find.
+
+    This function will `yield` exceptions that are raised when
+    attempting to parse a token that was actually found, so that
+    they can be handled by the caller.
+    """
+    for source, loader, arg in _token_loaders():
+        token = _load_token(loader, arg, source=source, **deserialize_kwargs)
+        if token is not None:
+            yield token
+
+
+class _Executors:
+    """Thread pools for `_find_valid_tokens_parallel`, created on demand.
+
+    One pool is created for each ``max_workers`` and then shared by
+    all calls, so that repeated token discovery doesn't have to start
+    new threads each time.
+    Idle pool threads are cheap, and exit with the interpreter.
+    """
+
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
+        register_after_fork(self)
+
+    def _after_fork(self):
+        """Forget the pools of the parent, whose threads don't exist here."""
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, max_workers):
+        """Return the thread pool with ``max_workers`` threads."""
+        with self._lock:
+            pool = self._pools.get(max_workers)
+            if pool is None:
+                pool = self._pools[max_workers] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="igwn_auth_utils.find_token",
+                )
+            return pool
+
+
+#: shared thread pools for `find_token(parallel=True)`
+_EXECUTORS = _Executors()
+
+
+def _find_valid_tokens_parallel(
+    audience,
+    scope,
+    issuer=None,
+    timeleft=60,
+    max_workers=None,
+    **deserialize_kwargs,
+):
+    """Yield ``(token, valid)`` pairs for all tokens that we can find.
+
+    All tokens are loaded and validated concurrently in a shared
+    thread pool (see `_Executors`), but are yielded in the same order
+    of precedence as `_find_tokens`.
+    As with `_find_tokens`, errors in parsing a token are yielded in
+    place of the token (with ``valid=False``).
+
+    Any work that is still pending when the generator is closed
+    is cancelled.
+    """
+    def _load_and_validate(source, loader, arg):
+        token = _load_token(
+            loader,
+            arg,
+            source=source,
+            audience=audience,
+            **deserialize_kwargs,
+        )
+        if token is None or isinstance(token, Exception):
+            return token, False
+        return token, is_valid_token(
+            token,
+            audience,
+            scope,
+            issuer=issuer,
+            timeleft=timeleft,
+        )
+
+    if max_workers is None:
+        max_workers = PARALLEL_MAX_WORKERS
+    pool = _EXECUTORS.get(max_workers)
+    futures = [
+        pool.submit(_load_and_validate, *candidate)
+        for candidate in _token_loaders()
+    ]
+    try:
+        for future in futures:
+            token, valid = future.result()
+            if token is not None:
+                yield token, valid
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def _discovery_fingerprint():
+    """Return a fingerprint of the locations searched by `_find_tokens`.
+
+    This includes the values of all relevant environment variables and
+    the state of all relevant files and directories, so can be used to
+    invalidate cached discovery results when any of those change.
+    """
+    env = tuple(os.environ.get(key) for key in _DISCOVERY_ENV)
+    paths = [
+        os.environ.get("SCITOKEN_FILE"),
+        os.environ.get("_CONDOR_CREDS"),
+        os.environ.get("BEARER_TOKEN_FILE"),
+    ]
+    if not WINDOWS:  # see scitokens.SciToken.discover
+        tokendir = Path(os.getenv("XDG_RUNTIME_DIR", "/tmp"))  # noqa: S108
+        paths.append(str(tokendir / f"bt_u{os.geteuid()}"))
+    # tokens in the condor creds directory can be rewritten in place,
+    # which doesn't change the directory itself
+    paths.extend(sorted(_find_condor_creds_token_paths()))
+    return env + tuple(map(file_fingerprint, paths))
 
 
 def _find_condor_creds_token_paths():
@@ -476,6 +854,7 @@ def default_bearer_token_file(prefix="bt_"):
     return str(tokendir / f"{prefix}{user}")
 
 
+@counted(_ACQUISITIONS)
 def get_scitoken(
     *args,
     outfile=None,
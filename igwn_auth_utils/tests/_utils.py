@@ -0,0 +1,60 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Helpers shared by the test suite and the load test.
+
+These don't depend on `pytest`, so can be imported by worker processes.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import ipaddress
+from datetime import (
+    datetime,
+    timedelta,
+    timezone,
+)
+
+from cryptography import x509
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import (
+    hashes,
+    serialization,
+)
+from cryptography.x509.oid import NameOID
+
+
+def self_signed_certificate(private_key, hostname="localhost"):
+    """Create a self-signed X.509 certificate for ``hostname``."""
+    name = x509.Name([
+        x509.NameAttribute(NameOID.COMMON_NAME, hostname),
+    ])
+    now = datetime.now(timezone.utc)
+    return x509.CertificateBuilder(
+        issuer_name=name,
+        subject_name=name,
+        public_key=private_key.public_key(),
+        serial_number=x509.random_serial_number(),
+        not_valid_before=now - timedelta(seconds=60),
+        not_valid_after=now + timedelta(seconds=86400),
+    ).add_extension(
+        x509.SubjectAlternativeName([
+            x509.DNSName(hostname),
+            x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]),
+        critical=False,
+    ).sign(private_key, hashes.SHA256(), backend=default_backend())
+
+
+def write_credential(cert, private_key, path):
+    """Write a combined PEM-format certificate and key file."""
+    path.write_bytes(
+        cert.public_bytes(serialization.Encoding.PEM)
+        + private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.TraditionalOpenSSL,
+            encryption_algorithm=serialization.NoEncryption(),
+        ),
+    )
+    path.chmod(0o600)
+    return path
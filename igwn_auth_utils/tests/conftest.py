@@ -5,12 +5,60 @@
 
 __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 
+import base64
+import ssl
+import threading
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
 
 import pytest
 
+from .._cache import clear_caches
+from ..agent import (
+    ENABLE_ENV as AGENT_ENABLE_ENV,
+    SOCKET_ENV as AGENT_SOCKET_ENV,
+)
+from ._utils import (
+    self_signed_certificate,
+    write_credential,
+)
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless they are selected with ``-m benchmark``.
+
+    This is done here, rather than with ``addopts``, so that it also
+    applies when the tests are run with ``--pyargs igwn_auth_utils``.
+    """
+    if "benchmark" in (config.getoption("markexpr") or ""):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with -m benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Clear all internal caches before each test."""
+    clear_caches()
+
+
+@pytest.fixture(autouse=True)
+def _no_agent(monkeypatch, tmp_path_factory):
+    """Stop tests from using any real credential agent."""
+    monkeypatch.delenv(AGENT_ENABLE_ENV, raising=False)
+    monkeypatch.setenv(
+        AGENT_SOCKET_ENV,
+        str(tmp_path_factory.getbasetemp() / "no-agent.sock"),
+    )
+
 
 @pytest.fixture(scope="session")  # one per suite is fine
 def private_key():
@@ -44,3 +92,125 @@ def public_pem_path(public_pem, tmp_path):
     with open(pem_path, "wb") as file:
         file.write(public_pem)
     return pem_path
+
+
+# -- X.509 / HTTPS ------------------------------
+
+@pytest.fixture
+def x509_credential_path(private_key, tmp_path):
+    """Return the path of a combined client X.509 certificate and key."""
+    return write_credential(
+        self_signed_certificate(private_key, hostname="client"),
+        private_key,
+        tmp_path / "client.pem",
+    )
+
+
+class _HTTPSHandler(BaseHTTPRequestHandler):
+    """Request handler that reports the client certificate subject."""
+
+    protocol_version = "HTTP/1.1"  # allow connection reuse
+
+    def do_GET(self):
+        peercert = self.connection.getpeercert() or {}
+        body = str(dict(x[0] for x in peercert.get("subject", ()))).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def https_server(private_key, x509_credential_path, tmp_path):
+    """Run an HTTPS server (that accepts ``x509_credential_path``).
+
+    Yields the server URL and the path of its certificate (to use as
+    the CA bundle for clients).
+    """
+    server_cert = write_credential(
+        self_signed_certificate(private_key, hostname="localhost"),
+        private_key,
+        tmp_path / "server.pem",
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(server_cert)
+    context.load_verify_locations(x509_credential_path)
+    context.verify_mode = ssl.CERT_OPTIONAL
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _HTTPSHandler)
+    server.daemon_threads = True
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"https://localhost:{server.server_port}", server_cert
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class _NegotiateHandler(BaseHTTPRequestHandler):
+    """Request handler that requires HTTP Negotiate or a session cookie.
+
+    The only valid ``Negotiate`` token is ``b"client-token"``.
+    """
+
+    server: "_NegotiateServer"
+
+    def do_GET(self):
+        auth = self.headers.get("Authorization", "")
+        cookie = self.headers.get("Cookie", "")
+        if cookie == "session=ok":
+            self.server.requests.append("cookie")
+            self._respond(200)
+        elif auth == "Negotiate " + base64.b64encode(b"client-token").decode():
+            self.server.requests.append("negotiate")
+            self._respond(200, {
+                "Set-Cookie": "session=ok",
+                "WWW-Authenticate": "Negotiate " + base64.b64encode(
+                    b"server-token",
+                ).decode(),
+            })
+        else:
+            self.server.requests.append("none")
+            self._respond(401, {"WWW-Authenticate": "Negotiate"})
+
+    def _respond(self, status, headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class _NegotiateServer(ThreadingHTTPServer):
+    """HTTP server that records how each request was authenticated."""
+
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        """Create a new server with an empty record of requests."""
+        super().__init__(*args, **kwargs)
+        self.requests = []
+
+
+@pytest.fixture
+def negotiate_server():
+    """Run an HTTP server that requires Kerberos (Negotiate) auth.
+
+    Yields the server URL and the list of how each request was
+    authenticated (``"negotiate"``, ``"cookie"``, or ``"none"``).
+    """
+    server = _NegotiateServer(("127.0.0.1", 0), _NegotiateHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://localhost:{server.server_port}", server.requests
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,246 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Tests for :mod:`igwn_auth_utils.agent`."""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import os
+import socket
+from functools import partial
+from unittest import mock
+
+import pytest
+from scitokens import SciToken
+
+from .. import (
+    agent as igwn_agent,
+    scitokens as igwn_scitokens,
+    x509 as igwn_x509,
+)
+from .test_scitokens import (
+    READ_AUDIENCE,
+    READ_SCOPE,
+    assert_tokens_equal,
+    rtoken,  # noqa: F401
+)
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"),
+    reason="Unix domain sockets not supported",
+)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    """Run a `CredentialAgent` for the duration of a test."""
+    # use a short path, Unix socket paths are limited to ~100 characters
+    path = tmp_path / "a.sock"
+    monkeypatch.setenv(igwn_agent.SOCKET_ENV, str(path))
+    with igwn_agent.CredentialAgent(path, refresh=60) as agent:
+        yield agent
+
+
+@mock.patch.dict("os.environ")
+def test_socket_path(tmp_path):
+    """Test `socket_path()`."""
+    os.environ.pop(igwn_agent.SOCKET_ENV, None)
+    os.environ["XDG_RUNTIME_DIR"] = str(tmp_path)
+    assert igwn_agent.socket_path() == (
+        tmp_path / f"igwn-auth-utils-agent-{os.getuid()}.sock"
+    )
+    os.environ[igwn_agent.SOCKET_ENV] = "/path/to/agent.sock"
+    assert str(igwn_agent.socket_path()) == "/path/to/agent.sock"
+
+
+@mock.patch.dict("os.environ")
+def test_socket_path_tmpdir(tmp_path):
+    """Test `socket_path()` uses a per-user temporary directory."""
+    os.environ.pop(igwn_agent.SOCKET_ENV, None)
+    os.environ.pop("XDG_RUNTIME_DIR", None)
+    with mock.patch("tempfile.gettempdir", return_value=str(tmp_path)):
+        assert igwn_agent.socket_path() == (
+            tmp_path / f"igwn-auth-utils-{os.getuid()}" / "agent.sock"
+        )
+
+
+def test_agent_socket_permissions(tmp_path):
+    """Test that the agent creates a private directory and socket."""
+    path = tmp_path / "private" / "a.sock"
+    with igwn_agent.CredentialAgent(path):
+        assert path.parent.stat().st_mode & 0o777 == 0o700
+        assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_agent_no_peercred(tmp_path, monkeypatch):
+    """Test that the agent won't start if it can't identify clients."""
+    monkeypatch.delattr(socket, "SO_PEERCRED", raising=False)
+    with pytest.raises(OSError, match="SO_PEERCRED"):
+        igwn_agent.CredentialAgent(tmp_path / "a.sock").start()
+
+
+@pytest.mark.usefixtures("agent")
+def test_agent_unknown_peer():
+    """Test that the agent rejects clients it can't identify."""
+    with mock.patch.object(igwn_agent, "_peer_uid", return_value=None):
+        assert igwn_agent.query({"op": "ping"}) is None
+
+
+def test_agent_insecure_directory(tmp_path):
+    """Test that the agent refuses to serve from a shared directory."""
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(OSError, match="no access for other users"):
+        igwn_agent.CredentialAgent(shared / "a.sock").start()
+
+
+def test_query_no_agent(tmp_path):
+    """Test that `query()` returns `None` when no agent is running."""
+    assert igwn_agent.query({"op": "ping"}, path=tmp_path / "a.sock") is None
+    # a regular file is not an agent
+    (tmp_path / "a.sock").touch()
+    assert igwn_agent.query({"op": "ping"}, path=tmp_path / "a.sock") is None
+
+
+@pytest.mark.usefixtures("agent")
+def test_agent_ping():
+    """Test that a running agent answers."""
+    assert igwn_agent.query({"op": "ping"}) == {"pong": True}
+    assert igwn_agent.query({"op": "bad"}) == {
+        "error": "unknown operation 'bad'",
+    }
+
+
+def test_agent_already_running(agent):
+    """Test that a second agent can't serve the same socket."""
+    with pytest.raises(OSError, match="already running"):
+        igwn_agent.CredentialAgent(agent.path).start()
+
+
+@pytest.mark.usefixtures("agent")
+@mock.patch.dict("os.environ")
+def test_find_token(rtoken, public_pem):  # noqa: F811
+    """Test that `find_token()` uses the agent, which caches tokens."""
+    os.environ["SCITOKEN"] = rtoken.serialize().decode("utf-8")
+    # the agent doesn't forward deserialisation options, so
+    # apply the test options to all deserialisations
+    with mock.patch.object(SciToken, "deserialize", partial(
+        SciToken.deserialize,
+        insecure=True,
+        public_key=public_pem,
+    )), mock.patch(
+        "igwn_auth_utils.scitokens._find_tokens",
+        wraps=igwn_scitokens._find_tokens,
+    ) as find_tokens:
+        for _ in range(3):
+            token = igwn_scitokens.find_token(
+                READ_AUDIENCE,
+                READ_SCOPE,
+                agent=True,
+            )
+            assert_tokens_equal(token, rtoken)
+    # discovery was only performed once, by the agent
+    find_tokens.assert_called_once()
+
+
+@pytest.mark.usefixtures("agent")
+@mock.patch.dict("os.environ")
+def test_find_token_default(rtoken, public_pem):  # noqa: F811
+    """Test that `find_token()` doesn't use the agent unless asked."""
+    os.environ["SCITOKEN"] = rtoken.serialize().decode("utf-8")
+    with mock.patch.object(SciToken, "deserialize", partial(
+        SciToken.deserialize,
+        insecure=True,
+        public_key=public_pem,
+    )), mock.patch.object(
+        igwn_agent,
+        "find_token",
+        return_value=None,
+    ) as find_token:
+        igwn_scitokens.find_token(READ_AUDIENCE, READ_SCOPE)
+        find_token.assert_not_called()
+        os.environ[igwn_agent.ENABLE_ENV] = "1"
+        igwn_scitokens.find_token(READ_AUDIENCE, READ_SCOPE)
+        find_token.assert_called_once()
+
+
+@mock.patch.dict("os.environ")
+def test_find_token_env_mismatch(agent, rtoken):  # noqa: F811
+    """Test that the agent isn't used if the environments don't match."""
+    os.environ["SCITOKEN"] = rtoken.serialize().decode("utf-8")
+    assert agent.lookup({
+        "op": "find_token",
+        "audience": READ_AUDIENCE,
+        "scope": READ_SCOPE,
+        "env": {"SCITOKEN": "something else"},
+    }) == {"error": "client environment doesn't match agent"}
+
+
+@pytest.mark.usefixtures("agent")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@mock.patch.dict("os.environ")
+def test_find_credentials(x509_credential_path):
+    """Test that `find_credentials()` uses the agent."""
+    os.environ["X509_USER_PROXY"] = str(x509_credential_path)
+    os.environ[igwn_agent.ENABLE_ENV] = "1"
+    with mock.patch(
+        "igwn_auth_utils.x509._find_credentials",
+        wraps=igwn_x509._find_credentials,
+    ) as find_creds:
+        for _ in range(3):
+            assert igwn_x509.find_credentials(
+                timeleft=0,
+            ) == str(x509_credential_path)
+    find_creds.assert_called_once()
+
+
+@pytest.mark.usefixtures("agent")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@mock.patch.dict("os.environ")
+def test_find_credentials_invalid(tmp_path, x509_credential_path):
+    """Test that credentials from the agent are validated locally."""
+    os.environ["X509_USER_PROXY"] = str(x509_credential_path)
+    bad = tmp_path / "bad.pem"
+    bad.write_text("not a certificate")
+    with mock.patch.object(
+        igwn_agent,
+        "find_credentials",
+        return_value=str(bad),
+    ) as find_creds:
+        assert igwn_x509.find_credentials(
+            timeleft=0,
+            agent=True,
+        ) == str(x509_credential_path)
+    find_creds.assert_called_once()
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@mock.patch.dict("os.environ", clear=True)
+def test_agent_error_fallback(agent):
+    """Test that failed lookups fall back to local discovery."""
+    os.environ[igwn_agent.SOCKET_ENV] = str(agent.path)
+    with mock.patch(
+        "igwn_auth_utils.x509._find_credentials",
+        return_value=[],
+    ) as find_creds, pytest.raises(
+        igwn_x509.IgwnAuthError,
+    ):
+        igwn_x509.find_credentials(agent=True)
+    # once in the agent, then again locally
+    assert find_creds.call_count == 2
+
+
+def test_refresh_all(agent):
+    """Test that `refresh_all()` repeats recent lookups."""
+    request = {"op": "find_credentials", "timeleft": 0}
+    with mock.patch.object(
+        agent,
+        "_resolve",
+        return_value=({"credentials": "cert.pem"}, 100),
+    ) as resolve:
+        agent.lookup(dict(request))
+        agent.lookup(dict(request))
+        assert resolve.call_count == 1
+        agent.refresh_all()
+        assert resolve.call_count == 2
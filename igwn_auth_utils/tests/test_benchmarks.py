@@ -0,0 +1,180 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+r"""Benchmarks for credential discovery and request overhead.
+
+These tests require `pytest-benchmark`, and are skipped if it isn't
+installed.
+All benchmarks are marked with ``benchmark``, and are skipped unless
+selected with ``-m benchmark`` (see ``conftest.py``).
+To run the benchmarks and save the results for later comparison:
+
+.. code-block:: bash
+
+    python -m pytest igwn_auth_utils/tests/test_benchmarks.py \\
+        -m benchmark --benchmark-only --benchmark-autosave
+
+and then to compare saved runs:
+
+.. code-block:: bash
+
+    pytest-benchmark compare --group-by=name
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import os
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from .. import (
+    requests as igwn_requests,
+    scitokens as igwn_scitokens,
+    x509 as igwn_x509,
+)
+from .._cache import clear_caches
+from .test_scitokens import (
+    READ_AUDIENCE,
+    READ_SCOPE,
+    WRITE_AUDIENCE,
+    _create_token,
+    _write_token,
+    rtoken,  # noqa: F401
+    rtoken_path,  # noqa: F401
+)
+
+NTOKENS = (1, 10, 50)
+NSCOPES = (1, 10, 50)
+NMACHINES = (1, 100)
+
+
+# -- SciTokens -----------------------
+
+@pytest.mark.benchmark(group="find_token")
+@pytest.mark.parametrize("ntokens", NTOKENS)
+@mock.patch.dict("os.environ", clear=True)
+def test_find_token_condor_creds(
+    benchmark,
+    private_key,
+    public_pem,
+    tmp_path,
+    ntokens,
+):
+    """Benchmark `find_token` with many tokens in ``_CONDOR_CREDS``.
+
+    Only one token matches the requested audience.
+    """
+    for i in range(ntokens - 1):
+        _write_token(
+            _create_token(key=private_key, aud=WRITE_AUDIENCE),
+            tmp_path / f"other{i}.use",
+        )
+    _write_token(_create_token(key=private_key), tmp_path / "read.use")
+    os.environ["_CONDOR_CREDS"] = str(tmp_path)
+
+    token = benchmark(
+        igwn_scitokens.find_token,
+        READ_AUDIENCE,
+        READ_SCOPE,
+        insecure=True,
+        public_key=public_pem,
+    )
+    assert token["aud"] == READ_AUDIENCE
+
+
+@pytest.mark.benchmark(group="is_valid_token")
+@pytest.mark.parametrize("nscopes", NSCOPES)
+def test_is_valid_token(benchmark, private_key, nscopes):
+    """Benchmark `is_valid_token` for a token with many scopes."""
+    scopes = [f"read:/path{i}" for i in range(nscopes - 1)] + [READ_SCOPE]
+    token = _create_token(key=private_key, scope=" ".join(scopes))
+    assert benchmark(
+        igwn_scitokens.is_valid_token,
+        token,
+        READ_AUDIENCE,
+        READ_SCOPE,
+    )
+
+
+# -- X.509 ---------------------------
+
+@pytest.mark.benchmark(group="find_x509_credentials")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@pytest.mark.parametrize("cached", [False, True])
+@mock.patch.dict("os.environ")
+def test_find_x509_credentials(benchmark, x509_credential_path, cached):
+    """Benchmark `find_x509_credentials` with and without warm caches."""
+    os.environ["X509_USER_PROXY"] = str(x509_credential_path)
+    cred = benchmark.pedantic(
+        igwn_x509.find_credentials,
+        kwargs={"timeleft": 0},
+        setup=None if cached else clear_caches,
+        rounds=100,
+        warmup_rounds=1,
+    )
+    assert cred == str(x509_credential_path)
+
+
+# -- netrc ---------------------------
+
+@pytest.mark.benchmark(group="get_netrc_auth")
+@pytest.mark.parametrize("nmachines", NMACHINES)
+@mock.patch.dict("os.environ")
+def test_get_netrc_auth(benchmark, tmp_path, nmachines):
+    """Benchmark `get_netrc_auth` with a netrc file of many machines."""
+    netrc = tmp_path / "netrc"
+    netrc.write_text("\n".join(
+        f"machine host{i}.example.com login user{i} password pass{i}"
+        for i in range(nmachines)
+    ))
+    netrc.chmod(0o600)
+    os.environ["NETRC"] = str(netrc)
+    url = f"https://host{nmachines - 1}.example.com/data"
+    assert benchmark(igwn_requests.get_netrc_auth, url) == (
+        f"user{nmachines - 1}",
+        f"pass{nmachines - 1}",
+    )
+
+
+# -- requests ------------------------
+
+@pytest.mark.benchmark(group="_prepare_auth")
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@mock.patch.dict("os.environ", clear=True)
+def test_prepare_auth(
+    benchmark,
+    x509_credential_path,
+    rtoken_path,  # noqa: F811
+):
+    """Benchmark `_prepare_auth` with token and X.509 discovery."""
+    os.environ["X509_USER_PROXY"] = str(x509_credential_path)
+    os.environ["SCITOKEN_FILE"] = str(rtoken_path)
+    auth, cert = benchmark(
+        igwn_requests._prepare_auth,
+        url="https://example.com/data",
+    )
+    assert isinstance(auth, igwn_requests.HTTPSciTokenAuth)
+    assert cert == str(x509_credential_path)
+
+
+@pytest.mark.benchmark(group="Session.get")
+@pytest.mark.parametrize("auth", ["token", "x509"])
+def test_session_get(
+    benchmark,
+    https_server,
+    x509_credential_path,
+    rtoken,  # noqa: F811
+    auth,
+):
+    """Benchmark `Session.get` requests to a local HTTPS server."""
+    url, server_cert = https_server
+    if auth == "token":
+        kwargs = {"token": rtoken, "cert": False}
+    else:
+        kwargs = {"token": False, "cert": str(x509_credential_path)}
+    with igwn_requests.Session(**kwargs) as sess:
+        resp = benchmark(sess.get, url, verify=str(server_cert))
+    assert resp.status_code == 200
@@ -6,24 +6,29 @@
 __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 
 import os
+import struct
+import time
+from pathlib import Path
 from unittest import mock
 
 import pytest
 
 from .. import kerberos
 
-# with pytest >= 8.2.0 this can be replaced with
-# pytest.importorskip("gssapi", exc_type=(ImportError, OSError))
+GSSAPI_IMPORT_ERROR = None
 try:
     import gssapi
 except (
     ImportError,  # module not installed
     OSError,  # Kerberos implementation not available (Windows)
 ) as exc:
-    pytest.skip(
-       f"could not import 'gssapi': {exc}",
-       allow_module_level=True,
-    )
+    gssapi = None
+    GSSAPI_IMPORT_ERROR = str(exc)
+
+requires_gssapi = pytest.mark.skipif(
+    gssapi is None,
+    reason=f"could not import 'gssapi': {GSSAPI_IMPORT_ERROR}",
+)
 
 
 def kerberos_name(name):
@@ -44,6 +49,7 @@ def keytab(tmp_path):
     return keytab
 
 
+@requires_gssapi
 @mock.patch("gssapi.Credentials")
 def test_kinit_keytab(creds, keytab):
     """Test `kinit()`."""
@@ -65,6 +71,7 @@ def test_kinit_keytab(creds, keytab):
     )
 
 
+@requires_gssapi
 @mock.patch.dict("os.environ")
 @mock.patch("gssapi.Credentials")
 def test_kinit_keytab_env(creds, keytab):
@@ -81,6 +88,224 @@ def test_kinit_keytab_env(creds, keytab):
     )
 
 
+@requires_gssapi
+@mock.patch.dict("os.environ", clear=True)
+@mock.patch("gssapi.Credentials")
+def test_kinit_no_environ(creds, keytab):
+    """Test that `kinit()` doesn't modify the environment."""
+    creds.side_effect = lambda *_args, **_kwargs: mock.MagicMock(
+        environ=dict(os.environ),
+    )
+    result = kerberos.kinit("rainer.weiss@LIGO.ORG", keytab=keytab)
+    assert result.environ == {}
+
+
+@requires_gssapi
+@mock.patch("gssapi.Credentials")
+def test_keytab_principal(creds, keytab):
+    """Test that `_keytab_principal()` falls back to using gssapi."""
+    creds.return_value.name = kerberos_name("rainer.weiss@LIGO.ORG")
+    assert kerberos._keytab_principal(keytab) == creds.return_value.name
+    creds.assert_called_once_with(
+        store={"keytab": str(keytab)},
+        usage="accept",
+    )
+
+
+def test_keytab_principal_missing(mock_gssapi, tmp_path):
+    """Test that `_keytab_principal()` leaves missing keytabs to gssapi."""
+    keytab = tmp_path / "missing"
+    kerberos._keytab_principal(keytab)
+    mock_gssapi.Credentials.assert_called_once_with(
+        store={"keytab": str(keytab)},
+        usage="accept",
+    )
+
+
+def _keytab_entry(principal, kvno, enctype, timestamp=0, *, version=2):
+    """Return the binary encoding of a keytab entry."""
+    order = "=" if version == 1 else ">"
+    name, realm = principal.rsplit("@", 1)
+    components = name.split("/")
+
+    def _counted(value):
+        return struct.pack(f"{order}H", len(value)) + value
+
+    ncomp = len(components) + (version == 1)
+    data = struct.pack(f"{order}H", ncomp) + _counted(realm.encode())
+    for comp in components:
+        data += _counted(comp.encode())
+    if version != 1:
+        data += struct.pack(f"{order}I", 1)  # KRB5_NT_PRINCIPAL
+    data += struct.pack(f"{order}IBH", timestamp, kvno % 256, enctype)
+    data += _counted(os.urandom(16))
+    data += struct.pack(f"{order}I", kvno)
+    return struct.pack(f"{order}i", len(data)) + data
+
+
+def _write_keytab(path, entries, version=2):
+    """Write a keytab file containing ``entries``."""
+    order = "=" if version == 1 else ">"
+    data = bytes((5, version))
+    for entry in entries:
+        if entry is None:  # write a hole
+            data += struct.pack(f"{order}i", -8) + bytes(8)
+            continue
+        data += _keytab_entry(*entry, version=version)
+    path.write_bytes(data)
+    path.chmod(0o400)
+    return path
+
+
+KEYTAB_ENTRIES = [
+    ("robot/host.example.com@EXAMPLE.COM", 3, 18, 1700000000),
+    None,
+    ("robot/host.example.com@EXAMPLE.COM", 3, 17, 1700000000),
+    ("other@EXAMPLE.COM", 300, 18, 1700000001),
+]
+
+
+@pytest.mark.parametrize("version", [1, 2])
+def test_read_keytab(tmp_path, version):
+    """Test `read_keytab()`."""
+    keytab = _write_keytab(tmp_path / "keytab", KEYTAB_ENTRIES, version)
+    assert kerberos.read_keytab(keytab) == tuple(
+        kerberos.KeytabEntry(*entry)
+        for entry in KEYTAB_ENTRIES if entry is not None
+    )
+
+
+def test_read_keytab_cache(tmp_path):
+    """Test that `read_keytab()` only re-reads a keytab when it changes."""
+    keytab = _write_keytab(tmp_path / "keytab", KEYTAB_ENTRIES[:1])
+    with mock.patch(
+        "igwn_auth_utils.kerberos._parse_keytab",
+        wraps=kerberos._parse_keytab,
+    ) as parse:
+        first = kerberos.read_keytab(keytab)
+        assert kerberos.read_keytab(str(keytab)) == first
+        assert parse.call_count == 1
+
+        # rewrite the keytab and check that it is re-read
+        keytab.chmod(0o600)
+        keytab.unlink()
+        _write_keytab(keytab, KEYTAB_ENTRIES[-1:])
+        assert kerberos.read_keytab(keytab)[0].principal == "other@EXAMPLE.COM"
+        assert parse.call_count == 2
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"not a keytab",
+    bytes((5, 2)) + struct.pack(">i", 100) + bytes(10),
+])
+def test_read_keytab_invalid(tmp_path, data):
+    """Test that `read_keytab()` raises `ValueError` for bad files."""
+    keytab = tmp_path / "keytab"
+    keytab.write_bytes(data)
+    with pytest.raises(ValueError, match="keytab"):
+        kerberos.read_keytab(keytab)
+
+
+def test_keytab_principal_parsed(tmp_path):
+    """Test that `_keytab_principal()` parses the keytab directly."""
+    keytab = _write_keytab(tmp_path / "keytab", KEYTAB_ENTRIES)
+    with mock.patch.dict("sys.modules", {"gssapi": None}):
+        assert kerberos._keytab_principal(keytab) == (
+            "robot/host.example.com@EXAMPLE.COM"
+        )
+
+
+def _ccache_principal(principal):
+    """Return the binary encoding of a principal in a ccache."""
+    name, realm = principal.rsplit("@", 1)
+    components = name.split("/")
+
+    def _counted(value):
+        return struct.pack(">I", len(value)) + value
+
+    data = struct.pack(">II", 1, len(components)) + _counted(realm.encode())
+    for comp in components:
+        data += _counted(comp.encode())
+    return data
+
+
+def _ccache_credential(client, server, endtime, *, version=4):
+    """Return the binary encoding of a credential in a ccache."""
+    data = _ccache_principal(client) + _ccache_principal(server)
+    data += struct.pack(">H", 18) * (2 if version == 3 else 1)  # enctype
+    data += struct.pack(">I", 32) + os.urandom(32)  # session key
+    authtime = max(endtime - 36000, 0)
+    data += struct.pack(">4I", authtime, 0, endtime, endtime)
+    data += struct.pack(">BI", 0, 0)  # is_skey, flags
+    data += struct.pack(">I", 1) + struct.pack(">HI", 2, 4) + bytes(4)
+    data += struct.pack(">I", 0)  # authdata
+    data += struct.pack(">I", 8) + os.urandom(8)  # ticket
+    data += struct.pack(">I", 0)  # second ticket
+    return data
+
+
+def _write_ccache(path, principal, credentials, version=4):
+    """Write a ccache file for ``principal`` containing ``credentials``."""
+    data = struct.pack(">H", 0x0500 + version)
+    if version == 4:
+        data += struct.pack(">HHHII", 12, 1, 8, 0, 0)  # time offset tag
+    data += _ccache_principal(principal)
+    for cred in credentials:
+        data += _ccache_credential(*cred, version=version)
+    path.write_bytes(data)
+    return path
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_read_ccache(tmp_path, version):
+    """Test `read_ccache()`."""
+    now = int(time.time())
+    principal = "rainer.weiss@LIGO.ORG"
+    ccache = _write_ccache(tmp_path / "ccache", principal, [
+        (principal, "krb5_ccache_conf_data/pa_type@X-CACHECONF:", 0),
+        (principal, "krbtgt/LIGO.ORG@LIGO.ORG", now + 3600),
+        (principal, "HTTP/host.ligo.org@LIGO.ORG", now + 1800),
+    ], version=version)
+
+    creds = kerberos.read_ccache(f"FILE:{ccache}")
+    assert creds.principal == principal
+    assert [ticket.server for ticket in creds.tickets] == [
+        "krbtgt/LIGO.ORG@LIGO.ORG",
+        "HTTP/host.ligo.org@LIGO.ORG",
+    ]
+    assert creds.tickets[0].endtime == now + 3600
+    assert creds.tickets[0].starttime == now + 3600 - 36000
+    assert 3500 < creds.timeleft() <= 3600
+    assert 1700 < creds.timeleft("HTTP/host.ligo.org@LIGO.ORG") <= 1800
+    assert creds.timeleft("HTTP/other.ligo.org@LIGO.ORG") == 0
+
+
+@mock.patch.dict("os.environ")
+def test_read_ccache_expired(tmp_path):
+    """Test `read_ccache()` with an expired TGT found via the environment."""
+    principal = "rainer.weiss@LIGO.ORG"
+    ccache = _write_ccache(tmp_path / "ccache", principal, [
+        (principal, "krbtgt/LIGO.ORG@LIGO.ORG", int(time.time()) - 10),
+    ])
+    os.environ["KRB5CCNAME"] = str(ccache)
+    assert kerberos.read_ccache().timeleft() == 0
+
+
+@pytest.mark.parametrize(("ccache", "data", "error"), [
+    ("KEYRING:persistent:1000", None, "only FILE:"),
+    ("ccache", b"", "unrecognised"),
+    ("ccache", struct.pack(">HI", 0x0504, 100), "failed to parse"),
+])
+def test_read_ccache_invalid(tmp_path, ccache, data, error):
+    """Test that `read_ccache()` raises `ValueError` for bad ccaches."""
+    if data is not None:
+        ccache = tmp_path / ccache
+        ccache.write_bytes(data)
+    with pytest.raises(ValueError, match=error):
+        kerberos.read_ccache(ccache)
+
+
 @pytest.mark.parametrize(("permissions", "ok"), [
     (0o400, True),  # best
     (0o700, True),  # acceptable
@@ -98,3 +323,260 @@ def test_check_keytab(keytab, permissions, ok):
     else:
         perm_check = True
     assert perm_check is ok
+
+
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.kerberos._canonicalize")
+def test_canonical_principal_cache(canonicalize, tmp_path):
+    """Test that `_canonical_principal` is cached until krb5.conf changes."""
+    config = tmp_path / "krb5.conf"
+    config.write_text("[libdefaults]\n    default_realm = LIGO.ORG\n")
+    os.environ["KRB5_CONFIG"] = str(config)
+    canonicalize.side_effect = lambda name: f"{name}@LIGO.ORG"
+
+    for _ in range(3):
+        assert kerberos._canonical_principal("rainer.weiss") == (
+            "rainer.weiss@LIGO.ORG"
+        )
+    assert canonicalize.call_count == 1
+
+    # changing the configuration invalidates the cache
+    config.write_text("[libdefaults]\n    default_realm = EXAMPLE.COM\n")
+    kerberos._canonical_principal("rainer.weiss")
+    assert canonicalize.call_count == 2
+
+
+@mock.patch(
+    "igwn_auth_utils.kerberos._canonicalize",
+    side_effect=ValueError("bad principal"),
+)
+def test_canonical_principal_error(canonicalize):
+    """Test that `_canonical_principal` doesn't cache failures."""
+    for _ in range(2):
+        with pytest.raises(ValueError, match="bad principal"):
+            kerberos._canonical_principal("rainer.weiss")
+    assert canonicalize.call_count == 2
+
+
+@requires_gssapi
+@pytest.mark.parametrize(("lifetime", "new"), [
+    (36000, False),  # plenty of time left, reuse
+    (60, True),  # not enough time left
+])
+@mock.patch("igwn_auth_utils.kerberos.kinit")
+@mock.patch("igwn_auth_utils.kerberos._existing_credential")
+def test_ensure_kinit(existing, kinit, keytab, lifetime, new):
+    """Test `ensure_kinit()` reuses credentials with enough time left."""
+    existing.return_value = (mock.sentinel.existing, lifetime)
+    kinit.return_value = mock.sentinel.new
+    creds, acquired = kerberos.ensure_kinit(
+        "rainer.weiss@LIGO.ORG",
+        keytab=keytab,
+        min_lifetime=3600,
+    )
+    assert acquired is new
+    assert creds is (mock.sentinel.new if new else mock.sentinel.existing)
+    assert kinit.called is new
+
+
+@requires_gssapi
+def test_existing_credential_missing():
+    """Test `_existing_credential` handles missing credentials."""
+    class _MockGSSError(gssapi.exceptions.GSSError):
+        def __init__(self, *args):
+            Exception.__init__(self, *args)
+
+        def __str__(self):
+            return "mock error"
+
+    with mock.patch("gssapi.Credentials", side_effect=_MockGSSError):
+        assert kerberos._existing_credential("rainer.weiss@LIGO.ORG") == (None, 0)
+
+
+@pytest.mark.parametrize(("ccache", "path"), [
+    ("FILE:/tmp/ccache", Path("/tmp/ccache")),  # noqa: S108
+    ("/tmp/ccache", Path("/tmp/ccache")),  # noqa: S108
+    ("KEYRING:persistent:1000", None),
+    ("KCM:", None),
+])
+def test_ccache_path(ccache, path):
+    """Test `_ccache_path`."""
+    assert kerberos._ccache_path(ccache) == path
+
+
+@mock.patch.dict("os.environ")
+def test_ccache_path_default():
+    """Test `_ccache_path` defers to the library default ccache."""
+    os.environ.pop("KRB5CCNAME", None)
+    assert kerberos._ccache_path() is None
+
+
+@pytest.fixture
+def mock_gssapi():
+    """Replace `gssapi` with a test double that records credential stores."""
+    gssapi = mock.MagicMock()
+
+    def _credentials(name=None, store=None, **_kwargs):
+        creds = mock.MagicMock(lifetime=36000, store=store)
+        creds.name = name
+        return creds
+
+    gssapi.Credentials.side_effect = _credentials
+    with mock.patch.dict("sys.modules", {"gssapi": gssapi}):
+        yield gssapi
+
+
+def _mock_kinit(principal=None, ccache=None, **_kwargs):
+    """Mock `kinit` that writes a fake ccache file."""
+    path = Path(ccache.split(":", 1)[1])
+    path.write_text("new")
+    creds = mock.MagicMock(lifetime=36000, store={"ccache": ccache})
+    creds.name = principal
+    return creds
+
+
+@pytest.mark.usefixtures("mock_gssapi")
+@mock.patch("igwn_auth_utils.kerberos.kinit", side_effect=_mock_kinit)
+def test_kinit_atomic(kinit, tmp_path):
+    """Test `_kinit_atomic` replaces the ccache in one go."""
+    ccache = tmp_path / "ccache"
+    ccache.write_text("old")
+    creds = kerberos._kinit_atomic("rainer.weiss", ccache=ccache)
+    assert creds.lifetime == 36000
+    # check that the credential refers to the target ccache
+    assert creds.name == "rainer.weiss"
+    assert creds.store == {"ccache": f"FILE:{ccache}"}
+    assert ccache.read_text() == "new"
+    assert [path.name for path in tmp_path.iterdir()] == ["ccache"]
+    # check that kinit was called with a temporary ccache
+    assert kinit.call_args.kwargs["ccache"] != f"FILE:{ccache}"
+
+
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.kerberos.kinit")
+def test_kinit_atomic_default_ccache(kinit):
+    """Test `_kinit_atomic` uses the library default ccache if not given."""
+    os.environ.pop("KRB5CCNAME", None)
+    assert kerberos._kinit_atomic("rainer.weiss") is kinit.return_value
+    kinit.assert_called_once_with(
+        principal="rainer.weiss",
+        keytab=None,
+        ccache=None,
+    )
+
+
+@pytest.mark.usefixtures("mock_gssapi")
+@mock.patch("igwn_auth_utils.kerberos.kinit", side_effect=OSError("error"))
+def test_kinit_atomic_error(kinit, tmp_path):
+    """Test `_kinit_atomic` leaves the ccache alone on failure."""
+    ccache = tmp_path / "ccache"
+    ccache.write_text("old")
+    with pytest.raises(OSError, match="error"):
+        kerberos._kinit_atomic("rainer.weiss", ccache=ccache)
+    kinit.assert_called_once()
+    assert ccache.read_text() == "old"
+    assert [path.name for path in tmp_path.iterdir()] == ["ccache"]
+
+
+def _mock_kinit_many(principal=None, keytab=None, ccache=None):
+    """Mock `kinit` that fails for some principals."""
+    if principal.startswith("bad"):
+        msg = f"cannot kinit {principal}"
+        raise OSError(msg)
+    return _mock_kinit(principal=principal, keytab=keytab, ccache=ccache)
+
+
+@pytest.mark.usefixtures("mock_gssapi")
+@mock.patch("igwn_auth_utils.kerberos.kinit", side_effect=_mock_kinit_many)
+def test_kinit_many(kinit, tmp_path):
+    """Test `kinit_many()` returns per-spec results and errors."""
+    specs = [
+        ("robot1", "robot1.keytab", tmp_path / "robot1"),
+        {"principal": "bad", "ccache": tmp_path / "bad"},
+        ("robot2", "robot2.keytab", tmp_path / "robot2"),
+    ]
+    results = kerberos.kinit_many(specs, max_workers=2)
+    assert [result.principal for result in results] == [
+        "robot1",
+        "bad",
+        "robot2",
+    ]
+    assert results[1].keytab is None
+    assert results[1].creds is None
+    assert str(results[1].error) == "cannot kinit bad"
+    for result in (results[0], results[2]):
+        assert result.error is None
+        assert result.creds.lifetime == 36000
+        # check that the credential refers to the requested ccache
+        assert result.creds.name == result.principal
+        assert result.creds.store == {"ccache": f"FILE:{result.ccache}"}
+        assert Path(result.ccache).read_text() == "new"
+    assert not (tmp_path / "bad").exists()
+    assert kinit.call_count == 3
+
+
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.kerberos.kinit")
+def test_kinit_many_default_ccache(kinit):
+    """Test `kinit_many()` uses the library default ccache if not given."""
+    os.environ.pop("KRB5CCNAME", None)
+    result, = kerberos.kinit_many([{"principal": "robot"}])
+    assert result.error is None
+    assert result.creds is kinit.return_value
+    kinit.assert_called_once_with(principal="robot", keytab=None, ccache=None)
+
+
+def test_kinit_many_empty():
+    """Test `kinit_many()` with no specs."""
+    assert kerberos.kinit_many([]) == []
+
+
+def test_kinit_many_invalid():
+    """Test `kinit_many()` rejects unknown spec keys."""
+    with pytest.raises(TypeError, match="'realm'"):
+        kerberos.kinit_many([{"principal": "robot", "realm": "LIGO.ORG"}])
+
+
+class TestKerberosRenewer:
+    """Tests for `igwn_auth_utils.kerberos.KerberosRenewer`."""
+
+    Renewer = kerberos.KerberosRenewer
+
+    @pytest.mark.parametrize(("lifetime", "failures", "delay"), [
+        (36000, 0, 32400),  # renew an hour before expiry
+        (7200, 0, 3600),  # renew an hour before expiry
+        (600, 0, 300),  # short-lived, renew at half the lifetime
+        (10, 0, 10),  # at least retry_min
+        (36000, 1, 10),  # first retry
+        (36000, 3, 40),  # backoff
+        (36000, 20, 600),  # capped at retry_max
+    ])
+    def test_next_delay(self, lifetime, failures, delay):
+        """Test the delay before the next renewal (or retry)."""
+        renewer = self.Renewer(jitter=0)
+        renewer.lifetime = lifetime
+        assert renewer._next_delay(failures) == delay
+
+    def test_next_delay_jitter(self):
+        """Test that the delay before the next renewal is randomised."""
+        renewer = self.Renewer(jitter=0.1)
+        renewer.lifetime = 36000 + 3600
+        for _ in range(10):
+            assert 32400 <= renewer._next_delay() <= 39600
+
+    @pytest.mark.usefixtures("mock_gssapi")
+    @mock.patch("igwn_auth_utils.kerberos.kinit", side_effect=_mock_kinit)
+    def test_run(self, kinit, tmp_path):
+        """Test that the renewer renews the credential in the background."""
+        ccache = tmp_path / "ccache"
+        with self.Renewer("rainer.weiss", ccache=ccache) as renewer:
+            assert renewer.running
+            for _ in range(100):
+                if renewer.lifetime:
+                    break
+                time.sleep(.01)
+        assert not renewer.running
+        assert renewer.lifetime == 36000
+        assert renewer.error is None
+        assert ccache.read_text() == "new"
+        kinit.assert_called_once()
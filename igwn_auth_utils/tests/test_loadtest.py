@@ -0,0 +1,76 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Tests for the load test script in ``tools/loadtest.py``.
+
+The script is not installed, so these tests are skipped unless run
+from a checkout of the repository.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import importlib
+from pathlib import Path
+
+import pytest
+import requests
+
+#: directory containing the load test script
+TOOLS = Path(__file__).resolve().parents[2] / "tools"
+
+pytestmark = pytest.mark.skipif(
+    not (TOOLS / "loadtest.py").is_file(),
+    reason="load test script not available",
+)
+
+
+@pytest.fixture
+def loadtest(monkeypatch):
+    """Import the load test script as a module."""
+    # on the path so that spawned worker processes can import it too
+    monkeypatch.syspath_prepend(str(TOOLS))
+    return importlib.import_module("loadtest")
+
+
+@pytest.mark.parametrize(("processes", "shared_session", "start_method"), [
+    pytest.param(False, False, None, id="threads"),
+    pytest.param(False, True, None, id="shared-session"),
+    pytest.param(True, False, None, id="processes"),
+    pytest.param(True, False, "spawn", id="processes-spawn"),
+])
+def test_run(loadtest, processes, shared_session, start_method):
+    """Test that `run` authorises all requests and reports on them."""
+    report = loadtest.run(
+        workers=2,
+        nrequests=5,
+        processes=processes,
+        shared_session=shared_session,
+        start_method=start_method,
+    )
+    assert report.mode == ("processes" if processes else "threads")
+    assert report.requests == 10
+    assert report.errors == 0
+    assert len(report.latencies) == 10
+    assert report.latencies == sorted(report.latencies)
+    assert report.percentile(50) <= report.percentile(99)
+    assert 0 < report.auth_fraction < 1
+    assert "auth fraction:" in report.format()
+
+
+def test_run_shared_session_processes(loadtest):
+    """Test that `run` refuses to share a `Session` between processes."""
+    with pytest.raises(ValueError, match="between processes"):
+        loadtest.run(processes=True, shared_session=True)
+
+
+def test_server_rejects_missing_token(loadtest, private_key, tmp_path):
+    """Test that the load test server requires a bearer token."""
+    with loadtest._serve(private_key, tmp_path) as (url, server_cert):
+        resp = requests.get(url, verify=str(server_cert), timeout=10)
+    assert resp.status_code == 401
+
+
+def test_main(loadtest, capsys):
+    """Test that `main` prints a report."""
+    loadtest.main(["--workers", "1", "--requests", "2"])
+    assert "requests:       2 (0 failed)" in capsys.readouterr().out
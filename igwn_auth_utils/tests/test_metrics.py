@@ -0,0 +1,189 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Tests for :mod:`igwn_auth_utils.metrics`."""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import os
+import threading
+from unittest import mock
+
+import pytest
+from urllib3.connectionpool import HTTPSConnectionPool
+
+from .. import (
+    metrics,
+    requests as igwn_requests,
+    scitokens as igwn_scitokens,
+)
+from ..error import IgwnAuthError
+from .test_scitokens import (
+    READ_AUDIENCE,
+    READ_SCOPE,
+    rtoken,  # noqa: F401
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    """Reset all metrics before each test."""
+    metrics.REGISTRY.reset()
+
+
+# -- Counter --------------------------
+
+def test_counter():
+    """Test `Counter` with labels."""
+    counter = metrics.Counter("test", "Test counter.", ("a",))
+    counter.inc(a="x")
+    counter.inc(2, a="x")
+    counter.inc(a="y")
+    assert counter.value(a="x") == 3
+    assert counter.samples() == [({"a": "x"}, 3), ({"a": "y"}, 1)]
+    counter.reset()
+    assert counter.value(a="x") == 0
+
+
+def test_counter_errors():
+    """Test that `Counter` rejects bad labels and negative increments."""
+    counter = metrics.Counter("test", "Test counter.", ("a",))
+    with pytest.raises(ValueError, match="requires labels"):
+        counter.inc(b="x")
+    with pytest.raises(ValueError, match="only be incremented"):
+        counter.inc(-1, a="x")
+
+
+def test_counter_threads():
+    """Test that `Counter.inc` is thread-safe."""
+    counter = metrics.Counter("test", "Test counter.")
+
+    def _count():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=_count) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value() == 8000
+
+
+# -- MetricsRegistry ------------------
+
+def test_registry_counter():
+    """Test that `MetricsRegistry.counter` returns existing counters."""
+    registry = metrics.MetricsRegistry()
+    counter = registry.counter("test_total", "Test counter.")
+    assert registry.counter("test_total", "Test counter.") is counter
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("test_total", "Test counter.", ("a",))
+
+
+def test_prometheus_text():
+    """Test `MetricsRegistry.prometheus_text`."""
+    registry = metrics.MetricsRegistry(prefix="test")
+    registry.counter("a_total", "Counter A.").inc(2)
+    registry.counter("b_total", "Counter B.", ("key",)).inc(key='x"y')
+    assert metrics.prometheus_text(registry) == (
+        "# HELP test_a_total Counter A.\n"
+        "# TYPE test_a_total counter\n"
+        "test_a_total 2\n"
+        "# HELP test_b_total Counter B.\n"
+        "# TYPE test_b_total counter\n"
+        'test_b_total{key="x\\"y"} 1\n'
+    )
+
+
+def test_counted():
+    """Test that `counted` counts calls by outcome."""
+    counter = metrics.Counter("test", "Test counter.", ("result", "kind"))
+
+    @metrics.counted(counter, kind="test")
+    def func(*, fail=False):
+        if fail:
+            raise RuntimeError
+        return 1
+
+    assert func() == 1
+    with pytest.raises(RuntimeError):
+        func(fail=True)
+    assert counter.value(result="success", kind="test") == 1
+    assert counter.value(result="failure", kind="test") == 1
+
+
+def test_register_opentelemetry():
+    """Test `register_opentelemetry` creates an observable counter."""
+    pytest.importorskip("opentelemetry.metrics")
+    registry = metrics.MetricsRegistry(prefix="test")
+    registry.counter("a_total", "Counter A.").inc()
+    meter = mock.MagicMock()
+    instruments = metrics.register_opentelemetry(meter, registry=registry)
+    assert len(instruments) == 1
+    meter.create_observable_counter.assert_called_once()
+    args, kwargs = meter.create_observable_counter.call_args
+    assert args == ("test_a_total",)
+    observation, = kwargs["callbacks"][0](None)
+    assert observation.value == 1
+
+
+# -- instrumentation ------------------
+
+def _value(name, **labels):
+    return metrics.REGISTRY.counter(
+        name,
+        "",
+        labelnames=tuple(labels),
+    ).value(**labels)
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_find_token_metrics():
+    """Test that `find_token` counts failures and bad tokens."""
+    os.environ["SCITOKEN"] = "not a token"
+    with pytest.raises(IgwnAuthError):
+        igwn_scitokens.find_token(READ_AUDIENCE, READ_SCOPE)
+    assert _value(
+        "discovery_total",
+        credential="scitoken",
+        result="failure",
+    ) == 1
+    assert _value("token_deserialize_errors_total") == 1
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_token_cache_metrics(rtoken):  # noqa: F811
+    """Test that `HTTPSciTokenAuth` counts token cache hits and misses."""
+    auth = igwn_requests.HTTPSciTokenAuth(token=True)
+    with mock.patch.object(auth, "find_token", return_value=rtoken):
+        for _ in range(3):
+            auth(mock.Mock(url="https://example.com", headers={}))
+    assert _value("token_cache_total", result="miss") == 1
+    assert _value("token_cache_total", result="hit") == 2
+
+
+@mock.patch.dict("os.environ")
+def test_session_metrics(https_server):
+    """Test that `Session` counts responses and connection reuse."""
+    url, server_cert = https_server
+    os.environ["IGWN_AUTH_UTILS_CONNECTION_METRICS"] = "1"
+    with igwn_requests.Session(token=False, cert=False) as sess:
+        for _ in range(3):
+            sess.get(url, verify=str(server_cert))
+    assert _value("session_responses_total", code=200) == 3
+    assert _value("connections_total", result="new") == 1
+    assert _value("connections_total", result="reused") == 2
+
+
+def test_session_metrics_connections_default(https_server):
+    """Test that connections aren't counted unless asked for."""
+    url, server_cert = https_server
+    with igwn_requests.Session(token=False, cert=False) as sess:
+        sess.get(url, verify=str(server_cert))
+        adapter = sess.get_adapter(url)
+    assert isinstance(adapter, igwn_requests.X509HTTPAdapter)
+    assert adapter.poolmanager.pool_classes_by_scheme["https"] is (
+        HTTPSConnectionPool
+    )
+    assert _value("connections_total", result="new") == 0
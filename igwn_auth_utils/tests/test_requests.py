@@ -7,20 +7,32 @@ __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 __credits__ = "Leo Singer <leo.singer@ligo.org>"
 
 import os
+import pickle
+import ssl
 import stat
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from functools import partial
+from multiprocessing import get_context
 from netrc import NetrcParseError
 from pathlib import Path
 from unittest import mock
 from urllib.parse import urlencode
 
 import pytest
-
+import requests
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
 from requests import (
     __version__ as requests_version,
     RequestException,
 )
 
 from .. import requests as igwn_requests
+from .._cache import after_fork
 from ..error import IgwnAuthError
 from ..scitokens import target_audience
 from .test_scitokens import rtoken  # noqa: F401
@@ -129,6 +141,114 @@ def test_get_netrc_auth_permissions(netrc):
     assert igwn_requests.get_netrc_auth(None, raise_errors=False) is None
 
 
+# -- negative cache -------------------
+
+@mock.patch.dict(os.environ)
+def test_find_cred_negative_cache():
+    """Check that `_find_cred` caches failures when asked."""
+    os.environ.pop("IGWN_AUTH_UTILS_NEGATIVE_CACHE_TTL", None)
+    func = mock.MagicMock(side_effect=IgwnAuthError("error"))
+    watch = mock.MagicMock(return_value=1)
+    for _ in range(3):
+        assert igwn_requests._find_cred(
+            func,
+            "arg",
+            error=False,
+            watch=watch,
+        ) is None
+    func.assert_called_once_with("arg")
+
+    # different arguments are cached separately
+    igwn_requests._find_cred(func, "other", error=False, watch=watch)
+    assert func.call_count == 2
+
+    # and changing the fingerprint invalidates the cache
+    watch.return_value = 2
+    igwn_requests._find_cred(func, "arg", error=False, watch=watch)
+    assert func.call_count == 3
+
+
+@mock.patch.dict(os.environ)
+def test_find_cred_negative_cache_disabled():
+    """Check that `_find_cred` negative caching can be disabled."""
+    os.environ["IGWN_AUTH_UTILS_NEGATIVE_CACHE_TTL"] = "0"
+    func = mock.MagicMock(side_effect=IgwnAuthError("error"))
+    for _ in range(3):
+        igwn_requests._find_cred(func, error=False, watch=lambda: None)
+    assert func.call_count == 3
+
+
+def test_find_cred_negative_cache_error():
+    """Check that `_find_cred` doesn't cache failures when ``error=True``."""
+    func = mock.MagicMock(side_effect=IgwnAuthError("error"))
+    for _ in range(2):
+        with pytest.raises(IgwnAuthError):
+            igwn_requests._find_cred(func, error=True, watch=lambda: None)
+    assert func.call_count == 2
+
+
+# -- AuthConfig -----------------------
+
+class TestAuthConfig:
+    """Tests for `igwn_auth_utils.requests.AuthConfig`."""
+
+    Config = igwn_requests.AuthConfig
+
+    def test_normalise(self, tmp_path):
+        """Test that `AuthConfig` normalises its options."""
+        config = self.Config(
+            token=b"abc",
+            token_audience=["https://a.example.com", "ANY"],
+            token_scope=["read:/", "write:/"],
+            cert=[tmp_path / "cert.pem", tmp_path / "key.pem"],
+            force_noauth=0,
+        )
+        assert config.token == "abc"
+        assert config.token_audience == ("https://a.example.com", "ANY")
+        assert config.token_scope == ("read:/", "write:/")
+        assert config.cert == (
+            str(tmp_path / "cert.pem"),
+            str(tmp_path / "key.pem"),
+        )
+        assert config.force_noauth is False
+
+    def test_eq_hash(self, tmp_path):
+        """Test that equivalent options give equal, hashable configs."""
+        a = self.Config(token_audience=["ANY"], cert=tmp_path / "cert.pem")
+        b = self.Config(token_audience=("ANY",), cert=str(tmp_path / "cert.pem"))
+        assert a == b
+        assert hash(a) == hash(b)
+        assert len({a, b, self.Config()}) == 2
+        assert a != self.Config(token_audience="ANY")
+
+    def test_immutable(self):
+        """Test that `AuthConfig` can't be modified."""
+        config = self.Config()
+        with pytest.raises(AttributeError, match="immutable"):
+            config.token = True
+        with pytest.raises(AttributeError, match="immutable"):
+            del config.token
+        with pytest.raises(AttributeError):
+            config.other = 1
+
+    def test_pickle(self):
+        """Test that `AuthConfig` can be pickled."""
+        config = self.Config(token="abc", token_scope=["read:/"])
+        assert pickle.loads(pickle.dumps(config)) == config
+
+    def test_repr(self):
+        """Test that `repr(AuthConfig)` doesn't expose the token."""
+        assert "abc" not in repr(self.Config(token="abc"))
+        assert repr(self.Config(token=True)).startswith(
+            "AuthConfig(token=True, token_audience=None,",
+        )
+
+    def test_noauth_args(self):
+        """Test that `AuthConfig` rejects incompatible noauth options."""
+        with pytest.raises(ValueError, match="cannot select both"):
+            self.Config(force_noauth=True, fail_if_noauth=True)
+
+
 # -- HTTPSciTokenAuth -----------------
 
 class TestHTTPSciTokenAuth:
@@ -151,6 +271,74 @@ class TestHTTPSciTokenAuth:
         b = self.Auth(token=None, audience="https://example.com")
         assert a != b
 
+    def test_hash(self, rtoken):  # noqa: F811
+        """Test that equivalent handlers are equal and hash the same."""
+        serialized = rtoken.serialize()
+        a = self.Auth(token=serialized, audience=["ANY"])
+        b = self.Auth(token=serialized.decode("utf-8"), audience=("ANY",))
+        assert a == b
+        assert hash(a) == hash(b)
+        assert len({a, b, self.Auth()}) == 2
+        assert a != self.Auth(token=serialized, audience="ANY")
+        assert a != object()
+
+    def test_hash_no_serialize(self, rtoken):  # noqa: F811
+        """Test that hashing a handler doesn't (re-)sign its token."""
+        with mock.patch.object(rtoken, "serialize") as serialize:
+            hash(self.Auth(token=rtoken))
+        serialize.assert_not_called()
+
+    def test_hash_claims(self):
+        """Test that tokens with the same claims are considered equal."""
+        def _token(**claims):
+            token = igwn_requests.SciToken()
+            token.update_claims(claims)
+            return token
+
+        assert self.Auth(token=_token(sub="a")) == self.Auth(
+            token=_token(sub="a"),
+        )
+        assert self.Auth(token=_token(sub="a")) != self.Auth(
+            token=_token(sub="b"),
+        )
+
+    def test_hash_jti(self):
+        """Test that tokens with different IDs are not considered equal."""
+        def _token(**claims):
+            token = igwn_requests.SciToken()
+            token.update_claims(claims)
+            return token
+
+        assert self.Auth(token=_token(sub="a", jti="1")) != self.Auth(
+            token=_token(sub="a", jti="2"),
+        )
+
+    def test_setters(self, rtoken):  # noqa: F811
+        """Test that changing the handler options updates its key."""
+        auth = self.Auth(audience="ANY")
+        auth.audience = "https://example.com"
+        assert auth.audience == "https://example.com"
+        assert auth == self.Auth(audience="https://example.com")
+        auth.token = rtoken
+        auth.scope = "read:/"
+        auth.issuer = "local"
+        other = self.Auth(
+            token=rtoken,
+            audience="https://example.com",
+            scope="read:/",
+            issuer="local",
+        )
+        assert auth == other
+        assert hash(auth) == hash(other)
+
+    def test_setters_hashed(self):
+        """Test that a handler's options can't be changed once hashed."""
+        auth = self.Auth(audience="ANY")
+        hash(auth)
+        with pytest.raises(AttributeError, match="has been hashed"):
+            auth.audience = "https://example.com"
+        assert auth.audience == "ANY"
+
     @mock.patch("igwn_auth_utils.requests.find_scitoken")
     def test_token_header_empty(self, find_token):  # noqa: F811
         """Test that the auth class handles no tokens properly."""
@@ -170,6 +358,351 @@ class TestHTTPSciTokenAuth:
             igwn_requests.scitoken_authorization_header(rtoken)
         )
 
+    @mock.patch("igwn_auth_utils.requests.find_scitoken")
+    def test_token_cache(self, find_token, rtoken):  # noqa: F811
+        """Test that discovered tokens are cached per host."""
+        find_token.return_value = rtoken
+        auth = self.Auth()
+        header = igwn_requests.scitoken_authorization_header(rtoken)
+        for url in (
+            "https://example.com/a",
+            "https://example.com/b",
+            "https://example.org/a",
+            "https://example.org/b",
+        ):
+            req = MockRequest(url=url)
+            assert auth(req).headers["Authorization"] == header
+        assert find_token.call_count == 2
+        assert [call.args[0] for call in find_token.call_args_list] == [
+            ["https://example.com"],
+            ["https://example.org"],
+        ]
+
+    @mock.patch.dict("os.environ")
+    @mock.patch("igwn_auth_utils.requests.find_scitoken")
+    def test_token_cache_fingerprint(
+        self,
+        find_token,
+        rtoken,  # noqa: F811
+        tmp_path,
+    ):
+        """Test that cached tokens are dropped when token sources change."""
+        find_token.return_value = rtoken
+        auth = self.Auth()
+        auth(MockRequest(url="https://example.com"))
+        auth(MockRequest(url="https://example.com"))
+        assert find_token.call_count == 1
+        os.environ["SCITOKEN_FILE"] = str(tmp_path / "token")
+        auth(MockRequest(url="https://example.com"))
+        assert find_token.call_count == 2
+
+    @mock.patch("igwn_auth_utils.requests.find_scitoken")
+    def test_token_cache_expiry(self, find_token, rtoken):  # noqa: F811
+        """Test that tokens near expiry are not cached."""
+        rtoken.update_claims({"exp": int(time.time()) + 30})
+        find_token.return_value = rtoken
+        auth = self.Auth()
+        for _ in range(2):
+            auth(MockRequest(url="https://example.com"))
+        assert find_token.call_count == 2
+
+    def test_pickle(self, rtoken):  # noqa: F811
+        """Test that `HTTPSciTokenAuth` can be pickled with its token."""
+        auth = self.Auth(token=rtoken, audience="ANY", scope="read:/")
+        new = pickle.loads(pickle.dumps(auth))
+        assert new == auth
+        assert (new.audience, new.scope, new.issuer) == ("ANY", "read:/", None)
+        assert dict(new.token.claims()) == dict(rtoken.claims())
+        assert new(MockRequest()).headers["Authorization"] == (
+            igwn_requests.scitoken_authorization_header(rtoken)
+        )
+
+    @mock.patch("igwn_auth_utils.requests.find_scitoken")
+    def test_pickle_token_cache(self, find_token, rtoken):  # noqa: F811
+        """Test that discovered tokens are pickled with the handler."""
+        find_token.return_value = rtoken
+        auth = self.Auth()
+        header = auth(MockRequest(url="https://example.com")).headers[
+            "Authorization"
+        ]
+        new = pickle.loads(pickle.dumps(auth))
+        assert new(MockRequest(url="https://example.com")).headers[
+            "Authorization"
+        ] == header
+        find_token.assert_called_once()
+
+
+# -- HTTPKerberosAuth -----------------
+
+@pytest.fixture
+def mock_gssapi():
+    """Replace `gssapi` with a test double that exchanges fixed tokens."""
+    gssapi = mock.MagicMock()
+    gssapi.exceptions.GSSError = type("GSSError", (Exception,), {})
+    gssapi.contexts = []  # record of all contexts created
+
+    def _context(**_kwargs):
+        context = mock.MagicMock(complete=False)
+        gssapi.contexts.append(context)
+
+        def _step(token=None):
+            if token is None:
+                return b"client-token"
+            assert token == b"server-token"
+            context.complete = True
+            return None
+
+        context.step.side_effect = _step
+        return context
+
+    gssapi.SecurityContext.side_effect = _context
+    with mock.patch.dict("sys.modules", {"gssapi": gssapi}):
+        yield gssapi
+
+
+class TestHTTPKerberosAuth:
+    """Tests for `igwn_auth_utils.requests.HTTPKerberosAuth`."""
+
+    Auth = igwn_requests.HTTPKerberosAuth
+
+    def test_eq(self):
+        """Test that `HTTPKerberosAuth` compares by its options."""
+        assert self.Auth() == self.Auth()
+        assert self.Auth() != self.Auth(preemptive=False)
+        assert self.Auth() != igwn_requests.HTTPSciTokenAuth()
+
+    def test_hash(self):
+        """Test that `HTTPKerberosAuth` hashes by its options."""
+        assert hash(self.Auth()) == hash(self.Auth())
+        assert len({self.Auth(), self.Auth(), self.Auth(service="host")}) == 2
+
+    def test_pickle(self):
+        """Test that `HTTPKerberosAuth` can be pickled."""
+        auth = self.Auth(principal="user@EXAMPLE.COM", preemptive=False)
+        auth._established.set("localhost", value=True)
+        new = pickle.loads(pickle.dumps(auth))
+        assert new == auth
+        assert new._established.get("localhost") is None
+
+    def test_preemptive(self, mock_gssapi, negotiate_server):
+        """Test that negotiation happens once, then cookies are used."""
+        url, requests = negotiate_server
+        with igwn_requests.Session(
+            kerberos=True,
+            cert=False,
+        ) as sess:
+            assert isinstance(sess.auth, self.Auth)
+            for _ in range(3):
+                sess.get(url)
+        assert requests == ["negotiate", "cookie", "cookie"]
+        mock_gssapi.SecurityContext.assert_called_once()
+        mock_gssapi.Name.assert_called_once()
+        assert mock_gssapi.contexts[0].complete
+
+    @pytest.mark.usefixtures("mock_gssapi")
+    def test_not_preemptive(self, negotiate_server):
+        """Test that a Negotiate challenge is answered."""
+        url, requests = negotiate_server
+        with igwn_requests.Session(
+            auth=self.Auth(preemptive=False),
+            cert=False,
+        ) as sess:
+            resp = sess.get(url)
+            assert len(resp.history) == 1
+            assert resp.history[0].status_code == 401
+            sess.get(url)
+        assert requests == ["none", "negotiate", "cookie"]
+
+    def test_cookie_rejected(self, mock_gssapi, negotiate_server):
+        """Test that a rejected session cookie triggers renegotiation."""
+        url, requests = negotiate_server
+        with igwn_requests.Session(kerberos=True, cert=False) as sess:
+            sess.get(url)
+            sess.cookies.set("session", "expired")
+            sess.get(url)
+        assert requests == ["negotiate", "none", "negotiate"]
+        assert mock_gssapi.SecurityContext.call_count == 2
+        assert all(context.complete for context in mock_gssapi.contexts)
+
+    def test_shared(self, mock_gssapi, negotiate_server):
+        """Test that each request completes its own security context."""
+        url, requests = negotiate_server
+        auth = self.Auth()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(
+                lambda _: igwn_requests.get(url, auth=auth, cert=False),
+                range(8),
+            ))
+        assert {resp.status_code for resp in responses} == {200}
+        assert requests == ["negotiate"] * 8
+        assert len(mock_gssapi.contexts) == 8
+        assert all(context.complete for context in mock_gssapi.contexts)
+
+    def test_no_credential(self, mock_gssapi, negotiate_server):
+        """Test that a failure to create a security context isn't fatal."""
+        mock_gssapi.SecurityContext.side_effect = (
+            mock_gssapi.exceptions.GSSError("no credential")
+        )
+        url, requests = negotiate_server
+        with igwn_requests.Session(
+            kerberos=True,
+            cert=False,
+            raise_for_status=False,
+        ) as sess:
+            resp = sess.get(url)
+        # the challenge is returned as it is
+        assert resp.status_code == 401
+        assert not resp.history
+        assert "Authorization" not in resp.request.headers
+        assert requests == ["none"]
+
+    def test_no_credential_no_challenge(self, mock_gssapi, requests_mock):
+        """Test that requests that don't need Kerberos work without it."""
+        mock_gssapi.SecurityContext.side_effect = (
+            mock_gssapi.exceptions.GSSError("no credential")
+        )
+        requests_mock.get("https://example.com", text="OK")
+        with igwn_requests.Session(kerberos=True, cert=False) as sess:
+            assert sess.get("https://example.com").text == "OK"
+        assert "Authorization" not in requests_mock.last_request.headers
+
+    @pytest.mark.usefixtures("mock_gssapi")
+    def test_request_kerberos(self, negotiate_server):
+        """Test `request(..., kerberos=True)`."""
+        url, requests = negotiate_server
+        igwn_requests.get(url, kerberos=True, cert=False)
+        assert requests == ["negotiate"]
+
+
+# -- X509HTTPAdapter ------------------
+
+def test_client_ssl_context_cache(x509_credential_path):
+    """Test that `_client_ssl_context` caches contexts per credential."""
+    ctx = igwn_requests._client_ssl_context(x509_credential_path)
+    assert igwn_requests._client_ssl_context(x509_credential_path) is ctx
+    # a different CA setting gets a different context
+    assert igwn_requests._client_ssl_context(
+        x509_credential_path,
+        verify=False,
+    ) is not ctx
+    # updating the credential file invalidates the cache
+    os.utime(x509_credential_path, ns=(0, 0))
+    assert igwn_requests._client_ssl_context(x509_credential_path) is not ctx
+
+
+def test_x509_adapter_pool_kwargs(x509_credential_path):
+    """Test that `X509HTTPAdapter` configures the pool with our context."""
+    adapter = igwn_requests.X509HTTPAdapter()
+    request = requests.Request("GET", "https://example.com").prepare()
+    _, pool_kwargs = adapter.build_connection_pool_key_attributes(
+        request,
+        verify=True,
+        cert=str(x509_credential_path),
+    )
+    assert "cert_file" not in pool_kwargs
+    assert pool_kwargs["ssl_context"] is igwn_requests._client_ssl_context(
+        str(x509_credential_path),
+    )
+
+    # no cert, no context
+    _, pool_kwargs = adapter.build_connection_pool_key_attributes(
+        request,
+        verify=True,
+    )
+    assert "ssl_context" not in pool_kwargs
+
+
+def test_x509_adapter_request(https_server, x509_credential_path):
+    """Test that `X509HTTPAdapter` loads a credential once for many requests."""
+    url, server_cert = https_server
+    calls = []
+    _load_cert_chain = ssl.SSLContext.load_cert_chain
+
+    def load_cert_chain(self, *args, **kwargs):
+        calls.append(args)
+        return _load_cert_chain(self, *args, **kwargs)
+
+    with mock.patch.object(
+        ssl.SSLContext,
+        "load_cert_chain",
+        load_cert_chain,
+    ), igwn_requests.Session(
+        token=False,
+        cert=str(x509_credential_path),
+    ) as sess:
+        for _ in range(3):
+            resp = sess.get(
+                url,
+                verify=str(server_cert),
+                headers={"Connection": "close"},  # force new connections
+            )
+            assert "client" in resp.text
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("form", ["pem", "tuple", "objects"])
+def test_x509_adapter_request_in_memory(
+    https_server,
+    x509_credential_path,
+    private_key,
+    form,
+):
+    """Test that `Session` can use in-memory X.509 credentials."""
+    url, server_cert = https_server
+    pem = x509_credential_path.read_bytes()
+    if form == "pem":
+        cert = pem
+    else:
+        cert = x509.load_pem_x509_certificate(pem)
+        key = private_key
+        if form == "tuple":
+            cert = cert.public_bytes(serialization.Encoding.PEM)
+            key = key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption(),
+            )
+        cert = (cert, key)
+    with igwn_requests.Session(token=False, cert=cert) as sess:
+        assert sess.cert is cert
+        resp = sess.get(url, verify=str(server_cert))
+        assert "client" in resp.text
+
+
+def test_x509_adapter_after_fork(https_server):
+    """Test that `X509HTTPAdapter` discards its pools after a fork."""
+    url, server_cert = https_server
+    with igwn_requests.Session(token=False, cert=False) as sess:
+        adapter = sess.get_adapter(url)
+        assert isinstance(adapter, igwn_requests.X509HTTPAdapter)
+        sess.get(url, verify=str(server_cert))
+        poolmanager = adapter.poolmanager
+        assert len(poolmanager.pools) == 1
+        after_fork()
+        assert adapter.poolmanager is not poolmanager
+        assert len(adapter.poolmanager.pools) == 0
+        assert sess.get(url, verify=str(server_cert)).ok
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+@pytest.mark.filterwarnings("ignore:.*use of fork:DeprecationWarning")
+def test_session_fork(https_server):
+    """Test that a `Session` can be used by both sides of a fork."""
+    url, server_cert = https_server
+    with igwn_requests.Session(token=False, cert=False) as sess:
+        sess.get(url, verify=str(server_cert))
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            code = 1
+            try:
+                code = int(not sess.get(url, verify=str(server_cert)).ok)
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        # the parent's pooled connection is still usable
+        assert sess.get(url, verify=str(server_cert)).ok
+
 
 # -- Session --------------------------
 
@@ -251,7 +784,9 @@ class TestSession:
         sess = self.Session(token=serialized, cert=False)
         req = MockRequest()
         sess.auth(req)
-        assert req.headers["Authorization"] == f"Bearer {serialized}"
+        assert req.headers["Authorization"] == (
+            f"Bearer {serialized.decode('utf-8')}"
+        )
         # will not deserialise a token for storage
         assert sess.token is None
 
@@ -278,6 +813,31 @@ class TestSession:
             with errctx, sess:
                 sess.get("https://example.com")
 
+    @mock.patch("igwn_auth_utils.requests.find_scitoken")
+    def test_request_token_auth_cache(
+        self,
+        find_token,
+        requests_mock,
+        rtoken,  # noqa: F811
+    ):
+        """Test that per-request token handlers are reused."""
+        find_token.return_value = rtoken
+        requests_mock.get("https://example.com", text="OK")
+        with self.Session(token=False, cert=False) as sess:
+            for _ in range(3):
+                sess.get("https://example.com", token=True, token_scope="a")
+            sess.get("https://example.com", token=True, token_scope="b")
+        assert [
+            req.headers["Authorization"]
+            for req in requests_mock.request_history
+        ] == [igwn_requests.scitoken_authorization_header(rtoken)] * 4
+        # one discovery for each set of options
+        assert find_token.call_count == 2
+        # handlers aren't shared between sessions
+        with self.Session(token=False, cert=False) as sess:
+            sess.get("https://example.com", token=True, token_scope="a")
+        assert find_token.call_count == 3
+
     @pytest.mark.parametrize(("url", "aud"), (
         ("https://secret.example.com:8008", ["https://secret.example.com"]),
         (None, None)
@@ -367,6 +927,8 @@ class TestSession:
         if token:
             sess.auth(sess)
             sess.headers["Authorization"].startswith("Bearer")
+        elif token is None:  # token discovery for each request
+            assert sess.auth == igwn_requests.HTTPSciTokenAuth()
         else:
             assert sess.auth == auth
 
@@ -477,6 +1039,43 @@ class TestSession:
                  fail_if_noauth=True,
              )
 
+    def test_pickle(self, rtoken, x509_credential_path):  # noqa: F811
+        """Test that a `Session` can be pickled without losing auth."""
+        with self.Session(
+            token=rtoken,
+            cert=str(x509_credential_path),
+            raise_for_status=False,
+        ) as sess:
+            sess.headers["X-Test"] = "test"
+            new = pickle.loads(pickle.dumps(sess))
+        assert new.cert == str(x509_credential_path)
+        assert new.auth == sess.auth
+        assert dict(new.auth.token.claims()) == dict(rtoken.claims())
+        assert new.headers["X-Test"] == "test"
+        assert new.headers["Authorization"] == sess.headers["Authorization"]
+        assert new.hooks == sess.hooks
+        assert isinstance(
+            new.get_adapter("https://example.com"),
+            igwn_requests.X509HTTPAdapter,
+        )
+        # check that requests.Session itself is not affected
+        assert "cert" in requests.Session.__attrs__
+
+    def test_pickle_in_memory_cert(self, x509_credential_path, private_key):
+        """Test that in-memory X.509 credentials are pickled as PEM."""
+        cert = x509.load_pem_x509_certificate(
+            x509_credential_path.read_bytes(),
+        )
+        with self.Session(token=False, cert=(cert, private_key)) as sess:
+            # refuse to write the private key by default
+            with pytest.raises(TypeError, match="pickle_x509_keys=True"):
+                pickle.dumps(sess)
+            sess.pickle_x509_keys = True
+            new = pickle.loads(pickle.dumps(sess))
+        assert isinstance(new.cert, bytes)
+        assert b"BEGIN CERTIFICATE" in new.cert
+        assert b"PRIVATE KEY" in new.cert
+
     @mock.patch("igwn_auth_utils.requests.HTTPSciTokenAuth.__call__")
     def test_request_token_false(self, token_auth_call, requests_mock):
         """Test that token=False on the request is respected.
@@ -560,3 +1159,67 @@ def test_post(requests_mock):
     # check that the data was encoded into the request properly
     req = requests_mock.request_history[0]
     assert req.body == urlencode(data)
+
+
+# -- multiprocessing workers ----------
+
+@pytest.fixture
+def _no_worker():
+    """Discard any worker session created by a test."""
+    yield
+    session = igwn_requests._WORKER.pop("session", None)
+    if session is not None:
+        session.close()
+
+
+def _worker_task(url, verify):
+    return igwn_requests.worker_session().get(url, verify=verify).status_code
+
+
+@pytest.mark.usefixtures("_no_worker")
+def test_worker_session_error():
+    """Test that `worker_session` fails before `init_worker`."""
+    with pytest.raises(RuntimeError, match="init_worker"):
+        igwn_requests.worker_session()
+
+
+@pytest.mark.usefixtures("_no_worker")
+def test_init_worker(requests_mock, rtoken):  # noqa: F811
+    """Test that `init_worker` discovers a token once for all requests."""
+    requests_mock.get("https://example.com")
+    with mock.patch.object(
+        igwn_requests.HTTPSciTokenAuth,
+        "find_token",
+        return_value=rtoken,
+    ) as find_token:
+        sess = igwn_requests.init_worker("https://example.com", cert=False)
+        find_token.assert_called_once()
+        assert igwn_requests.worker_session() is sess
+        for _ in range(3):
+            igwn_requests.worker_session().get("https://example.com")
+    find_token.assert_called_once()
+    assert requests_mock.last_request.headers["Authorization"].startswith(
+        "Bearer ",
+    )
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+@pytest.mark.filterwarnings("ignore:.*use of fork:DeprecationWarning")
+def test_init_worker_pool(https_server):
+    """Test `init_worker` as the initializer of a process pool."""
+    url, server_cert = https_server
+    with ProcessPoolExecutor(
+        max_workers=2,
+        mp_context=get_context("fork"),
+        initializer=partial(
+            igwn_requests.init_worker,
+            url,
+            token=False,
+            cert=False,
+        ),
+    ) as pool:
+        codes = list(pool.map(
+            partial(_worker_task, verify=str(server_cert)),
+            [url] * 8,
+        ))
+    assert codes == [200] * 8
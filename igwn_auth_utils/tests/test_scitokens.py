@@ -19,6 +19,7 @@ from scitokens.scitokens import InvalidPathError
 import pytest
 
 from .. import scitokens as igwn_scitokens
+from .._cache import after_fork
 from ..error import IgwnAuthError
 
 ISSUER = "local"
@@ -392,6 +393,43 @@ def test_find_token_error(rtoken, public_pem, audience, msg):
         )
 
 
+@mock.patch.dict("os.environ", clear=True)
+@mock.patch("igwn_auth_utils.scitokens.SciToken.discover", _os_error)
+def test_explain_token(public_pem, condor_creds_path):
+    """Test that `explain_token` reports on every candidate."""
+    os.environ["SCITOKEN"] = "not a token"
+    os.environ["SCITOKEN_FILE"] = str(condor_creds_path / "write.use")
+    os.environ["_CONDOR_CREDS"] = str(condor_creds_path)
+    trace = igwn_scitokens.explain_token(
+        READ_AUDIENCE,
+        READ_SCOPE,
+        insecure=True,
+        public_key=public_pem,
+    )
+    assert [cand.source for cand in trace] == [
+        "SCITOKEN",
+        "SCITOKEN_FILE",
+        "_CONDOR_CREDS",
+        "_CONDOR_CREDS",
+    ]
+
+    # an unparseable token has no path, and a reason
+    assert trace[0].path is None
+    assert not trace[0].valid
+    assert trace[0].reason
+
+    # a token with the wrong claims has a path and a reason
+    assert trace[1].path == os.environ["SCITOKEN_FILE"]
+    assert not trace[1].valid
+    assert trace[1].reason
+
+    # the valid token has no reason
+    valid, = (cand for cand in trace if cand.valid)
+    assert valid.path == str(condor_creds_path / "read.use")
+    assert valid.reason is None
+    assert all(cand.duration >= 0 for cand in trace)
+
+
 @mock.patch.dict("os.environ")
 @pytest.mark.parametrize(("skip_errors", "message"), (
     (False, "Issuer is not over HTTPS"),
@@ -438,6 +476,68 @@ def test_find_token_warn(rtoken, rtoken_path, public_pem):
         )
 
 
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.scitokens.SciToken.discover", _os_error)
+@pytest.mark.parametrize("parallel", [False, True, 2])
+def test_find_token_parallel(
+    rtoken,
+    wtoken,
+    public_pem,
+    condor_creds_path,
+    parallel,
+):
+    """Check that `find_token(parallel=...)` respects the precedence order."""
+    os.environ["SCITOKEN"] = "blah"
+    os.environ["SCITOKEN_FILE"] = str(condor_creds_path / "write.use")
+    os.environ["_CONDOR_CREDS"] = str(condor_creds_path)
+    for token, aud, scope in (
+        (rtoken, READ_AUDIENCE, READ_SCOPE),
+        (wtoken, WRITE_AUDIENCE, WRITE_SCOPE),
+    ):
+        assert_tokens_equal(
+            igwn_scitokens.find_token(
+                audience=aud,
+                scope=scope,
+                insecure=True,
+                public_key=public_pem,
+                parallel=parallel,
+            ),
+            token,
+        )
+
+
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.scitokens.SciToken.discover", _os_error)
+def test_find_token_parallel_skip_errors(rtoken_path, public_pem):
+    """Check that `find_token(parallel=True)` handles ``skip_errors``."""
+    os.environ["SCITOKEN"] = "blah"
+    os.environ["SCITOKEN_FILE"] = str(rtoken_path)
+    with pytest.raises(IgwnAuthError, match=r"InvalidTokenFormat|readable"):
+        igwn_scitokens.find_token(
+            audience=READ_AUDIENCE,
+            scope=READ_SCOPE,
+            insecure=True,
+            public_key=public_pem,
+            skip_errors=False,
+            parallel=True,
+        )
+
+
+def test_find_token_parallel_executors():
+    """Check that `find_token(parallel=...)` thread pools are reused."""
+    executors = igwn_scitokens._Executors()
+    pool = executors.get(2)
+    try:
+        assert executors.get(2) is pool
+        # a forked child gets new pools
+        after_fork()
+        assert executors.get(2) is not pool
+    finally:
+        for other in executors._pools.values():
+            other.shutdown()
+        pool.shutdown()
+
+
 @mock.patch.dict("os.environ")
 def test_find_condor_creds_no_env(tmp_path):
     """Check that `_find_condor_creds_token_paths()` handles missing creds.
@@ -467,6 +567,20 @@ def test_find_condor_creds_dir_empty(tmp_path):
     assert not list(igwn_scitokens._find_condor_creds_token_paths())
 
 
+@mock.patch.dict("os.environ")
+def test_discovery_fingerprint_condor_creds(tmp_path):
+    """Check that `_discovery_fingerprint()` sees condor creds rewrites."""
+    os.environ["_CONDOR_CREDS"] = str(tmp_path)
+    token = tmp_path / "igwn.use"
+    token.write_text("abc")
+    before = igwn_scitokens._discovery_fingerprint()
+    assert igwn_scitokens._discovery_fingerprint() == before
+    # rewrite the token in place, which doesn't change the directory
+    with token.open("w") as file:
+        file.write("abcdef")
+    assert igwn_scitokens._discovery_fingerprint() != before
+
+
 def test_token_authorization_header(rtoken):
     """Check that `token_authorization_header` works."""
     expected = "Bearer {}".format(rtoken.serialize().decode("utf-8"))
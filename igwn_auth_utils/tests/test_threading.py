@@ -0,0 +1,164 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Multi-threaded stress tests for :mod:`igwn_auth_utils`.
+
+These tests call the discovery and request paths concurrently from
+many threads, to check that they don't rely on process-global
+mutation or unsynchronised shared state, which is especially
+important on free-threaded (no-GIL) builds of Python.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import os
+import stat
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from .. import (
+    requests as igwn_requests,
+    scitokens as igwn_scitokens,
+    timing,
+)
+from .test_scitokens import (
+    READ_AUDIENCE,
+    READ_SCOPE,
+    rtoken,  # noqa: F401
+    rtoken_path,  # noqa: F401
+)
+
+#: number of threads to run concurrently
+NTHREADS = 16
+
+#: number of calls made by each thread
+NCALLS = 25
+
+
+@pytest.fixture(autouse=True)
+def _switch_interval():
+    """Switch threads as often as possible to provoke races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def _stress(func, *args, **kwargs):
+    """Call ``func`` `NCALLS` times from each of `NTHREADS` threads.
+
+    Returns the `list` of results.
+    """
+    with ThreadPoolExecutor(max_workers=NTHREADS) as pool:
+        futures = [
+            pool.submit(func, *args, **kwargs)
+            for _ in range(NTHREADS * NCALLS)
+        ]
+        return [future.result() for future in futures]
+
+
+@mock.patch.dict("os.environ")
+def test_get_netrc_auth(tmp_path):
+    """Test that `get_netrc_auth` is consistent across threads."""
+    netrc = tmp_path / "netrc"
+    netrc.write_text("machine example.org login user password secret")
+    netrc.chmod(stat.S_IRUSR | stat.S_IWUSR)
+    os.environ["NETRC"] = str(netrc)
+    results = _stress(
+        igwn_requests.get_netrc_auth,
+        "https://example.org/path",
+    )
+    assert set(results) == {("user", "secret")}
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_find_token(rtoken_path, public_pem):  # noqa: F811
+    """Test that `find_token` is consistent across threads."""
+    os.environ["SCITOKEN_FILE"] = str(rtoken_path)
+    results = _stress(
+        igwn_scitokens.find_token,
+        READ_AUDIENCE,
+        READ_SCOPE,
+        insecure=True,
+        public_key=public_pem,
+    )
+    assert {token["scope"] for token in results} == {READ_SCOPE}
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_token_auth_discovery(rtoken):  # noqa: F811
+    """Test that a shared `HTTPSciTokenAuth` only discovers a token once."""
+    auth = igwn_requests.HTTPSciTokenAuth(token=True)
+    with mock.patch.object(
+        auth,
+        "find_token",
+        return_value=rtoken,
+    ) as find_token:
+        requests = _stress(
+            lambda: auth(mock.Mock(url="https://example.com", headers={})),
+        )
+    find_token.assert_called_once()
+    assert len({r.headers["Authorization"] for r in requests}) == 1
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_token_auth_discovery_per_audience(rtoken):  # noqa: F811
+    """Test that discovery for one host doesn't block another host."""
+    auth = igwn_requests.HTTPSciTokenAuth(token=True)
+    started = threading.Event()
+    release = threading.Event()
+
+    def _find_token(url=None, **_kwargs):
+        if url == "https://example.com":
+            started.set()
+            release.wait(10)
+        return rtoken
+
+    with mock.patch.object(
+        auth,
+        "find_token",
+        side_effect=_find_token,
+    ), ThreadPoolExecutor(max_workers=2) as pool:
+        slow = pool.submit(
+            auth,
+            mock.Mock(url="https://example.com", headers={}),
+        )
+        assert started.wait(10)
+        fast = pool.submit(
+            auth,
+            mock.Mock(url="https://example.org", headers={}),
+        )
+        try:
+            assert fast.result(timeout=10).headers["Authorization"]
+            assert not slow.done()
+        finally:
+            release.set()
+        assert slow.result().headers["Authorization"]
+
+
+def test_timing_hooks():
+    """Test that registering timing hooks is thread-safe."""
+    def _register():
+        def hook(timing):
+            pass
+        timing.add_hook(hook)
+        with timing.timer("test"):
+            pass
+        timing.remove_hook(hook)
+
+    _stress(_register)
+    assert not timing.enabled()
+
+
+def test_session(https_server):
+    """Test that a shared `Session` can send requests from many threads."""
+    url, server_cert = https_server
+    with igwn_requests.Session(token=False, cert=False) as sess:
+        responses = _stress(sess.get, url, verify=str(server_cert))
+    assert {resp.status_code for resp in responses} == {200}
@@ -0,0 +1,167 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Tests for :mod:`igwn_auth_utils.timing`."""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import logging
+import os
+from unittest import mock
+
+import pytest
+
+from .. import (
+    requests as igwn_requests,
+    scitokens as igwn_scitokens,
+    timing,
+    x509 as igwn_x509,
+)
+from .test_scitokens import (
+    READ_AUDIENCE,
+    READ_SCOPE,
+    rtoken,  # noqa: F401
+    rtoken_path,  # noqa: F401
+)
+
+
+@pytest.fixture
+def timings():
+    """Register a hook that records all timings in a list."""
+    timings: list = []
+    timing.add_hook(timings.append)
+    try:
+        yield timings
+    finally:
+        timing.remove_hook(timings.append)
+
+
+def _phases(timings):
+    return [t.phase for t in timings]
+
+
+def test_timer_disabled():
+    """Test that `timer` returns a shared no-op when timing is disabled."""
+    assert not timing.enabled()
+    assert timing.timer("a") is timing.timer("b")
+
+
+def test_timer(timings):
+    """Test that `timer` passes a `PhaseTiming` to hooks."""
+    assert timing.enabled()
+    with timing.timer("test", key="value"):
+        pass
+    assert len(timings) == 1
+    assert timings[0].phase == "test"
+    assert timings[0].duration >= 0
+    assert timings[0].extra == {"key": "value"}
+
+
+def test_add_hook_once(timings):
+    """Test that registering the same hook twice only calls it once."""
+    timing.add_hook(timings.append)
+    with timing.timer("test"):
+        pass
+    assert len(timings) == 1
+
+
+def test_after_fork():
+    """Test that the hooks lock is replaced in a child process."""
+    lock = timing._HOOKS_LOCK
+    with lock:  # as if held by another thread during a fork
+        timing._after_fork()
+        assert timing._HOOKS_LOCK is not lock
+        timing.add_hook(print)
+        timing.remove_hook(print)
+
+
+def test_hook_error(timings, caplog):
+    """Test that a failing hook is logged, and doesn't stop other hooks."""
+    def _broken(_timing):
+        raise RuntimeError("broken")
+
+    timing.add_hook(_broken)
+    try:
+        with caplog.at_level(
+            logging.ERROR,
+            logger=timing.log.name,
+        ), timing.timer("test"):
+            pass
+    finally:
+        timing.remove_hook(_broken)
+    assert "timing hook" in caplog.text
+    assert _phases(timings) == ["test"]
+
+
+def test_log_timing(caplog):
+    """Test that `log_timing` emits a record with the timing attached."""
+    timing.add_hook(timing.log_timing)
+    try:
+        with caplog.at_level(
+            logging.DEBUG,
+            logger=timing.log.name,
+        ), timing.timer("test"):
+            pass
+    finally:
+        timing.remove_hook(timing.log_timing)
+    record, = caplog.records
+    assert record.getMessage().startswith("test took ")
+    assert record.timing.phase == "test"
+
+
+def test_collect():
+    """Test that `collect` enables timing and records nested phases."""
+    with timing.collect() as outer:
+        with timing.timed("outer")(timing.timer)("inner"):
+            pass
+        with timing.collect() as inner, timing.timer("nested"):
+            pass
+    assert not timing.enabled()
+    assert _phases(outer) == ["outer", "inner", "nested"]
+    assert _phases(inner) == ["nested"]
+
+
+@mock.patch.dict("os.environ", clear=True)
+def test_find_token(timings, rtoken_path, public_pem):  # noqa: F811
+    """Test that `find_token` records the time for each candidate."""
+    os.environ["SCITOKEN_FILE"] = str(rtoken_path)
+    igwn_scitokens.find_token(
+        READ_AUDIENCE,
+        READ_SCOPE,
+        insecure=True,
+        public_key=public_pem,
+    )
+    assert _phases(timings) == ["token_candidate", "find_token"]
+    assert timings[0].extra == {
+        "source": "SCITOKEN_FILE",
+        "path": str(rtoken_path),
+    }
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+@mock.patch.dict("os.environ", clear=True)
+def test_find_x509_credentials(timings, x509_credential_path):
+    """Test that `find_credentials` records the time for each candidate."""
+    os.environ["X509_USER_PROXY"] = str(x509_credential_path)
+    igwn_x509.find_credentials(agent=False)
+    assert _phases(timings) == ["x509_candidate", "find_x509_credentials"]
+    assert timings[0].extra == {
+        "source": "X509_USER_PROXY",
+        "path": str(x509_credential_path),
+    }
+
+
+def test_session_timings(requests_mock, rtoken):  # noqa: F811
+    """Test that `Session` requests can be timed with `collect`."""
+    requests_mock.get("https://example.com")
+    with igwn_requests.Session(
+        token=rtoken,
+        cert=False,
+    ) as sess, timing.collect() as timings:
+        resp = sess.get("https://example.com")
+    assert _phases(timings) == ["prepare_auth", "request"]
+    assert timings[1].extra == {
+        "method": "GET",
+        "url": "https://example.com",
+    }
+    assert not hasattr(resp, "timings")
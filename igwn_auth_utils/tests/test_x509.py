@@ -6,6 +6,7 @@
 __author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
 
 import datetime
+import errno
 import os
 from pathlib import Path
 from unittest import mock
@@ -107,6 +108,25 @@ def test_validate_certificate_expiry_error(x509cert):
         igwn_x509.validate_certificate(x509cert, timeleft=int(1e10))
 
 
+def test_validate_certificate_path_cache(x509cert, x509cert_path):
+    """Test that `validate_certificate` caches the expiry of cert files."""
+    with mock.patch(
+        "igwn_auth_utils.x509.load_x509_certificate_file",
+        wraps=igwn_x509.load_x509_certificate_file,
+    ) as load:
+        igwn_x509.validate_certificate(x509cert_path)
+        count = load.call_count
+        igwn_x509.validate_certificate(str(x509cert_path))
+        assert load.call_count == count
+
+        # rewriting the file invalidates the cache
+        x509cert_path.unlink()
+        _write_x509(x509cert, x509cert_path)
+        os.utime(x509cert_path, ns=(0, 0))
+        igwn_x509.validate_certificate(x509cert_path)
+        assert load.call_count > count
+
+
 def test_is_valid_certificate(x509cert_path):
     assert igwn_x509.is_valid_certificate(x509cert_path)
 
@@ -255,3 +275,101 @@ def test_find_credentials_on_error(
     # check that when we don't raise an exception the result is still correct
     if on_error in ("warn", "ignore"):
         assert cred == x509cert_filename
+
+
+@mock.patch.dict("os.environ")
+@mock.patch("igwn_auth_utils.x509._default_cert_path")
+@mock.patch(
+    "igwn_auth_utils.x509._globus_cert_path",
+    mock.MagicMock(side_effect=RuntimeError),
+)
+def test_explain_credentials(default, x509cert_path, tmp_path):
+    """Test that `explain_credentials` reports on every candidate."""
+    default.return_value = tmp_path / "missing"
+    empty = tmp_path / "blah"
+    empty.touch()
+    os.environ["X509_USER_CERT"] = os.environ["X509_USER_KEY"] = str(empty)
+    os.environ["X509_USER_PROXY"] = str(x509cert_path)
+
+    with x509_warning_ctx:
+        trace = igwn_x509.explain_credentials(agent=False)
+
+    bad, good = trace
+    assert bad.source == "X509_USER_CERT"
+    assert bad.path == str(empty)
+    assert not bad.valid
+    assert bad.reason.startswith("ValueError")
+    assert good.source == "X509_USER_PROXY"
+    assert good.path == str(x509cert_path)
+    assert good.valid
+    assert good.reason is None
+
+
+@mock.patch.dict("os.environ")
+def test_discovery_fingerprint(x509cert_path):
+    """Test that `_discovery_fingerprint` changes with the search locations."""
+    os.environ.pop("X509_USER_PROXY", None)
+    before = igwn_x509._discovery_fingerprint()
+    assert igwn_x509._discovery_fingerprint() == before
+    os.environ["X509_USER_PROXY"] = str(x509cert_path)
+    assert igwn_x509._discovery_fingerprint() != before
+
+
+@pytest.mark.parametrize(("cred", "result"), [
+    ("cert.pem", False),
+    (("cert.pem", "key.pem"), False),
+    ((Path("cert.pem"), None), False),
+    (b"-----BEGIN CERTIFICATE-----", True),
+    ((b"cert", b"key"), True),
+])
+def test_is_in_memory_credential(cred, result):
+    """Test `_is_in_memory_credential`."""
+    assert igwn_x509._is_in_memory_credential(cred) is result
+
+
+@pytest.mark.parametrize("cred", [
+    ("cert.pem", b"key"),
+    (b"cert", Path("key.pem")),
+])
+def test_is_in_memory_credential_mixed(cred):
+    """Test that `_is_in_memory_credential` rejects mixed tuples."""
+    with pytest.raises(TypeError, match="cannot mix file paths"):
+        igwn_x509._is_in_memory_credential(cred)
+
+
+def _read_pem(path):
+    """Read the content of ``path`` into a `list` for later inspection."""
+    return [Path(path).read_bytes()]
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "memfd_create"),
+    reason="no os.memfd_create",
+)
+def test_load_cert_chain_in_memory(x509cert, private_key):
+    """Test that `_load_cert_chain` can load in-memory credentials."""
+    context = mock.MagicMock()
+    context.load_cert_chain.side_effect = _read_pem
+    data, = igwn_x509._load_cert_chain(context, (x509cert, private_key))
+    assert data == igwn_x509._credential_pem((x509cert, private_key))
+    # the in-memory file is closed
+    fd = int(Path(context.load_cert_chain.call_args.args[0]).name)
+    with pytest.raises(OSError, match=os.strerror(errno.EBADF)) as exc:
+        os.fstat(fd)
+    assert exc.value.errno == errno.EBADF
+
+
+def test_load_cert_chain_in_memory_tempfile(
+    monkeypatch,
+    x509cert,
+    private_key,
+):
+    """Test `_load_cert_chain` with in-memory credentials without memfd."""
+    monkeypatch.delattr(os, "memfd_create", raising=False)
+    context = mock.MagicMock()
+    context.load_cert_chain.side_effect = _read_pem
+    data, = igwn_x509._load_cert_chain(context, (x509cert, private_key))
+    assert data == igwn_x509._credential_pem((x509cert, private_key))
+    path = Path(context.load_cert_chain.call_args.args[0])
+    # the temporary file (and directory) is gone
+    assert not path.parent.exists()
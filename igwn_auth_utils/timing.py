@@ -0,0 +1,271 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Timing instrumentation for credential discovery and requests.
+
+The phases of preparing authorisation for a request, e.g. discovering
+a SciToken or an X.509 credential, and each candidate credential
+considered during discovery, can be timed by registering a hook that
+is called with a `PhaseTiming` for each phase:
+
+>>> from igwn_auth_utils import timing
+>>> timing.add_hook(timing.log_timing)
+
+To collect the `PhaseTiming` recorded while running a block of code,
+e.g. sending a single request, use `collect`:
+
+>>> with timing.collect() as timings:
+...     sess.get("https://example.com")
+
+When no hooks are registered, timing is disabled and the overhead
+is negligible.
+"""
+
+from __future__ import annotations
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from functools import wraps
+from typing import NamedTuple
+
+__all__ = [
+    "CandidateTrace",
+    "PhaseTiming",
+    "add_hook",
+    "collect",
+    "enabled",
+    "log_timing",
+    "remove_hook",
+    "timed",
+    "timer",
+]
+
+log = logging.getLogger(__name__)
+
+#: registered timing hooks
+_HOOKS: list = []
+
+#: lock held while registering or unregistering hooks
+_HOOKS_LOCK = threading.Lock()
+
+
+def _after_fork():
+    """Replace the hooks lock, which may have been held during a fork."""
+    global _HOOKS_LOCK  # noqa: PLW0603
+    _HOOKS_LOCK = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):  # not on Windows
+    os.register_at_fork(after_in_child=_after_fork)
+
+#: thread-local stack of timing collectors, see `collect`
+_LOCAL = threading.local()
+
+#: shared no-op context used when timing is disabled
+_NULL_TIMER = nullcontext()
+
+
+class PhaseTiming(NamedTuple):
+    """The duration of a single timed phase."""
+
+    #: The name of the phase
+    phase: str
+
+    #: The duration (seconds) of the phase
+    duration: float
+
+    #: Extra information about the phase, e.g. the path of a candidate
+    extra: dict
+
+
+class CandidateTrace(NamedTuple):
+    """The outcome of considering a single candidate credential.
+
+    See `igwn_auth_utils.scitokens.explain_token` and
+    `igwn_auth_utils.x509.explain_credentials`.
+    """
+
+    #: Where the candidate was found, e.g. an environment variable name
+    source: str
+
+    #: The path of the candidate file (if any)
+    path: str | None
+
+    #: The time (seconds) taken to load and validate the candidate
+    duration: float
+
+    #: Whether the candidate is valid
+    valid: bool
+
+    #: The reason that the candidate is not valid (if not)
+    reason: str | None
+
+
+# -- hooks ----------------------------
+
+def add_hook(hook):
+    """Register a function to be called with each `PhaseTiming`.
+
+    Registering any hook enables timing.
+
+    Parameters
+    ----------
+    hook : `callable`
+        A function that accepts a single `PhaseTiming` argument.
+    """
+    with _HOOKS_LOCK:
+        if hook not in _HOOKS:
+            _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """Unregister a hook registered with `add_hook`.
+
+    Removing the last hook disables timing.
+    """
+    with _HOOKS_LOCK:
+        if hook in _HOOKS:
+            _HOOKS.remove(hook)
+
+
+def log_timing(timing):
+    """Emit a `logging` record for a `PhaseTiming`.
+
+    The record is emitted at ``DEBUG`` level by the
+    ``igwn_auth_utils.timing`` logger, with the `PhaseTiming`
+    attached as the ``timing`` attribute, for use by structured
+    log formatters.
+
+    Examples
+    --------
+    >>> timing.add_hook(timing.log_timing)
+    """
+    log.debug(
+        "%s took %.3f ms",
+        timing.phase,
+        timing.duration * 1000.,
+        extra={"timing": timing},
+    )
+
+
+def enabled():
+    """Return `True` if timing is enabled in this thread."""
+    return bool(_HOOKS or getattr(_LOCAL, "stack", None))
+
+
+def _call_hook(hook, timing):
+    """Pass a `PhaseTiming` to a single hook, logging any errors."""
+    try:
+        hook(timing)
+    except Exception:  # a broken hook shouldn't break a request
+        log.exception("timing hook %r failed", hook)
+
+
+def _record(timing):
+    """Pass a `PhaseTiming` to all hooks and active collectors."""
+    for hook in tuple(_HOOKS):
+        _call_hook(hook, timing)
+    for timings in getattr(_LOCAL, "stack", ()):
+        timings.append(timing)
+
+
+# -- timers ---------------------------
+
+class _Timer:
+    """Context manager to time a phase."""
+
+    __slots__ = ("_start", "extra", "phase")
+
+    def __init__(self, phase, extra):
+        self.phase = phase
+        self.extra = extra
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _record(PhaseTiming(
+            self.phase,
+            time.perf_counter() - self._start,
+            self.extra,
+        ))
+
+
+def timer(phase, **extra):
+    """Return a context manager that times a phase.
+
+    Parameters
+    ----------
+    phase : `str`
+        The name of the phase.
+
+    extra
+        Any other keyword arguments are stored in `PhaseTiming.extra`.
+
+    Returns
+    -------
+    timer : context manager
+        A timer for the phase, or a shared no-op context if timing
+        is disabled.
+    """
+    if not enabled():
+        return _NULL_TIMER
+    return _Timer(phase, extra)
+
+
+def timed(phase):
+    """Decorate a function to time each call as a phase."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with _Timer(phase, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -- collection -----------------------
+
+class _Collector:
+    """Context manager to collect timings recorded in this thread."""
+
+    __slots__ = ("timings",)
+
+    def __init__(self):
+        self.timings = []
+
+    def __enter__(self):
+        _LOCAL.__dict__.setdefault("stack", []).append(self.timings)
+        return self.timings
+
+    def __exit__(self, *exc):
+        _LOCAL.stack.pop()
+
+
+def collect():
+    """Return a context manager that collects timings in this thread.
+
+    Timing is enabled in this thread while the collector is active,
+    even if no hooks are registered.
+
+    Returns
+    -------
+    collector : context manager
+        A context manager that returns the `list` of `PhaseTiming`
+        recorded in this thread while it is active.
+
+    Examples
+    --------
+    >>> with timing.collect() as timings:
+    ...     find_x509_credentials()
+    >>> print(timings)
+    """
+    return _Collector()
@@ -3,8 +3,12 @@
 
 """Utilities for discovering and handling X.509 credentials."""
 
+import contextlib
 import datetime
+import logging
 import os
+import tempfile
+import time
 import warnings
 import sys
 from functools import wraps
@@ -16,8 +20,28 @@ from cryptography.x509 import (
     load_pem_x509_certificate,
 )
 from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    NoEncryption,
+    PrivateFormat,
+)
 
+from ._cache import (
+    TTLCache,
+    file_fingerprint,
+)
 from .error import IgwnAuthError
+from .metrics import (
+    counted,
+    counter,
+)
+from .timing import (
+    CandidateTrace,
+    timed,
+    timer,
+)
+
+log = logging.getLogger(__name__)
 
 X509_DEPRECATION_MESSAGE = """
 Support for identity-based X.509 credentials for LIGO.ORG is being dropped.
@@ -43,6 +67,27 @@ if sys.version_info < (3, 13, 0):
         "    ",
     )
 
+#: cache of certificate expiry times, keyed on file path
+_EXPIRY_CACHE = TTLCache(maxsize=64)
+
+#: cache of successful key file read checks, keyed on file path
+_READABLE_CACHE = TTLCache(maxsize=64)
+
+#: count of discovery attempts
+_DISCOVERY = counter(
+    "discovery_total",
+    "Credential discovery attempts, by credential type and result.",
+    ("credential", "result"),
+)
+
+#: Environment variables that affect credential discovery
+_DISCOVERY_ENV = (
+    "X509_USER_CERT",
+    "X509_USER_KEY",
+    "X509_USER_PROXY",
+    "HOME",
+)
+
 
 def x509_deprecation(func):
     """Wrap ``func`` with a warning about X.509 support being dropped."""
@@ -94,6 +139,10 @@ def load_x509_certificate_file(file, backend=None):
 def validate_certificate(cert, timeleft=600):
     """Validate an X.509 certificate by checking it's expiry time.
 
+    The expiry time of certificates read from a file path is cached,
+    keyed on the path, inode, size, and modification time of the file,
+    so repeated validation of an unchanged file doesn't re-read it.
+
     Parameters
     ----------
     cert : `cryptography.x509.Certificate`, `str`, `file`
@@ -107,12 +156,16 @@ def validate_certificate(cert, timeleft=600):
     ValueError
         if the certificate has expired or is about to expire
     """
-    # load a certificate from a file
-    if not isinstance(cert, Certificate):
-        cert = load_x509_certificate_file(cert)
+    # get the expiry time
+    if isinstance(cert, Certificate):
+        expiry = _expiry(cert)
+    elif isinstance(cert, (str, bytes, os.PathLike)):
+        expiry = _cert_file_expiry(cert)
+    else:  # load a certificate from a file object
+        expiry = _expiry(load_x509_certificate_file(cert))
 
     # then validate it
-    if _timeleft(cert) < timeleft:
+    if _seconds_until(expiry) < timeleft:
         raise ValueError(
             f"X.509 certificate has less than {timeleft} seconds remaining"
         )
@@ -144,17 +197,163 @@ def is_valid_certificate(cert, timeleft=600):
     return True
 
 
-def _timeleft(cert):
-    """Return the time remaining (in seconds) for a ``cert``."""
+def _expiry(cert):
+    """Return the expiry time of a ``cert`` as a UTC `datetime.datetime`."""
     try:
-        expiry = cert.not_valid_after_utc
+        return cert.not_valid_after_utc
     except AttributeError:
         # cryptography < 42
-        expiry = cert.not_valid_after.astimezone(datetime.timezone.utc)
+        return cert.not_valid_after.astimezone(datetime.timezone.utc)
+
+
+def _seconds_until(expiry):
+    """Return the time remaining (in seconds) until ``expiry``."""
     now = datetime.datetime.now(datetime.timezone.utc)
     return (expiry - now).total_seconds()
 
 
+def _timeleft(cert):
+    """Return the time remaining (in seconds) for a ``cert``."""
+    return _seconds_until(_expiry(cert))
+
+
+def _cert_file_expiry(path):
+    """Return the expiry time of the X.509 certificate in a file.
+
+    The result is cached against the fingerprint of the file.
+    """
+    key = os.fsdecode(path)
+    fingerprint = file_fingerprint(path)
+    expiry = _EXPIRY_CACHE.get(key, fingerprint=fingerprint)
+    if expiry is None:
+        expiry = _expiry(load_x509_certificate_file(path))
+        if fingerprint is not None:
+            _EXPIRY_CACHE.set(key, expiry, fingerprint=fingerprint)
+    return expiry
+
+
+def _check_readable(path):
+    """Check that the file at ``path`` can be opened for reading.
+
+    Successful checks are cached against the fingerprint of the file.
+
+    Raises
+    ------
+    OSError
+        if the file cannot be opened
+    """
+    key = os.fsdecode(path)
+    fingerprint = file_fingerprint(path)
+    if _READABLE_CACHE.get(key, fingerprint=fingerprint):
+        return
+    with open(path, "rb"):  # noqa: PTH123
+        pass
+    if fingerprint is not None:
+        _READABLE_CACHE.set(key, value=True, fingerprint=fingerprint)
+
+
+def _is_in_memory_credential(cred):
+    """Return `True` if ``cred`` is an in-memory X.509 credential.
+
+    In-memory credentials are PEM-format `bytes`, or a ``(cert, key)``
+    `tuple` where each element is PEM-format `bytes` or a
+    `cryptography` certificate or private key object (or `None`).
+
+    Raises
+    ------
+    TypeError
+        If ``cred`` is a `tuple` that mixes file paths and in-memory
+        objects.
+    """
+    if isinstance(cred, bytes):
+        return True
+    if not isinstance(cred, tuple):
+        return False
+    in_memory = [
+        not isinstance(item, (str, os.PathLike))
+        for item in cred
+        if item is not None
+    ]
+    if any(in_memory) and not all(in_memory):
+        msg = (
+            "cannot mix file paths and in-memory objects in an "
+            f"X.509 credential tuple: {tuple(map(type, cred))}"
+        )
+        raise TypeError(msg)
+    return any(in_memory)
+
+
+def _pem_bytes(obj):
+    """Serialise an in-memory certificate or private key as PEM."""
+    if isinstance(obj, bytes):
+        return obj
+    if isinstance(obj, Certificate):
+        return obj.public_bytes(Encoding.PEM)
+    return obj.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.PKCS8,
+        encryption_algorithm=NoEncryption(),
+    )
+
+
+def _credential_pem(cred):
+    """Serialise an in-memory X.509 credential as PEM-format `bytes`.
+
+    The output contains the certificate followed by the private key.
+    """
+    if isinstance(cred, bytes):
+        return cred
+    return b"".join(_pem_bytes(item) for item in cred if item is not None)
+
+
+@contextlib.contextmanager
+def _pem_path(data):
+    """Context manager to provide ``data`` via a file path.
+
+    Where supported (Linux), the data are held in an anonymous in-memory
+    file, otherwise they are written to a file in a private temporary
+    directory that is removed on exit.
+    """
+    if hasattr(os, "memfd_create") and Path("/proc/self/fd").is_dir():
+        fd = os.memfd_create("igwn-auth-utils-x509", os.MFD_CLOEXEC)
+        try:
+            with os.fdopen(fd, "wb", closefd=False) as file:
+                file.write(data)
+            yield f"/proc/self/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "x509.pem"
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        yield str(path)
+
+
+def _load_cert_chain(context, cred):
+    """Load an X.509 credential into an `ssl.SSLContext`.
+
+    Parameters
+    ----------
+    context : `ssl.SSLContext`
+        The context to load into.
+
+    cred : `str`, `tuple`, `bytes`
+        The path of the combined certificate and key file, a
+        ``(cert, key)`` `tuple` of paths, or an in-memory credential
+        (see `_is_in_memory_credential`).
+    """
+    if _is_in_memory_credential(cred):
+        with _pem_path(_credential_pem(cred)) as path:
+            return context.load_cert_chain(path)
+    if isinstance(cred, (str, os.PathLike)):
+        return context.load_cert_chain(cred)
+    cert, key = cred
+    return context.load_cert_chain(cert, keyfile=key)
+
+
 def _default_cert_path(prefix="x509up_"):
     r"""Return the temporary path for a user's X509 certificate.
 
@@ -189,9 +388,12 @@ def _globus_cert_path():
 
 
 @x509_deprecation
+@timed("find_x509_credentials")
+@counted(_DISCOVERY, credential="x509")
 def find_credentials(
     timeleft=600,
     on_error="warn",
+    agent=None,
 ):
     """Locate X509 certificate and (optionally) private key files.
 
@@ -220,6 +422,14 @@ def find_credentials(
         - ``"warn"`` - emit a warning and move on to the next candidate
         - ``"raise"`` - raise the exception immediately
 
+    agent : `bool`, optional
+        If `True`, first ask the local credential agent (if running)
+        for a credential, see :mod:`igwn_auth_utils.agent`; the default
+        (`None`) uses the agent only if the ``IGWN_AUTH_UTILS_AGENT``
+        environment variable is set.
+        A credential returned by the agent is validated in the same way
+        as one found locally.
+
     Returns
     -------
     cert : `str`
@@ -239,6 +449,8 @@ def find_credentials(
     --------
     ~igwn_auth_utils.find_x509_credentials
         For details of the certificate validation.
+    explain_credentials
+        For details of how each candidate credential was considered.
 
     Examples
     --------
@@ -253,28 +465,19 @@ def find_credentials(
     >>> find_credentials()
     ('/home/me/.globus/usercert.pem', '/home/me/.globus/userkey.pem')
     """
-    def _validate(cert, key):
-        validate_certificate(cert, timeleft=timeleft)
-
-        # check we can read the key file
-        if key is not None:
-            with open(key, "rb"):
-                pass
+    cred = _find_credentials_from_agent(timeleft, agent)
+    if cred is not None:
+        return cred
 
     ignore = on_error == "ignore"
     warn = on_error == "warn"
     error = None
 
-    for candidate in _find_credentials():
-        # unpack cert, key pair or combined cert+key file
-        try:
-            cert, key = candidate
-        except ValueError:
-            cert = candidate[0]
-            key = None
+    for source, cert, key in _find_credentials():
         # validate and return if valid, otherwise move on
         try:
-            _validate(cert, key)
+            with timer("x509_candidate", source=source, path=str(cert)):
+                _validate_candidate(cert, key, timeleft)
         except Exception as exc:
             error = error or exc  # store (first) error for later
             if ignore:
@@ -293,26 +496,125 @@ def find_credentials(
     ) from error
 
 
+@x509_deprecation
+def explain_credentials(timeleft=600, agent=None):
+    """Explain how `find_credentials` would find a credential.
+
+    Every candidate credential that `find_credentials` would consider
+    is validated, in order of precedence, with the outcome recorded.
+    Unlike `find_credentials`, this doesn't stop at the first valid
+    credential, so can be used to identify slow or useless candidates.
+
+    Parameters
+    ----------
+    timeleft, agent
+        See `find_credentials`.
+
+    Returns
+    -------
+    trace : `list` of `~igwn_auth_utils.timing.CandidateTrace`
+        The outcome of considering each candidate, in order;
+        the first valid candidate is the credential that
+        `find_credentials` would return.
+    """
+    trace = []
+
+    start = time.perf_counter()
+    cred = _find_credentials_from_agent(timeleft, agent)
+    if cred is not None:
+        trace.append(CandidateTrace(
+            "agent",
+            cred if isinstance(cred, str) else cred[0],
+            time.perf_counter() - start,
+            valid=True,
+            reason=None,
+        ))
+
+    for source, cert, key in _find_credentials():
+        start = time.perf_counter()
+        reason = None
+        try:
+            _validate_candidate(cert, key, timeleft)
+        except Exception as exc:  # noqa: BLE001
+            reason = f"{type(exc).__name__}: {exc}"
+        trace.append(CandidateTrace(
+            source,
+            str(cert),
+            time.perf_counter() - start,
+            reason is None,
+            reason,
+        ))
+    return trace
+
+
+def _find_credentials_from_agent(timeleft, agent):
+    """Ask the local credential agent for a valid credential.
+
+    Returns `None` if the agent isn't enabled or running, or it didn't
+    provide a valid credential.
+    """
+    # import here to allow running the agent via `python -m`
+    from . import agent as _agent
+
+    if not _agent.enabled(agent):
+        return None
+    cred = _agent.find_credentials(timeleft=timeleft, env=_DISCOVERY_ENV)
+    if isinstance(cred, str):
+        cert, key = cred, None
+    elif (
+        isinstance(cred, tuple)
+        and len(cred) == 2  # noqa: PLR2004
+        and all(isinstance(path, str) for path in cred)
+    ):
+        cert, key = cred
+    else:
+        return None
+    try:
+        _validate_candidate(cert, key, timeleft)
+    except Exception as exc:  # noqa: BLE001
+        log.debug("Ignoring invalid credential from agent: %s", exc)
+        return None
+    return cred
+
+
+def _validate_candidate(cert, key, timeleft):
+    """Validate a candidate credential, raising an exception if invalid."""
+    validate_certificate(cert, timeleft=timeleft)
+
+    # check we can read the key file
+    if key is not None:
+        _check_readable(key)
+
+
 def _find_credentials():
-    """Yield all candidate X.509 credentials we can find."""
+    """Yield all candidate X.509 credentials we can find.
+
+    Each candidate is yielded as a ``(source, cert, key)`` tuple,
+    where ``source`` is a short description of where the credential
+    comes from, and ``key`` is `None` for a combined cert+key file.
+    """
     # -- check environment variables
     # unlike the default paths below, here we don't pre-check that the
     # files actually exist; this allows the validation to fail and the
     # user to receive a warning or exception about it
 
     if "X509_USER_CERT" in os.environ and "X509_USER_KEY" in os.environ:
-        yield os.environ['X509_USER_CERT'], os.environ['X509_USER_KEY']
+        yield (
+            "X509_USER_CERT",
+            os.environ["X509_USER_CERT"],
+            os.environ["X509_USER_KEY"],
+        )
 
     proxy = os.getenv("X509_USER_PROXY", None)
     if proxy is not None:
-        yield proxy,
+        yield "X509_USER_PROXY", proxy, None
 
     # -- look up some default paths
 
     # 1: /tmp/x509up_u<uid> (cert = key)
     default = _default_cert_path()
     if default.exists():
-        yield default,
+        yield "default", default, None
 
     # 2: ~/.globus/user{cert,key}.pem
     try:
@@ -322,4 +624,18 @@ def _find_credentials():
         pass
     else:
         if cert.exists() and key.exists():
-            yield cert, key
+            yield "globus", cert, key
+
+
+def _discovery_fingerprint():
+    """Return a fingerprint of the locations searched by `_find_credentials`.
+
+    This includes the values of all relevant environment variables and
+    the state of all relevant files, so can be used to invalidate cached
+    discovery results when any of those change.
+    """
+    env = tuple(os.environ.get(key) for key in _DISCOVERY_ENV)
+    paths = [*env[:3], _default_cert_path()]
+    with contextlib.suppress(RuntimeError):  # no 'home'
+        paths.extend(_globus_cert_path())
+    return env + tuple(map(file_fingerprint, paths))
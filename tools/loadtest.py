@@ -0,0 +1,537 @@
+# Copyright (c) 2025 Cardiff University
+# Distributed under the terms of the BSD-3-Clause license
+
+"""Load test `igwn_auth_utils.requests` against a local HTTPS server.
+
+This starts a local HTTPS server that validates SciToken bearer tokens
+against a locally-generated signing key, then drives it with many
+threads (or processes) using :class:`igwn_auth_utils.requests.Session`,
+and reports the request throughput, latency percentiles, and the
+fraction of time spent preparing authorisation.
+
+To run a load test from a checkout of this repository (with
+`igwn_auth_utils` and its test dependencies installed):
+
+.. code-block:: bash
+
+    python tools/loadtest.py --workers 8 --requests 200
+
+Use ``--processes`` to run workers in separate processes (optionally
+with ``--start-method`` to select how they are started), and
+``--shared-session`` to have all threads use the same `Session`.
+"""
+
+__author__ = "Duncan Macleod <duncan.macleod@ligo.org>"
+
+import argparse
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import (
+    AbstractContextManager,
+    contextmanager,
+    nullcontext,
+)
+from functools import wraps
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+from pathlib import Path
+from ssl import (
+    PROTOCOL_TLS_SERVER,
+    SSLContext,
+)
+from typing import NamedTuple
+from unittest import mock
+
+import requests
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.rsa import generate_private_key
+from scitokens import SciToken
+from scitokens.utils import keycache
+
+from igwn_auth_utils import requests as igwn_requests
+from igwn_auth_utils.scitokens import (
+    is_valid_token,
+    target_audience,
+)
+from igwn_auth_utils.tests._utils import (
+    self_signed_certificate,
+    write_credential,
+)
+
+#: Issuer of the tokens generated for the load test
+ISSUER = "local"
+
+#: Key ID of the token signing key
+KEY_ID = "loadtest"
+
+#: Scope required by the load test server
+SCOPE = "read:/igwn_auth_utils"
+
+#: Lifetime (seconds) of the generated token and its signing key
+TOKEN_LIFETIME = 3600
+
+#: Latency percentiles to report
+PERCENTILES = (50, 90, 99)
+
+#: total time spent preparing auth in this thread
+_AUTH_TIME = threading.local()
+
+
+# -- server ---------------------------
+
+class _TokenHandler(BaseHTTPRequestHandler):
+    """Request handler that requires a valid bearer token.
+
+    Responds ``401`` for a missing or invalid token, ``403`` for a
+    token without the right audience or scope, and ``200`` otherwise.
+    """
+
+    protocol_version = "HTTP/1.1"  # allow connection reuse
+
+    server: "_TokenServer"
+
+    def do_GET(self):
+        self.send_response(self._authorize(
+            self.headers.get("Authorization", ""),
+        ))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _authorize(self, header):
+        scheme, _, raw = header.partition(" ")
+        if scheme != "Bearer" or not raw:
+            return 401
+        try:
+            token = SciToken.deserialize(
+                raw,
+                public_key=self.server.public_pem,
+                insecure=True,
+            )
+        except Exception:  # noqa: BLE001
+            return 401
+        if not is_valid_token(token, self.server.audience, SCOPE):
+            return 403
+        return 200
+
+    def log_message(self, *args):
+        pass
+
+
+class _TokenServer(ThreadingHTTPServer):
+    """HTTPS server that accepts tokens for its own URL."""
+
+    daemon_threads = True
+
+    #: the audience that tokens must have
+    audience: str
+
+    #: the PEM-format public key that signs tokens
+    public_pem: bytes
+
+
+@contextmanager
+def _serve(private_key, workdir):
+    """Run an HTTPS token-validating server in a thread.
+
+    Yields the URL of the server and the path of its certificate.
+    """
+    server_cert = write_credential(
+        self_signed_certificate(private_key, hostname="localhost"),
+        private_key,
+        Path(workdir) / "server.pem",
+    )
+    context = SSLContext(PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(server_cert)
+    server = _TokenServer(("127.0.0.1", 0), _TokenHandler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    url = f"https://localhost:{server.server_port}/"
+    server.audience = target_audience(url, include_any=False)[0]
+    server.public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield url, server_cert
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _write_token(private_key, audience, path):
+    """Create a signed token for ``audience`` and write it to ``path``."""
+    now = int(time.time())
+    token = SciToken(key=private_key, key_id=KEY_ID)
+    token.update_claims({
+        "iat": now,
+        "nbf": now,
+        "iss": ISSUER,
+        "aud": audience,
+        "scope": SCOPE,
+    })
+    path.write_bytes(token.serialize(lifetime=TOKEN_LIFETIME))
+    return path
+
+
+def _add_signing_key(public_pem):
+    """Add the token signing key to the `scitokens` key cache."""
+    keycache.KeyCache.getinstance().addkeyinfo(
+        ISSUER,
+        KEY_ID,
+        serialization.load_pem_public_key(public_pem),
+        cache_timer=TOKEN_LIFETIME,
+        next_update=TOKEN_LIFETIME,
+    )
+
+
+# -- client ---------------------------
+
+def _timed(func):
+    """Decorate ``func`` to record its run time as auth preparation."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _AUTH_TIME.total = (
+                getattr(_AUTH_TIME, "total", 0.)
+                + time.perf_counter() - start
+            )
+    return wrapper
+
+
+@contextmanager
+def _instrument_auth():
+    """Record the time spent preparing auth for each request."""
+    with mock.patch.object(
+        igwn_requests,
+        "_prepare_auth",
+        _timed(igwn_requests._prepare_auth),
+    ), mock.patch.object(
+        igwn_requests.HTTPSciTokenAuth,
+        "__call__",
+        _timed(igwn_requests.HTTPSciTokenAuth.__call__),
+    ):
+        yield
+
+
+class _WorkerResult(NamedTuple):
+    latencies: list
+    errors: int
+    auth: float
+    busy: float
+
+
+def _worker(url, nrequests, verify, session=None):
+    """Send ``nrequests`` GET requests to ``url`` and time them.
+
+    If ``session`` is not given, a new `Session` is created (and its
+    credential discovery counted as auth preparation).
+    """
+    _AUTH_TIME.total = 0.
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    sess = session or igwn_requests.Session(url=url, token=True, cert=False)
+    try:
+        for _ in range(nrequests):
+            reqstart = time.perf_counter()
+            try:
+                sess.get(url, verify=verify)
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - reqstart)
+    finally:
+        if session is None:
+            sess.close()
+    return _WorkerResult(
+        latencies,
+        errors,
+        _AUTH_TIME.total,
+        time.perf_counter() - start,
+    )
+
+
+def _init_process(workdir, token_path, public_pem):
+    """Configure a worker process to discover and verify the test token.
+
+    Everything is passed explicitly, rather than inherited from the
+    parent process, so that this works with any multiprocessing
+    start method.
+    """
+    # keep the signing key out of the user's scitokens key cache
+    os.environ["XDG_CACHE_HOME"] = str(workdir)
+    os.environ["SCITOKEN_FILE"] = str(token_path)
+    # use a new key cache (in XDG_CACHE_HOME) for this process
+    keycache.KEYCACHE_INSTANCE = None
+    _add_signing_key(public_pem)
+
+
+def _process_worker(*args):
+    """Run `_worker` in a new process with auth timing enabled."""
+    with _instrument_auth():
+        return _worker(*args)
+
+
+# -- report ---------------------------
+
+class LoadTestReport(NamedTuple):
+    """Results of a load test."""
+
+    #: The worker type, ``"threads"`` or ``"processes"``
+    mode: str
+
+    #: The number of workers
+    workers: int
+
+    #: The total number of requests sent
+    requests: int
+
+    #: The number of requests that failed
+    errors: int
+
+    #: The wall-clock duration (seconds) of the test
+    elapsed: float
+
+    #: The sorted latencies (seconds) of each request
+    latencies: list
+
+    #: The total time (seconds) spent preparing auth across all workers
+    auth_time: float
+
+    #: The total time (seconds) that workers were busy
+    busy_time: float
+
+    @property
+    def throughput(self):
+        """The number of requests per second."""
+        return self.requests / self.elapsed
+
+    @property
+    def auth_fraction(self):
+        """The fraction of worker time spent preparing auth."""
+        return self.auth_time / self.busy_time if self.busy_time else 0.
+
+    def percentile(self, q):
+        """Return the ``q``-th percentile request latency (seconds)."""
+        if not self.latencies:
+            return math.nan
+        rank = math.ceil(q / 100 * len(self.latencies)) - 1
+        return self.latencies[max(rank, 0)]
+
+    def format(self):
+        """Format this report as human-readable text."""
+        rows = [
+            ("workers", f"{self.workers} {self.mode}"),
+            ("requests", f"{self.requests} ({self.errors} failed)"),
+            ("elapsed", f"{self.elapsed:.3f} s"),
+            ("throughput", f"{self.throughput:.1f} requests/s"),
+        ]
+        rows.extend(
+            (f"latency p{q}", f"{self.percentile(q) * 1000:.2f} ms")
+            for q in PERCENTILES
+        )
+        rows.append(("auth fraction", f"{self.auth_fraction:.1%}"))
+        lines = [f"{label + ':':<16}{value}" for label, value in rows]
+        return "\n".join(lines)
+
+
+def run(
+    workers=4,
+    nrequests=100,
+    *,
+    processes=False,
+    shared_session=False,
+    start_method=None,
+):
+    """Run a load test against a local token-validating HTTPS server.
+
+    Parameters
+    ----------
+    workers : `int`, optional
+        The number of concurrent workers.
+
+    nrequests : `int`, optional
+        The number of requests sent by each worker.
+
+    processes : `bool`, optional
+        If `True`, run each worker in a separate process, otherwise
+        use threads.
+
+    shared_session : `bool`, optional
+        If `True`, have all threads share a single `Session`,
+        otherwise each worker creates its own.
+        Cannot be used with ``processes=True``.
+
+    start_method : `str`, optional
+        The `multiprocessing` start method to use for worker processes,
+        defaults to the platform default.
+
+    Returns
+    -------
+    report : `LoadTestReport`
+        The results of the test.
+    """
+    if processes and shared_session:
+        msg = "cannot share a Session between processes"
+        raise ValueError(msg)
+    private_key = generate_private_key(
+        public_exponent=65537,
+        key_size=2048,
+        backend=default_backend(),
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    with tempfile.TemporaryDirectory() as tmpdir, mock.patch.dict(
+        "os.environ",
+        # keep the signing key out of the user's scitokens key cache
+        {"XDG_CACHE_HOME": tmpdir},
+    ), mock.patch.object(
+        # and use a new key cache (in XDG_CACHE_HOME) for this test
+        keycache,
+        "KEYCACHE_INSTANCE",
+        None,
+    ), _serve(private_key, tmpdir) as (url, server_cert):
+        audience = target_audience(url, include_any=False)[0]
+        token_file = _write_token(
+            private_key,
+            audience,
+            Path(tmpdir) / "token.use",
+        )
+        _add_signing_key(public_pem)
+        with mock.patch.dict("os.environ", {"SCITOKEN_FILE": str(token_file)}):
+            return _run_workers(
+                url,
+                str(server_cert),
+                workers,
+                nrequests,
+                processes=processes,
+                shared_session=shared_session,
+                start_method=start_method,
+                initargs=(tmpdir, token_file, public_pem),
+            )
+
+
+def _run_workers(
+    url,
+    verify,
+    workers,
+    nrequests,
+    *,
+    processes=False,
+    shared_session=False,
+    start_method=None,
+    initargs=(),
+):
+    """Run ``workers`` workers against ``url`` and collect the results.
+
+    ``initargs`` are passed to `_init_process` in each worker process.
+    """
+    args: tuple = (url, nrequests, verify)
+    executor: Executor
+    instrument: AbstractContextManager
+    if processes:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_process,
+            initargs=initargs,
+        )
+        func = _process_worker
+        instrument = nullcontext()  # workers instrument themselves
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        func = _worker
+        instrument = _instrument_auth()
+    with instrument, executor:
+        session = None
+        if shared_session:
+            session = igwn_requests.Session(url=url, token=True, cert=False)
+            args += (session,)
+        start = time.perf_counter()
+        futures = [executor.submit(func, *args) for _ in range(workers)]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        if session is not None:
+            session.close()
+
+    return LoadTestReport(
+        mode="processes" if processes else "threads",
+        workers=workers,
+        requests=workers * nrequests,
+        errors=sum(res.errors for res in results),
+        elapsed=elapsed,
+        latencies=sorted(x for res in results for x in res.latencies),
+        auth_time=sum(res.auth for res in results),
+        busy_time=sum(res.busy for res in results),
+    )
+
+
+def main(args=None):
+    """Run a load test and print the report."""
+    parser = argparse.ArgumentParser(
+        prog="loadtest.py",
+        description=__doc__.split("\n", 1)[0],
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="number of concurrent workers, default: %(default)s",
+    )
+    parser.add_argument(
+        "-n",
+        "--requests",
+        type=int,
+        default=100,
+        help="number of requests per worker, default: %(default)s",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        action="store_true",
+        help="run workers in separate processes, rather than threads",
+    )
+    parser.add_argument(
+        "-m",
+        "--start-method",
+        choices=multiprocessing.get_all_start_methods(),
+        help="multiprocessing start method to use with --processes",
+    )
+    parser.add_argument(
+        "-s",
+        "--shared-session",
+        action="store_true",
+        help="share a single Session between all threads",
+    )
+    opts = parser.parse_args(args=args)
+    if opts.processes and opts.shared_session:
+        parser.error("--shared-session cannot be used with --processes")
+    print(run(
+        workers=opts.workers,
+        nrequests=opts.requests,
+        processes=opts.processes,
+        shared_session=opts.shared_session,
+        start_method=opts.start_method,
+    ).format())
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()